@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from walkthrough_scraper.assets import localize_assets, localize_page_assets  # noqa: E402
+from walkthrough_scraper.model import ScrapedPage  # noqa: E402
+from walkthrough_scraper.pdf import build_combined_html  # noqa: E402
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description=(
+            "Compare asset rewriting over the combined document vs. per page.\n"
+            "Uses a synthetic walkthrough; every asset is pre-seeded as already downloaded, "
+            "so only parse/rewrite/serialize time and memory are measured."
+        )
+    )
+    p.add_argument("--pages", type=int, default=300, help="Number of synthetic pages")
+    p.add_argument("--images", type=int, default=12, help="Images per page")
+    p.add_argument("--paragraphs", type=int, default=60, help="Text paragraphs per page")
+    p.add_argument("--repeat", type=int, default=3, help="Runs per variant (best time is reported)")
+    return p
+
+
+def make_pages(n_pages: int, n_images: int, n_paragraphs: int) -> list[ScrapedPage]:
+    step = max(1, n_paragraphs // max(1, n_images))
+    pages = []
+    for i in range(n_pages):
+        parts = []
+        for j in range(n_paragraphs):
+            parts.append(f"<p>Chapter {i} paragraph {j}: " + "Walk north, open the chest, talk to the guard. " * 4 + "</p>")
+            k = j // step
+            if j % step == 0 and k < n_images:
+                parts.append(
+                    f'<img src="https://img.example.test/{i}/{k}.png" '
+                    f'srcset="https://img.example.test/{i}/{k}.png 1x, https://img.example.test/{i}/{k}@2x.png 2x">'
+                )
+        parts.append(f'<div style="background-image: url(https://img.example.test/{i}/bg.jpg)"></div>')
+        pages.append(ScrapedPage(url=f"https://www.example.test/game/page-{i}", title=f"Page {i}", content_html="\n".join(parts)))
+    return pages
+
+
+def seeded(pages: list[ScrapedPage]) -> dict[str, str]:
+    # Every URL the synthetic pages can reference (srcset's 2x wins over src).
+    seen = {}
+    for i in range(len(pages)):
+        seen[f"https://img.example.test/{i}/bg.jpg"] = f"assets/{i}-bg.jpg"
+        for k in range(pages[i].content_html.count("<img")):
+            seen[f"https://img.example.test/{i}/{k}@2x.png"] = f"assets/{i}-{k}.png"
+    return seen
+
+
+def run_combined(pages: list[ScrapedPage], out_dir: str) -> None:
+    html = build_combined_html(doc_title="Bench", pages=pages, start_url=pages[0].url, base_href=None)
+    localize_assets(context=None, html=html, output_dir=out_dir, seen=seeded(pages))
+
+
+def run_per_page(pages: list[ScrapedPage], out_dir: str) -> None:
+    localized, _count = localize_page_assets(context=None, pages=pages, output_dir=out_dir, seen=seeded(pages))
+    build_combined_html(doc_title="Bench", pages=localized, start_url=pages[0].url, base_href=None)
+
+
+def measure(fn, pages: list[ScrapedPage], out_dir: str, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn(pages, out_dir)
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fn(pages, out_dir)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    pages = make_pages(args.pages, args.images, args.paragraphs)
+    total_kb = sum(len(p.content_html) for p in pages) / 1024
+    print(f"{len(pages)} pages, {args.images} images/page, {total_kb:.0f} KiB of content HTML")
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        results = {
+            "combined document": measure(run_combined, pages, out_dir, args.repeat),
+            "per page": measure(run_per_page, pages, out_dir, args.repeat),
+        }
+
+    for name, (seconds, peak) in results.items():
+        print(f"{name:>18}: {seconds * 1000:8.1f} ms   peak traced memory {peak / 1e6:8.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
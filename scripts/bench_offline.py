@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass, field
+import json
+import math
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from fake_neoseeker import FakeSite, add_site_arguments, site_options_from_args  # noqa: E402
+from walkthrough_scraper.assets import localize_assets, localize_page_assets  # noqa: E402
+from walkthrough_scraper.fetch import HttpClient  # noqa: E402
+from walkthrough_scraper.model import ScrapedPage  # noqa: E402
+from walkthrough_scraper.neoseeker import (  # noqa: E402
+    analyze_page,
+    extract_main_content,
+    extract_main_content_from_html,
+    find_next_url,
+    find_next_url_in_html,
+    parse_html,
+    wait_for_challenge_to_clear,
+    walkthrough_prefix,
+)
+from walkthrough_scraper.pdf import build_combined_html, render_pdf, write_combined_html  # noqa: E402
+from walkthrough_scraper.store import PageStore  # noqa: E402
+
+
+# End-to-end runs: extra CLI arguments per scenario.
+SCENARIOS = {
+    "browser": ["--fetch", "browser"],
+    "browser-prefetch": ["--fetch", "browser", "--prefetch"],
+    "http": ["--fetch", "http", "--concurrency", "8"],
+    "toc": ["--fetch", "http", "--discover-toc", "--concurrency", "8"],
+    "offline-assets": ["--fetch", "http", "--concurrency", "8", "--offline-assets"],
+}
+
+
+@dataclass
+class BenchResult:
+    name: str
+    samples_s: list[float] = field(default_factory=list)
+    # Items (pages, documents) processed per sample, for throughput.
+    items_per_sample: int = 1
+    peak_bytes: int | None = None
+    note: str = ""
+
+    def summary(self) -> dict:
+        s = sorted(self.samples_s)
+        total = sum(s)
+        return {
+            "n": len(s),
+            "p50_ms": _percentile(s, 50) * 1000,
+            "p90_ms": _percentile(s, 90) * 1000,
+            "p99_ms": _percentile(s, 99) * 1000,
+            "mean_ms": total / len(s) * 1000 if s else 0.0,
+            "items_per_s": self.items_per_sample * len(s) / total if total > 0 else 0.0,
+            "peak_mb": self.peak_bytes / 1e6 if self.peak_bytes is not None else None,
+            "note": self.note,
+        }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description=(
+            "Benchmark the scraper offline against a generated local walkthrough.\n"
+            "Micro-benchmarks time the extraction, asset and PDF building blocks; end-to-end runs "
+            "start the CLI in a subprocess per scenario. Results can be saved with --json and "
+            "compared against an earlier run with --compare. 'peak MB' is traced Python memory for "
+            "micro-benchmarks (lxml's C allocations don't show) and peak RSS for end-to-end runs."
+        )
+    )
+    add_site_arguments(p)
+    p.add_argument("--suite", default="micro,e2e", help="Comma-separated suites to run: micro, e2e")
+    p.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help=f"Comma-separated end-to-end scenarios (choices: {','.join(SCENARIOS)})",
+    )
+    p.add_argument("--cli-args", default="", help="Extra arguments appended to every end-to-end CLI run")
+    p.add_argument("--repeat", type=int, default=5, help="Repetitions per micro-benchmark")
+    p.add_argument("--browser-pages", type=int, default=10, help="Pages loaded for the in-browser micro-benchmarks")
+    p.add_argument("--no-browser", action="store_true", help="Skip everything that needs Chromium")
+    p.add_argument(
+        "--headed",
+        action="store_true",
+        help="Run the CLI with a visible browser (needed for --challenge-pages in end-to-end runs)",
+    )
+    p.add_argument("--json", default=None, help="Write the results to this JSON file")
+    p.add_argument("--compare", default=None, help="Print changes relative to a JSON file written by --json")
+    return p
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    suites = {s.strip() for s in args.suite.split(",") if s.strip()}
+    options = site_options_from_args(args)
+    results: list[BenchResult] = []
+
+    with FakeSite(options) as site, tempfile.TemporaryDirectory() as tmp:
+        print(
+            f"Fake site: {options.pages} pages, {options.paragraphs} paragraphs and {options.images} x ~{options.image_kb} KiB "
+            f"images per page, {options.latency_ms:g} ms latency — {site.start_url}"
+        )
+        if "micro" in suites:
+            results += run_micro(site, Path(tmp), args)
+        if "e2e" in suites and not args.no_browser:
+            results += run_e2e(site, Path(tmp), args)
+
+    report = {r.name: r.summary() for r in results}
+    print_table(report, _load_baseline(args.compare))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Wrote {args.json}")
+    return 0
+
+
+def run_micro(site: FakeSite, tmp: Path, args: argparse.Namespace) -> list[BenchResult]:
+    results: list[BenchResult] = []
+    urls = site.page_urls()
+    prefix = walkthrough_prefix(site.start_url)
+
+    client = HttpClient(per_host_limit=8)
+    try:
+        htmls = [client.get(u).body.decode("utf-8") for u in urls]
+    finally:
+        client.close()
+
+    docs = [parse_html(h, u) for h, u in zip(htmls, urls)]
+    results.append(
+        measure_each("lxml parse_html", lambda i: parse_html(htmls[i], urls[i]), len(urls), args.repeat)
+    )
+    results.append(
+        measure_each(
+            "lxml extract_main_content_from_html",
+            lambda i: extract_main_content_from_html(docs[i], urls[i]),
+            len(urls),
+            args.repeat,
+        )
+    )
+    results.append(
+        measure_each(
+            "lxml find_next_url_in_html",
+            lambda i: find_next_url_in_html(docs[i], urls[i], allowed_prefix=prefix),
+            len(urls),
+            args.repeat,
+        )
+    )
+
+    pages = []
+    for doc, url in zip(docs, urls):
+        extracted = extract_main_content_from_html(doc, url)
+        pages.append(ScrapedPage(url=url, title=extracted.title, content_html=extracted.content_html))
+
+    results.append(
+        measure_whole(
+            "build_combined_html",
+            lambda _n: build_combined_html(doc_title="Bench", pages=pages, start_url=urls[0], base_href=None),
+            args.repeat,
+            items=len(pages),
+        )
+    )
+
+    with PageStore(pages, dir=tmp) as store:
+        results.append(
+            measure_whole(
+                "write_combined_html (PageStore)",
+                lambda n: write_combined_html(
+                    tmp / f"combined-{n}.html", doc_title="Bench", pages=store, start_url=urls[0], base_href=None
+                ),
+                args.repeat,
+                items=len(pages),
+            )
+        )
+
+    def localize_per_page(n: int) -> None:
+        client = HttpClient(per_host_limit=8)
+        try:
+            localize_page_assets(context=None, pages=pages, output_dir=str(tmp / f"assets-page-{n}"), client=client)
+        finally:
+            client.close()
+
+    def localize_combined(n: int) -> None:
+        html = build_combined_html(doc_title="Bench", pages=pages, start_url=urls[0], base_href=None)
+        client = HttpClient(per_host_limit=8)
+        try:
+            localize_assets(context=None, html=html, output_dir=str(tmp / f"assets-combined-{n}"), client=client)
+        finally:
+            client.close()
+
+    results.append(measure_whole("localize_page_assets", localize_per_page, args.repeat, items=len(pages)))
+    results.append(measure_whole("localize_assets (combined)", localize_combined, args.repeat, items=len(pages)))
+
+    if not args.no_browser:
+        try:
+            results += run_micro_browser(site, tmp, args, pages)
+        except Exception as e:
+            print(f"Skipping in-browser micro-benchmarks: {e}", file=sys.stderr)
+    return results
+
+
+def run_micro_browser(site: FakeSite, tmp: Path, args: argparse.Namespace, pages: list[ScrapedPage]) -> list[BenchResult]:
+    from playwright.sync_api import sync_playwright
+
+    results: list[BenchResult] = []
+    prefix = walkthrough_prefix(site.start_url)
+    urls = site.page_urls()[: max(1, args.browser_pages)]
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=not args.headed)
+        try:
+            context = browser.new_context()
+            tab = context.new_page()
+            extract = BenchResult("browser extract_main_content")
+            nxt = BenchResult("browser find_next_url")
+            analyze = BenchResult("browser analyze_page")
+            for url in urls:
+                tab.goto(url, wait_until="load")
+                for _ in range(max(1, args.repeat)):
+                    extract.samples_s.append(_timed(lambda: extract_main_content(tab)))
+                    nxt.samples_s.append(_timed(lambda: find_next_url(tab, allowed_prefix=prefix)))
+                    analyze.samples_s.append(_timed(lambda: analyze_page(tab, allowed_prefix=prefix)))
+            results += [extract, nxt, analyze]
+
+            if site.options.challenge_pages:
+                challenge_url = site.page_url(site.options.challenge_pages[0])
+                cleared = BenchResult("browser challenge clear", note=f"challenge takes {site.options.challenge_ms} ms")
+                for _ in range(max(1, args.repeat)):
+                    fresh = browser.new_context()
+                    try:
+                        challenge_tab = fresh.new_page()
+                        challenge_tab.goto(challenge_url, wait_until="domcontentloaded")
+                        cleared.samples_s.append(
+                            _timed(lambda: wait_for_challenge_to_clear(challenge_tab, timeout_ms=30_000))
+                        )
+                    finally:
+                        fresh.close()
+                results.append(cleared)
+
+            render = BenchResult("render_pdf", items_per_sample=len(pages))
+            html = build_combined_html(doc_title="Bench", pages=pages, start_url=pages[0].url, base_href=None)
+            for n in range(max(1, args.repeat)):
+                out = tmp / f"render-{n}.pdf"
+                render.samples_s.append(_timed(lambda: render_pdf(context=context, html=html, output_pdf=str(out))))
+            results.append(render)
+            context.close()
+        finally:
+            browser.close()
+    return results
+
+
+def run_e2e(site: FakeSite, tmp: Path, args: argparse.Namespace) -> list[BenchResult]:
+    results: list[BenchResult] = []
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    if site.options.challenge_pages and not args.headed:
+        print("Note: headless CLI runs stop at the challenge page by design; use --headed to time it.", file=sys.stderr)
+
+    for name in names:
+        if name not in SCENARIOS:
+            print(f"Unknown scenario: {name}", file=sys.stderr)
+            continue
+        run_dir = tmp / f"e2e-{name}"
+        metrics_path = run_dir / "metrics.json"
+        cmd = [
+            sys.executable,
+            "-m",
+            "walkthrough_scraper",
+            "--start",
+            site.start_url,
+            "--output",
+            str(run_dir / "out.pdf"),
+            "--delay",
+            "0",
+            "--max-pages",
+            str(site.options.pages + 1),
+            "--cache-dir",
+            str(run_dir / "cache"),
+            "--profile-dir",
+            str(run_dir / "profile"),
+            "--metrics-json",
+            str(metrics_path),
+            *SCENARIOS[name],
+            *args.cli_args.split(),
+        ]
+        if not args.headed:
+            cmd.append("--headless")
+
+        before = sum(site.requests.values())
+        t0 = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+        wall_s = time.perf_counter() - t0
+        served = sum(site.requests.values()) - before
+
+        if proc.returncode != 0 or not metrics_path.exists():
+            print(f"[e2e {name}] exited with {proc.returncode}:\n{proc.stderr[-2000:]}", file=sys.stderr)
+            continue
+
+        metrics = json.loads(metrics_path.read_text(encoding="utf-8"))
+        page_times = [sum(p.get("timings", {}).values()) for p in metrics["pages"]]
+        peak = max(metrics.get("peak_rss_bytes") or 0, metrics.get("peak_rss_children_bytes") or 0) or None
+        # One sample per page (its crawl stages); throughput is over the whole run, PDF included.
+        result = BenchResult(
+            f"e2e {name}",
+            samples_s=page_times,
+            peak_bytes=peak,
+            note=f"wall {wall_s:.1f}s, {len(page_times) / wall_s:.1f} pages/s, {served} requests",
+        )
+        results.append(result)
+    return results
+
+
+def measure_each(name: str, fn: Callable[[int], object], count: int, repeat: int) -> BenchResult:
+    """Time fn(i) for every item, repeat times over; peak memory of one pass."""
+
+    result = BenchResult(name)
+    for _ in range(max(1, repeat)):
+        for i in range(count):
+            result.samples_s.append(_timed(lambda: fn(i)))
+    tracemalloc.start()
+    for i in range(count):
+        fn(i)
+    result.peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result
+
+
+def measure_whole(name: str, fn: Callable[[int], object], repeat: int, *, items: int) -> BenchResult:
+    result = BenchResult(name, items_per_sample=items)
+    for n in range(max(1, repeat)):
+        result.samples_s.append(_timed(lambda: fn(n)))
+    tracemalloc.start()
+    fn(repeat)
+    result.peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result
+
+
+def print_table(report: dict, baseline: dict | None) -> None:
+    header = f"{'benchmark':<38} {'n':>5} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'mean ms':>9} {'items/s':>9} {'peak MB':>8}"
+    print()
+    print(header)
+    print("-" * len(header))
+    for name, r in report.items():
+        peak = f"{r['peak_mb']:8.1f}" if r["peak_mb"] is not None else f"{'-':>8}"
+        line = (
+            f"{name:<38} {r['n']:>5} {r['p50_ms']:9.2f} {r['p90_ms']:9.2f} {r['p99_ms']:9.2f} "
+            f"{r['mean_ms']:9.2f} {r['items_per_s']:9.1f} {peak}"
+        )
+        if baseline and name in baseline:
+            line += f"   p50 {_delta(baseline[name]['p50_ms'], r['p50_ms'])}, items/s {_delta(baseline[name]['items_per_s'], r['items_per_s'])}"
+        print(line)
+        if r["note"]:
+            print(f"{'':<38}   {r['note']}")
+
+
+def _timed(fn: Callable[[], object]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    # Nearest-rank percentile.
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _delta(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.0f}%"
+
+
+def _load_baseline(path: str | None) -> dict | None:
+    if not path:
+        return None
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
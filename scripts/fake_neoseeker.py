@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import argparse
+from collections import Counter
+from dataclasses import dataclass
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import random
+import struct
+import threading
+import time
+from urllib.parse import urlparse
+import zlib
+
+
+NEXT_STYLES = ("anchor", "rel", "link", "arrow")
+
+_WORDS = (
+    "walk north past the inn and talk to the guard before opening the chest on the ledge "
+    "the boss is weak to fire so equip the ring you found earlier and keep a healer in reserve"
+).split()
+
+_CSS = "body{font-family:sans-serif} .layout{display:flex} .sidebar{width:220px} #content{flex:1}"
+
+# Stands in for the ad/analytics scripts: keeps mutating the DOM for a while after load.
+_ADS_JS = """
+(() => {
+  let n = 0;
+  const timer = setInterval(() => {
+    const slot = document.createElement('div');
+    slot.className = 'ad-slot';
+    slot.textContent = 'Advertisement ' + (++n);
+    document.body.appendChild(slot);
+    if (n >= 5) clearInterval(timer);
+  }, 150);
+})();
+"""
+
+
+@dataclass(frozen=True)
+class SiteOptions:
+    pages: int = 50
+    slug: str = "fake-game"
+    paragraphs: int = 40
+    images: int = 4
+    image_px: int = 640
+    image_kb: int = 60
+    next_style: str = "anchor"
+    toc: bool = True
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    challenge_pages: tuple[int, ...] = ()
+    challenge_ms: int = 1000
+
+
+class FakeSite:
+    """A local, deterministic stand-in for a paged Neoseeker walkthrough.
+
+    Pages live at /<slug>/Page_<i> with the content in #content, a pagination
+    block (Next markup per options.next_style), a sidebar chapter list, page
+    chrome the extractor should drop, and a script that keeps the DOM busy for
+    a moment like the real ad slots. Images are unique PNGs of roughly
+    image_kb KiB. Pages and images carry an ETag and honour If-None-Match.
+    Pages listed in challenge_pages answer with a "Just a moment..." page
+    until the browser has the clearance cookie, which the challenge sets
+    itself after challenge_ms.
+
+    Every response waits latency_ms (+ up to jitter_ms). Request counts per
+    kind are kept in `requests`.
+    """
+
+    def __init__(self, options: SiteOptions, *, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.options = options
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+        self._images: dict[tuple[int, int], bytes] = {}
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.site = self
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def start_url(self) -> str:
+        return self.page_url(0)
+
+    @property
+    def index_url(self) -> str:
+        return f"{self.base_url}/{self.options.slug}/"
+
+    def page_url(self, i: int) -> str:
+        return f"{self.base_url}/{self.options.slug}/Page_{i}"
+
+    def page_urls(self) -> list[str]:
+        return [self.page_url(i) for i in range(self.options.pages)]
+
+    def start(self) -> "FakeSite":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-neoseeker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeSite":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def page_html(self, i: int) -> str:
+        o = self.options
+        title = f"Chapter {i + 1}"
+        has_next = i + 1 < o.pages
+        next_href = f"Page_{i + 1}"
+
+        head_next = f'<link rel="next" href="{next_href}">' if has_next and o.next_style == "link" else ""
+        pager = []
+        if i > 0:
+            pager.append(f'<a href="Page_{i - 1}">Previous</a>')
+        if has_next:
+            pager.append(
+                {
+                    "anchor": f'<a href="{next_href}">Next</a>',
+                    "rel": f'<a rel="next" href="{next_href}">Continue</a>',
+                    "link": f'<a href="{next_href}">Continue</a>',
+                    "arrow": f'<a href="{next_href}">›</a>',
+                }[o.next_style]
+            )
+
+        rnd = random.Random(i)
+        body = []
+        step = max(1, o.paragraphs // max(1, o.images)) if o.images else 0
+        for j in range(o.paragraphs):
+            words = " ".join(rnd.choice(_WORDS) for _ in range(60))
+            body.append(f"<p>{escape(words)}.</p>")
+            k = j // step if step else 0
+            if step and j % step == 0 and k < o.images:
+                body.append(f'<figure><img src="/img/{i}-{k}.png" alt="Screenshot {k + 1}"></figure>')
+
+        toc = ""
+        if o.toc:
+            items = "".join(f'<li><a href="/{o.slug}/Page_{n}">Chapter {n + 1}</a></li>' for n in range(o.pages))
+            toc = f'<aside class="sidebar"><div class="toc"><ul>{items}</ul></div></aside>'
+
+        return (
+            "<!doctype html><html><head>"
+            f'<meta charset="utf-8"><title>{title} - Fake Game Walkthrough - Neoseeker</title>'
+            f'<link rel="stylesheet" href="/static/site.css">{head_next}'
+            "</head><body>"
+            '<header><nav class="site-nav"><a href="/">Home</a> <a href="/forums/">Forums</a></nav></header>'
+            f'<div class="layout">{toc}'
+            f'<div id="content"><h1>{title}</h1>{"".join(body)}'
+            f'<div class="pagination">{" ".join(pager)}</div></div>'
+            "</div>"
+            "<footer>Fake Neoseeker footer</footer>"
+            '<script src="/static/ads.js"></script>'
+            "</body></html>"
+        )
+
+    def index_html(self) -> str:
+        o = self.options
+        items = "".join(f'<li><a href="/{o.slug}/Page_{n}">Chapter {n + 1}</a></li>' for n in range(o.pages))
+        return (
+            "<!doctype html><html><head><meta charset=\"utf-8\"><title>Fake Game Walkthrough - Neoseeker</title></head>"
+            f'<body><div id="content"><h1>Fake Game Walkthrough</h1><ol class="toc">{items}</ol>'
+            f'<div class="pagination"><a href="/{o.slug}/Page_0">Next</a></div></div></body></html>'
+        )
+
+    def challenge_html(self) -> str:
+        return (
+            "<!doctype html><html><head><title>Just a moment...</title></head><body>"
+            "<h1>Checking your browser before accessing the site.</h1>"
+            "<p>This process is automatic. Security verification in progress.</p>"
+            "<script>setTimeout(() => {"
+            "document.cookie = 'fake_clearance=1; path=/'; location.reload();"
+            f"}}, {int(self.options.challenge_ms)});</script>"
+            "</body></html>"
+        )
+
+    def image_bytes(self, i: int, k: int) -> bytes:
+        with self._lock:
+            data = self._images.get((i, k))
+            if data is None:
+                data = self._images[(i, k)] = _png(self.options.image_px, self.options.image_kb, seed=i * 1000 + k)
+            return data
+
+    def _delay(self) -> None:
+        o = self.options
+        wait_ms = o.latency_ms + (random.random() * o.jitter_ms if o.jitter_ms else 0.0)
+        if wait_ms > 0:
+            time.sleep(wait_ms / 1000)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # noqa: N802 (http.server API)
+        site: FakeSite = self.server.site
+        o = site.options
+        site._delay()
+        path = urlparse(self.path).path
+
+        if path == "/static/site.css":
+            return self._send("css", 200, _CSS.encode(), "text/css")
+        if path == "/static/ads.js":
+            return self._send("script", 200, _ADS_JS.encode(), "application/javascript")
+        if path.startswith("/img/") and path.endswith(".png"):
+            try:
+                i, k = (int(n) for n in path[len("/img/") : -len(".png")].split("-"))
+            except ValueError:
+                return self._send("other", 404, b"not found", "text/plain")
+            etag = f'"img-{i}-{k}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send("image_304", 304, b"", "image/png", {"ETag": etag})
+            return self._send("image", 200, site.image_bytes(i, k), "image/png", {"ETag": etag})
+
+        prefix = f"/{o.slug}/"
+        if path == prefix:
+            return self._send("index", 200, site.index_html().encode(), "text/html; charset=utf-8")
+        if path.startswith(prefix + "Page_"):
+            try:
+                i = int(path[len(prefix + "Page_") :])
+            except ValueError:
+                i = -1
+            if not 0 <= i < o.pages:
+                return self._send("other", 404, b"not found", "text/plain")
+            if i in o.challenge_pages and "fake_clearance=1" not in (self.headers.get("Cookie") or ""):
+                return self._send("challenge", 503, site.challenge_html().encode(), "text/html; charset=utf-8")
+            etag = f'"page-{i}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send("page_304", 304, b"", "text/html; charset=utf-8", {"ETag": etag})
+            return self._send("page", 200, site.page_html(i).encode(), "text/html; charset=utf-8", {"ETag": etag})
+
+        return self._send("other", 404, b"not found", "text/plain")
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _send(self, kind: str, status: int, body: bytes, content_type: str, headers: dict[str, str] | None = None) -> None:
+        site: FakeSite = self.server.site
+        with site._lock:
+            site.requests[kind] += 1
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+def _png(width: int, kb: int, *, seed: int) -> bytes:
+    """An RGB PNG about kb KiB large (random pixels don't compress)."""
+
+    width = max(1, width)
+    height = max(1, kb * 1024 // (width * 3))
+    rnd = random.Random(seed)
+    raw = b"".join(b"\x00" + rnd.randbytes(width * 3) for _ in range(height))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+def add_site_arguments(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--pages", type=int, default=50, help="Number of walkthrough pages")
+    p.add_argument("--paragraphs", type=int, default=40, help="Text paragraphs per page")
+    p.add_argument("--images", type=int, default=4, help="Images per page")
+    p.add_argument("--image-px", type=int, default=640, help="Image width in pixels")
+    p.add_argument("--image-kb", type=int, default=60, help="Approximate size of each image")
+    p.add_argument("--next-style", choices=NEXT_STYLES, default="anchor", help="Markup of the Next link")
+    p.add_argument("--no-toc", action="store_true", help="Leave out the sidebar chapter list")
+    p.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every response")
+    p.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra delay (0..jitter) per response")
+    p.add_argument(
+        "--challenge-pages",
+        default="",
+        help="Comma-separated page numbers that show a 'Just a moment...' page until it clears itself",
+    )
+    p.add_argument("--challenge-ms", type=int, default=1000, help="How long the challenge page takes to clear")
+
+
+def site_options_from_args(args: argparse.Namespace) -> SiteOptions:
+    return SiteOptions(
+        pages=args.pages,
+        paragraphs=args.paragraphs,
+        images=args.images,
+        image_px=args.image_px,
+        image_kb=args.image_kb,
+        next_style=args.next_style,
+        toc=not args.no_toc,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        challenge_pages=tuple(int(n) for n in args.challenge_pages.split(",") if n.strip()),
+        challenge_ms=args.challenge_ms,
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Serve a synthetic Neoseeker-like walkthrough on localhost.")
+    p.add_argument("--port", type=int, default=8765)
+    add_site_arguments(p)
+    return p
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    site = FakeSite(site_options_from_args(args), port=args.port).start()
+    print(f"Serving {args.pages} pages; start URL: {site.start_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,19 +1,41 @@
 from __future__ import annotations
 
 import argparse
+from dataclasses import asdict
+import json
 from pathlib import Path
+import sys
 
-from pypdf import PdfReader, PdfWriter
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from walkthrough_scraper.pdfmerge import merge_pdfs  # noqa: E402
 
 
 def build_parser() -> argparse.ArgumentParser:
-    p = argparse.ArgumentParser(description="Merge multiple PDFs into one.")
+    p = argparse.ArgumentParser(
+        description=(
+            "Merge multiple PDFs into one. Inputs are copied one at a time straight to the output, "
+            "so memory stays flat however many chapter PDFs there are."
+        )
+    )
     p.add_argument(
         "--input",
         required=True,
         help="Input folder containing PDFs (merged in filename sort order)",
     )
     p.add_argument("--output", required=True, help="Output PDF path")
+    p.add_argument(
+        "--no-bookmarks",
+        action="store_true",
+        help="Don't add a bookmark per input file (titled with the file name)",
+    )
+    p.add_argument(
+        "--no-dedupe",
+        action="store_true",
+        help="Keep identical streams (fonts, images) from different inputs as separate copies",
+    )
+    p.add_argument("--stats-json", default=None, help="Also write the timing and size statistics to this JSON file")
     return p
 
 
@@ -21,23 +43,22 @@ def main() -> int:
     args = build_parser().parse_args()
     in_dir = Path(args.input)
     out_pdf = Path(args.output)
-    out_pdf.parent.mkdir(parents=True, exist_ok=True)
 
-    pdfs = sorted([p for p in in_dir.glob("*.pdf") if p.is_file()])
+    pdfs = sorted([p for p in in_dir.glob("*.pdf") if p.is_file() and p.resolve() != out_pdf.resolve()])
     if not pdfs:
         raise SystemExit(f"No PDFs found in: {in_dir}")
 
-    writer = PdfWriter()
-
-    for pdf in pdfs:
-        reader = PdfReader(str(pdf))
-        for page in reader.pages:
-            writer.add_page(page)
-
-    with out_pdf.open("wb") as f:
-        writer.write(f)
+    stats = merge_pdfs(
+        pdfs,
+        out_pdf,
+        bookmarks=None if args.no_bookmarks else [p.stem for p in pdfs],
+        dedupe=not args.no_dedupe,
+    )
 
     print(f"Merged {len(pdfs)} PDFs into: {out_pdf}")
+    print(stats.summary())
+    if args.stats_json:
+        Path(args.stats_json).write_text(json.dumps(asdict(stats), indent=2), encoding="utf-8")
     return 0
 
 
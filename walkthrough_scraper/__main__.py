@@ -5,4 +5,6 @@ import sys
 from .cli import main
 
 
-raise SystemExit(main(sys.argv[1:]))
+# Guarded so spawned render workers can import this module without re-running the CLI.
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import threading
+import time
+
+
+@dataclass(frozen=True)
+class CachedAsset:
+    url: str
+    digest: str
+    ext: str
+    etag: str | None
+    last_modified: str | None
+    path: Path
+
+    def validators(self) -> dict[str, str]:
+        """Conditional request headers for revalidating this entry."""
+
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class AssetCache:
+    """Cross-run, content-addressed store for downloaded assets.
+
+    Bodies live under objects/ named by their SHA-256 alone, so identical bytes
+    served from different URLs (or with different extensions) are stored once.
+    index.json maps each URL to its object, extension and the validators needed
+    for conditional requests. Least recently used objects are evicted on save()
+    once the store exceeds max_bytes, and objects no entry references any more
+    (a URL whose body changed) are deleted.
+
+    Safe to use from several download threads at once. Caches opened on the
+    same root in one process (batch and serve jobs) share one in-memory index,
+    and only the last of them to save() evicts, so a running job never loses
+    an object it is about to link. close() (or leaving the with block) ends
+    this instance's share; hits and revalidated are counted per instance.
+    """
+
+    def __init__(self, root: str | Path, *, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.tmp_dir = self.root / "tmp"
+        self.index_path = self.root / "index.json"
+        self.max_bytes = max(0, max_bytes)
+        self.hits = 0
+        self.revalidated = 0
+
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self._key = self.root.resolve()
+        with _shared_lock:
+            shared = _shared.get(self._key)
+            if shared is None:
+                shared = _shared[self._key] = _SharedIndex(_read_index(self.index_path))
+            shared.users += 1
+        self._shared: _SharedIndex | None = shared
+        self._lock = shared.lock
+        self._index = shared.entries
+
+    def __enter__(self) -> AssetCache:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with _shared_lock:
+            if self._shared is None:
+                return
+            self._shared.users -= 1
+            if not self._shared.users:
+                _shared.pop(self._key, None)
+            self._shared = None
+
+    def lookup(self, url: str) -> CachedAsset | None:
+        with self._lock:
+            entry = self._index.get(url)
+        if not entry:
+            return None
+        path = self._object_path(entry["digest"])
+        if not path.exists():
+            return None
+        return CachedAsset(
+            url=url,
+            digest=entry["digest"],
+            ext=entry.get("ext", ""),
+            etag=entry.get("etag"),
+            last_modified=entry.get("last_modified"),
+            path=path,
+        )
+
+    def touch(self, url: str, *, revalidated: bool = False) -> None:
+        with self._lock:
+            entry = self._index.get(url)
+            if entry:
+                entry["used_at"] = time.time()
+                self.hits += 1
+                if revalidated:
+                    self.revalidated += 1
+
+    def new_tmp_path(self) -> Path:
+        return self.tmp_dir / f"{os.getpid()}-{threading.get_ident()}-{time.monotonic_ns()}.part"
+
+    def ingest(
+        self,
+        url: str,
+        tmp_path: Path,
+        *,
+        ext: str,
+        etag: str | None,
+        last_modified: str | None,
+    ) -> CachedAsset:
+        """Move a freshly downloaded body into the store and index it under url."""
+
+        digest = file_sha256(tmp_path)
+        path = self._object_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            tmp_path.unlink(missing_ok=True)
+        else:
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            self._index[url] = {
+                "digest": digest,
+                "ext": ext,
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": path.stat().st_size,
+                "used_at": time.time(),
+            }
+        return CachedAsset(url=url, digest=digest, ext=ext, etag=etag, last_modified=last_modified, path=path)
+
+    def link_into(self, cached: CachedAsset, dest: Path) -> None:
+        link_or_copy(cached.path, dest)
+
+    def save(self) -> int:
+        """Evict least recently used objects down to max_bytes and persist the index.
+
+        Entries that other processes saved in the meantime are merged in first.
+        Eviction, and deleting unreferenced objects, is left to the last job in
+        this process still using the cache. Returns the number of evicted objects.
+        """
+
+        with self._lock:
+            for url, entry in _read_index(self.index_path).items():
+                mine = self._index.get(url)
+                if mine is None or float(entry.get("used_at", 0) or 0) > float(mine.get("used_at", 0) or 0):
+                    self._index[url] = entry
+            with _shared_lock:
+                last_user = self._shared is None or self._shared.users <= 1
+
+            objects: dict[str, dict] = {}
+            for url, entry in self._index.items():
+                obj = objects.setdefault(
+                    entry["digest"], {"size": int(entry.get("size", 0) or 0), "used_at": 0.0, "urls": []}
+                )
+                obj["used_at"] = max(obj["used_at"], float(entry.get("used_at", 0) or 0))
+                obj["urls"].append(url)
+
+            total = sum(o["size"] for o in objects.values())
+            evicted = 0
+            for digest, obj in sorted(objects.items(), key=lambda kv: kv[1]["used_at"]):
+                if not last_user or self.max_bytes <= 0 or total <= self.max_bytes:
+                    break
+                self._object_path(digest).unlink(missing_ok=True)
+                for url in obj["urls"]:
+                    self._index.pop(url, None)
+                del objects[digest]
+                total -= obj["size"]
+                evicted += 1
+            if last_user:
+                self._sweep(set(objects))
+
+            # Unique per writer: separate processes may save the same cache at once.
+            tmp = self.index_path.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(self._index), encoding="utf-8")
+            os.replace(tmp, self.index_path)
+        return evicted
+
+    def _sweep(self, referenced: set[str]) -> None:
+        """Delete objects no index entry references, and abandoned downloads.
+
+        Files younger than _SWEEP_GRACE_S are kept: another process may have
+        just ingested them without having saved its index yet.
+        """
+
+        cutoff = time.time() - _SWEEP_GRACE_S
+        for path in [*self.objects_dir.glob("*/*"), *self.tmp_dir.glob("*.part")]:
+            if path.parent != self.tmp_dir and path.name in referenced:
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                continue
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+
+class _SharedIndex:
+    def __init__(self, entries: dict[str, dict]) -> None:
+        self.lock = threading.Lock()
+        self.entries = entries
+        self.users = 0
+
+
+# How old an unreferenced object or download must be before save() deletes it.
+_SWEEP_GRACE_S = 3600.0
+
+# One index per cache root in this process, shared by every AssetCache opened on it.
+_shared: dict[Path, _SharedIndex] = {}
+_shared_lock = threading.Lock()
+
+
+def _read_index(path: Path) -> dict[str, dict]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def link_or_copy(src: Path, dest: Path) -> None:
+    """Materialize src at dest: hardlink, else copy.
+
+    Goes through a temporary name and os.replace, so threads materializing the
+    same dest at once all succeed. No symlinks: cache eviction would leave
+    earlier outputs dangling.
+    """
+
+    if dest.exists():
+        return
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
@@ -1,15 +1,30 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 import hashlib
 import mimetypes
 from pathlib import Path
 import re
-from typing import Iterable
+from typing import Iterable, MutableMapping, Sequence
 from urllib.parse import urlparse
 
 from bs4 import BeautifulSoup
+import lxml.html
 from playwright.sync_api import BrowserContext
 
+from .asset_cache import AssetCache, CachedAsset
+from .fetch import FetchResult, HttpClient
+from .images import ImageOptions, ImageStats, optimize_images
+from .model import ScrapedPage
+from .neoseeker import parse_fragment, serialize_fragment
+from .ratelimit import HostRateLimiter
+from .store import PageStore
+
+
+# Statuses a challenge or rate limit answers with; the browser session may still get through.
+_BROWSER_RETRY_STATUSES = (401, 403, 429, 503)
+
 
 def localize_assets(
     *,
@@ -19,68 +34,376 @@ def localize_assets(
     asset_subdir: str = "assets",
     url_allowlist_prefixes: Iterable[str] = ("http://", "https://"),
     referer_url: str | None = None,
+    seen: dict[str, str] | None = None,
+    workers: int = 8,
+    per_host_limit: int = 4,
+    client: HttpClient | None = None,
+    cache: AssetCache | None = None,
+    image_options: ImageOptions | None = None,
+    image_stats: ImageStats | None = None,
+    limiter: HostRateLimiter | None = None,
 ) -> tuple[str, int]:
     """Download images referenced by HTML and rewrite to local paths.
 
     This makes the combined HTML (and resulting PDF) usable offline.
 
-    Only rewrites <img src="..."> for http(s) URLs.
+    Only rewrites <img src="..."> and inline-style url(...) for http(s) URLs. All
+    URLs are collected first, downloaded by a pool of `workers` threads (at most
+    `per_host_limit` at a time per host) and the HTML is rewritten afterwards.
+    Pass the same `seen` dict to several calls (e.g. one per PDF chunk) to avoid
+    downloading an asset twice; URLs that answered with a definitive 4xx are
+    recorded there with an empty path and left pointing at the site. With a `cache`, bodies are revalidated against
+    and stored in the cross-run AssetCache, and local files are named by content
+    hash so identical images behind different URLs are embedded once. With
+    `image_options`, downloaded images are downscaled/re-encoded for print.
+    With a `limiter`, downloads share the per-host pacing used for page loads
+    (a passed-in `client` is expected to carry it already).
     """
 
     out_dir = Path(output_dir)
     assets_dir = out_dir / asset_subdir
     assets_dir.mkdir(parents=True, exist_ok=True)
+    allow = tuple(url_allowlist_prefixes)
 
     soup = BeautifulSoup(html, "lxml")
 
-    downloaded = 0
-    seen: dict[str, str] = {}
+    if seen is None:
+        seen = {}
+
+    images, styled, urls = _collect_asset_refs(soup, allow)
+
+    # Avoid re-downloading duplicates.
+    downloaded = _fetch_into_seen(
+        context=context,
+        urls=urls,
+        seen=seen,
+        out_dir=out_dir,
+        assets_dir=assets_dir,
+        referer_url=referer_url,
+        workers=workers,
+        per_host_limit=per_host_limit,
+        client=client,
+        cache=cache,
+        image_options=image_options,
+        image_stats=image_stats,
+        limiter=limiter,
+    )
+
+    _apply_local_paths(images, styled, seen)
+
+    return str(soup), downloaded
+
+
+def localize_page_assets(
+    *,
+    context: BrowserContext,
+    pages: Iterable[ScrapedPage],
+    output_dir: str,
+    asset_subdir: str = "assets",
+    url_allowlist_prefixes: Iterable[str] = ("http://", "https://"),
+    referer_url: str | None = None,
+    seen: dict[str, str] | None = None,
+    workers: int = 8,
+    per_host_limit: int = 4,
+    client: HttpClient | None = None,
+    cache: AssetCache | None = None,
+    image_options: ImageOptions | None = None,
+    image_stats: ImageStats | None = None,
+    limiter: HostRateLimiter | None = None,
+    into: PageStore | None = None,
+) -> tuple[Sequence[ScrapedPage], int]:
+    """Like localize_assets, but one ScrapedPage.content_html at a time.
+
+    The combined document is never parsed: a first pass collects URLs page by
+    page, everything is downloaded at once, and a second pass rewrites each
+    page. Only one page's tree is alive at any moment, so memory doesn't grow
+    with walkthrough length. Pages are parsed with lxml directly (much cheaper
+    than BeautifulSoup), and pages without any <img> or url( skip parsing.
+
+    The rewritten pages are appended to `into` when given (e.g. a PageStore)
+    and returned as a new list otherwise.
+    """
+
+    if not isinstance(pages, Sequence):
+        pages = list(pages)
+    out_dir = Path(output_dir)
+    assets_dir = out_dir / asset_subdir
+    assets_dir.mkdir(parents=True, exist_ok=True)
+    allow = tuple(url_allowlist_prefixes)
+
+    if seen is None:
+        seen = {}
+
+    urls: list[str] = []
+    for page in pages:
+        if not _may_reference_assets(page.content_html):
+            continue
+        _images, _styled, page_urls = _collect_asset_refs(parse_fragment(page.content_html), allow)
+        urls.extend(page_urls)
+
+    downloaded = _fetch_into_seen(
+        context=context,
+        urls=list(dict.fromkeys(urls)),
+        seen=seen,
+        out_dir=out_dir,
+        assets_dir=assets_dir,
+        referer_url=referer_url,
+        workers=workers,
+        per_host_limit=per_host_limit,
+        client=client,
+        cache=cache,
+        image_options=image_options,
+        image_stats=image_stats,
+        limiter=limiter,
+    )
+
+    localized = into if into is not None else []
+    for page in pages:
+        if not _may_reference_assets(page.content_html):
+            localized.append(page)
+            continue
+        root = parse_fragment(page.content_html)
+        images, styled, _urls = _collect_asset_refs(root, allow)
+        if any(seen.get(src) for _img, src in images) or styled:
+            _apply_local_paths(images, styled, seen)
+            page = replace(page, content_html=serialize_fragment(root))
+        localized.append(page)
+
+    return localized, downloaded
+
 
-    for img in soup.find_all("img"):
+def _may_reference_assets(html: str) -> bool:
+    return "<img" in html or "url(" in html
+
+
+def _attrs(el) -> MutableMapping[str, str]:
+    # BeautifulSoup tags and lxml elements keep their attributes in different places.
+    return el.attrib if isinstance(el, lxml.html.HtmlElement) else el.attrs
+
+
+def _collect_asset_refs(root, allow: tuple[str, ...]) -> tuple[list, list, list[str]]:
+    """Find rewritable <img> tags and url(...) styles; return them plus their URLs in order.
+
+    root is either a BeautifulSoup document or an lxml element.
+    """
+
+    is_lxml = isinstance(root, lxml.html.HtmlElement)
+    img_tags = root.iter("img") if is_lxml else root.find_all("img")
+    styled_tags = (el for el in root.iter() if el.get("style")) if is_lxml else root.find_all(style=True)
+
+    images: list[tuple[object, str]] = []
+    for img in img_tags:
         src = _best_image_url(img)
         if not src:
             continue
         if src.startswith("data:"):
             continue
-        if not any(src.startswith(p) for p in url_allowlist_prefixes):
+        if not src.startswith(allow):
             continue
+        images.append((img, src))
 
-        # Avoid re-downloading duplicates.
-        if src in seen:
-            _rewrite_img(img, seen[src])
+    # Inline CSS background-image: url(...)
+    styled = []
+    style_urls: list[str] = []
+    for el in styled_tags:
+        style = (el.get("style") or "")
+        if "url(" not in style:
             continue
+        urls = _inline_style_urls(style, allow)
+        if urls:
+            styled.append(el)
+            style_urls.extend(urls)
+
+    return images, styled, [src for _img, src in images] + style_urls
+
+
+def _apply_local_paths(images: list, styled: list, seen: dict[str, str]) -> None:
+    for img, src in images:
+        if seen.get(src):
+            _rewrite_img(img, seen[src])
+
+    for el in styled:
+        attrs = _attrs(el)
+        attrs["style"] = _rewrite_inline_style_urls(attrs["style"], seen)
+
+
+def _fetch_into_seen(
+    *,
+    context: BrowserContext,
+    urls: list[str],
+    seen: dict[str, str],
+    out_dir: Path,
+    assets_dir: Path,
+    referer_url: str | None,
+    workers: int,
+    per_host_limit: int,
+    client: HttpClient | None,
+    cache: AssetCache | None,
+    image_options: ImageOptions | None,
+    image_stats: ImageStats | None,
+    limiter: HostRateLimiter | None = None,
+) -> int:
+    """Download the URLs not already in seen and record their local paths there."""
+
+    wanted = [u for u in dict.fromkeys(urls) if u not in seen]
+    fetched, gone = _download_all(
+        context=context,
+        urls=wanted,
+        assets_dir=assets_dir,
+        referer_url=referer_url,
+        workers=workers,
+        per_host_limit=per_host_limit,
+        client=client,
+        cache=cache,
+        limiter=limiter,
+    )
+    downloaded = len(fetched)
+    if image_options is not None:
+        fetched, _stats = optimize_images(fetched, base_dir=out_dir, options=image_options, stats=image_stats)
+    seen.update(fetched)
+    # Known-missing: later calls with the same seen don't ask again.
+    seen.update((url, "") for url in gone)
+    return downloaded
+
+
+def _download_all(
+    *,
+    context: BrowserContext,
+    urls: list[str],
+    assets_dir: Path,
+    referer_url: str | None,
+    workers: int,
+    per_host_limit: int,
+    client: HttpClient | None,
+    cache: AssetCache | None = None,
+    limiter: HostRateLimiter | None = None,
+) -> tuple[dict[str, str], set[str]]:
+    """Download urls concurrently.
+
+    Returns url -> local relative path for the ones that worked, and the URLs
+    that failed with a definitive 4xx (not worth asking again).
+    """
 
+    if not urls:
+        return {}, set()
+
+    own_client = client is None
+    if client is None:
+        client = HttpClient.from_context(context, per_host_limit=per_host_limit, limiter=limiter)
+
+    fetched: dict[str, str] = {}
+    statuses: dict[str, int] = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = pool.map(
+                lambda u: (
+                    u,
+                    _download_with_client(client=client, url=u, assets_dir=assets_dir, referer_url=referer_url, cache=cache),
+                ),
+                urls,
+            )
+            for url, (local_rel, status) in results:
+                if local_rel:
+                    fetched[url] = local_rel
+                else:
+                    statuses[url] = status
+    finally:
+        if own_client:
+            client.close()
+
+    # Refusals that only the real browser session may get past (a challenge,
+    # rate limiting) get one more try through the context. Dead links and
+    # network errors would just fail again, one slow request at a time.
+    for url, status in statuses.items():
+        if status not in _BROWSER_RETRY_STATUSES:
+            continue
         local_rel = _download_to_assets(
             context=context,
-            url=src,
+            url=url,
             assets_dir=assets_dir,
             referer_url=referer_url,
+            cache=cache,
+            limiter=limiter,
         )
-        if not local_rel:
-            continue
+        if local_rel:
+            fetched[url] = local_rel
 
-        _rewrite_img(img, local_rel)
-        seen[src] = local_rel
-        downloaded += 1
+    gone = {
+        url for url, status in statuses.items() if 400 <= status < 500 and status not in _BROWSER_RETRY_STATUSES
+    }
+    return fetched, gone
 
-    # Inline CSS background-image: url(...)
-    for el in soup.find_all(style=True):
-        style = (el.get("style") or "")
-        if "url(" not in style:
-            continue
-        new_style, count = _rewrite_inline_style_urls(
-            context=context,
-            style=style,
-            assets_dir=assets_dir,
-            seen=seen,
-            url_allowlist_prefixes=url_allowlist_prefixes,
-            referer_url=referer_url,
+
+def _download_with_client(
+    *,
+    client: HttpClient,
+    url: str,
+    assets_dir: Path,
+    referer_url: str | None = None,
+    cache: AssetCache | None = None,
+) -> tuple[str | None, int]:
+    """Returns the local relative path (None on failure) and the response status."""
+
+    headers = {}
+    if referer_url:
+        headers["Referer"] = referer_url
+
+    if cache is not None:
+        return _download_via_cache(client=client, url=url, assets_dir=assets_dir, headers=headers, cache=cache)
+
+    def dest(result: FetchResult) -> Path:
+        ext = _choose_extension(url=url, content_type=result.content_type)
+        return assets_dir / _safe_name(url, ext)
+
+    result = client.get(url, headers=headers, dest=dest)
+    if not result.ok or result.path is None:
+        return None, result.status
+    if not result.size:
+        result.path.unlink(missing_ok=True)
+        return None, result.status
+
+    # Use a relative path that survives HTML parsing and PDF rendering.
+    return f"{assets_dir.name}/{result.path.name}", result.status
+
+
+def _download_via_cache(
+    *,
+    client: HttpClient,
+    url: str,
+    assets_dir: Path,
+    headers: dict[str, str],
+    cache: AssetCache,
+) -> tuple[str | None, int]:
+    cached = cache.lookup(url)
+    if cached is not None:
+        headers = {**headers, **cached.validators()}
+
+    tmp_path = cache.new_tmp_path()
+    result = client.get(url, headers=headers, dest=tmp_path)
+
+    if cached is not None and (result.status == 304 or result.status == 0):
+        # Not modified, or the network failed and the last good copy is better than nothing.
+        tmp_path.unlink(missing_ok=True)
+        cache.touch(url, revalidated=result.status == 304)
+    elif result.ok and result.path is not None and result.size:
+        cached = cache.ingest(
+            url,
+            tmp_path,
+            ext=_choose_extension(url=url, content_type=result.content_type),
+            etag=result.headers.get("etag"),
+            last_modified=result.headers.get("last-modified"),
         )
-        if count:
-            el["style"] = new_style
-            downloaded += count
+    else:
+        tmp_path.unlink(missing_ok=True)
+        return None, result.status
 
-    return str(soup), downloaded
+    return _link_cached(cache, cached, assets_dir), result.status
+
+
+def _link_cached(cache: AssetCache, cached: CachedAsset, assets_dir: Path) -> str:
+    name = f"asset-{cached.digest[:24]}{cached.ext}"
+    cache.link_into(cached, assets_dir / name)
+    return f"{assets_dir.name}/{name}"
 
 
 def _download_to_assets(
@@ -89,16 +412,22 @@ def _download_to_assets(
     url: str,
     assets_dir: Path,
     referer_url: str | None = None,
+    cache: AssetCache | None = None,
+    limiter: HostRateLimiter | None = None,
 ) -> str | None:
     try:
         headers = {}
         if referer_url:
             headers["Referer"] = referer_url
+        if limiter is not None:
+            limiter.acquire(url)
         resp = context.request.get(url, timeout=60_000, headers=headers or None)
     except Exception:
         return None
 
     try:
+        if limiter is not None:
+            limiter.record(url, status=resp.status, retry_after=resp.headers.get("retry-after"))
         if not resp.ok:
             return None
 
@@ -109,6 +438,18 @@ def _download_to_assets(
         content_type = (resp.headers.get("content-type") or "").split(";")[0].strip().lower()
         ext = _choose_extension(url=url, content_type=content_type)
 
+        if cache is not None:
+            tmp_path = cache.new_tmp_path()
+            tmp_path.write_bytes(body)
+            cached = cache.ingest(
+                url,
+                tmp_path,
+                ext=ext,
+                etag=resp.headers.get("etag"),
+                last_modified=resp.headers.get("last-modified"),
+            )
+            return _link_cached(cache, cached, assets_dir)
+
         name = _safe_name(url, ext)
         local_path = assets_dir / name
         local_path.write_bytes(body)
@@ -200,7 +541,8 @@ def _looks_like_placeholder(src: str) -> bool:
 
 
 def _rewrite_img(img, local_rel: str) -> None:
-    img["src"] = local_rel
+    attrs = _attrs(img)
+    attrs["src"] = local_rel
     # Remove srcset variants so Chromium doesn't try to fetch remote URLs.
     for key in (
         "srcset",
@@ -211,50 +553,32 @@ def _rewrite_img(img, local_rel: str) -> None:
         "data-echo",
         "data-url",
     ):
-        if key in img.attrs:
-            del img.attrs[key]
+        attrs.pop(key, None)
 
 
 _INLINE_URL_RE = re.compile(r"url\((?P<q>['\"]?)(?P<u>.*?)(?P=q)\)", re.IGNORECASE)
 
 
-def _rewrite_inline_style_urls(
-    *,
-    context: BrowserContext,
-    style: str,
-    assets_dir: Path,
-    seen: dict[str, str],
-    url_allowlist_prefixes: Iterable[str],
-    referer_url: str | None,
-) -> tuple[str, int]:
-    count = 0
-
-    def repl(m: re.Match[str]) -> str:
-        nonlocal count
+def _inline_style_urls(style: str, allow: tuple[str, ...]) -> list[str]:
+    urls = []
+    for m in _INLINE_URL_RE.finditer(style):
         u = (m.group("u") or "").strip()
         if not u or u.startswith("data:"):
-            return m.group(0)
-        if not any(u.startswith(p) for p in url_allowlist_prefixes):
-            return m.group(0)
-
-        if u in seen:
-            return f"url('{seen[u]}')"
+            continue
+        if not u.startswith(allow):
+            continue
+        urls.append(u)
+    return urls
 
-        local_rel = _download_to_assets(
-            context=context,
-            url=u,
-            assets_dir=assets_dir,
-            referer_url=referer_url,
-        )
-        if not local_rel:
-            return m.group(0)
 
-        seen[u] = local_rel
-        count += 1
-        return f"url('{local_rel}')"
+def _rewrite_inline_style_urls(style: str, seen: dict[str, str]) -> str:
+    def repl(m: re.Match[str]) -> str:
+        u = (m.group("u") or "").strip()
+        if seen.get(u):
+            return f"url('{seen[u]}')"
+        return m.group(0)
 
-    new_style = _INLINE_URL_RE.sub(repl, style)
-    return new_style, count
+    return _INLINE_URL_RE.sub(repl, style)
 
 
 def _choose_extension(*, url: str, content_type: str) -> str:
@@ -0,0 +1,420 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import asdict, dataclass
+import io
+import json
+import os
+from pathlib import Path
+import queue
+import sys
+import threading
+import time
+import traceback
+from typing import Any, TextIO
+
+from playwright.sync_api import BrowserContext, sync_playwright
+from playwright.sync_api import Error as PlaywrightError
+
+from .cli import build_parser as build_job_parser
+from .cli import connect_context, launch_context, run_job
+from .metrics import Metrics
+from .ratelimit import HostRateLimiter
+
+
+# Job options that describe the browser; a batch shares one, set on its own command line.
+_BROWSER_OPTIONS = ("cdp_url", "profile_dir", "browser", "headless")
+
+
+@dataclass
+class Job:
+    name: str
+    args: argparse.Namespace
+
+
+@dataclass
+class JobStatus:
+    name: str
+    output: str
+    log: str
+    state: str = "pending"  # pending, running, ok, failed, cancelled
+    exit_code: int | None = None
+    worker: int | None = None
+    started_at: float | None = None
+    finished_at: float | None = None
+    duration_s: float | None = None
+    pages: int = 0
+    error: str | None = None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="walkthrough-scraper batch",
+        description=(
+            "Build several walkthroughs in one process over one shared, warm browser. "
+            "Browser startup and the site's verification are paid once per batch."
+        ),
+    )
+    p.add_argument(
+        "manifest",
+        help=(
+            'JSON manifest: a list of jobs, or {"defaults": {...}, "jobs": [...]}. Job keys are the '
+            "scraper's long options with '_' or '-' (start or urls_file, output, selector, max_pages, ...); "
+            "true turns a flag on. An optional 'name' labels the job in the report."
+        ),
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help="Jobs run at the same time; each has its own connection and tabs in the shared browser",
+    )
+    p.add_argument(
+        "--report",
+        default=None,
+        help="Per-job status JSON, rewritten whenever a job starts or ends (default: <manifest>.report.json)",
+    )
+    p.add_argument(
+        "--log-dir",
+        default=None,
+        help="Directory for each job's output log (default: <output>.log next to each PDF)",
+    )
+    p.add_argument("--cdp-url", default=None, help="Run every job in an already running Chrome instead of launching one")
+    p.add_argument("--profile-dir", default=str(Path(".profile").resolve()), help="Persistent profile for the launched browser")
+    p.add_argument("--browser", choices=["chromium", "chrome"], default="chromium", help="Browser to launch")
+    p.add_argument("--headless", action="store_true", help="Launch the browser headless")
+    return p
+
+
+def job_argv(options: dict[str, Any], parser: argparse.ArgumentParser) -> list[str]:
+    """Turn a manifest job object into scraper command-line arguments.
+
+    Every key has to be the exact name of one of parser's options (no
+    abbreviations, no "key=value" smuggling); ValueError otherwise. Values are
+    attached with "=", so a value is never read as an option of its own.
+    """
+
+    known = {a.dest: a for a in parser._actions if a.option_strings and a.dest != "help"}
+    argv: list[str] = []
+    for key, value in options.items():
+        if key == "name":
+            continue
+        action = known.get(key)
+        if action is None:
+            raise ValueError(f"unknown option: {key!r}")
+        if value is None or value is False:
+            continue
+        flag = next(s for s in action.option_strings if s.startswith("--"))
+        if action.nargs == 0:
+            if value is not True:
+                raise ValueError(f"{key} is a switch; set it to true or false")
+            argv.append(flag)
+        else:
+            argv.append(f"{flag}={value}")
+    return argv
+
+
+def normalize_options(options: dict[str, Any]) -> dict[str, Any]:
+    return {str(k).replace("-", "_"): v for k, v in options.items()}
+
+
+def parse_job(parser: argparse.ArgumentParser, options: dict[str, Any], *, label: str) -> argparse.Namespace:
+    """Parse one job's (normalized) options with the scraper's parser; ValueError if invalid."""
+
+    browser_keys = [k for k in _BROWSER_OPTIONS if k in options]
+    if browser_keys:
+        raise ValueError(f"{label}: {', '.join(browser_keys)} apply to the shared browser, not to a job")
+    try:
+        argv = job_argv(options, parser)
+    except ValueError as e:
+        raise ValueError(f"{label}: {e}") from None
+    try:
+        return parser.parse_args(argv)
+    except SystemExit:
+        # argparse has already printed what is wrong.
+        raise ValueError(f"{label}: invalid options") from None
+
+
+def load_manifest(path: str | Path) -> list[Job]:
+    """Read and validate every job up front, so a typo fails before the browser starts."""
+
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    defaults: dict[str, Any] = {}
+    if isinstance(data, dict):
+        defaults = data.get("defaults") or {}
+        data = data.get("jobs")
+    if not isinstance(data, list) or not all(isinstance(j, dict) for j in data) or not isinstance(defaults, dict):
+        raise ValueError('manifest must be a list of job objects or {"defaults": {...}, "jobs": [...]}')
+
+    parser = build_job_parser(allow_abbrev=False)
+    jobs: list[Job] = []
+    outputs: set[Path] = set()
+    for n, raw in enumerate(data, start=1):
+        options = normalize_options({**defaults, **raw})
+        label = str(options.get("name") or f"job {n}")
+        args = parse_job(parser, options, label=label)
+        output = Path(args.output).resolve()
+        if output in outputs:
+            raise ValueError(f"{label}: another job already writes {args.output}")
+        outputs.add(output)
+        jobs.append(Job(name=str(options.get("name") or output.stem), args=args))
+    return jobs
+
+
+class SharedBrowser:
+    """The one browser a batch or server runs every job in.
+
+    Either an existing Chrome at cdp_url, or the persistent profile launched
+    once with a debugging port. Worker threads attach to `endpoint` over CDP
+    with their own Playwright instance, since the sync API is bound to the
+    thread that started it.
+    """
+
+    def __init__(self, *, cdp_url: str | None, profile_dir: str, headless: bool, browser: str) -> None:
+        self.cdp_url = cdp_url
+        self.profile_dir = Path(profile_dir).resolve()
+        self.headless = headless
+        self.browser = browser
+        self.endpoint = cdp_url or ""
+        self._playwright = None
+        self._context: BrowserContext | None = None
+
+    def start(self) -> str:
+        if self.cdp_url:
+            return self.endpoint
+        port_file = self.profile_dir / "DevToolsActivePort"
+        port_file.unlink(missing_ok=True)
+        self._playwright = sync_playwright().start()
+        self._context = launch_context(
+            self._playwright,
+            profile_dir=str(self.profile_dir),
+            headless=self.headless,
+            browser=self.browser,
+            extra_args=["--remote-debugging-port=0"],
+        )
+        self.endpoint = _wait_for_debugging_endpoint(port_file)
+        return self.endpoint
+
+    def close(self) -> None:
+        if self._playwright is None:
+            return
+        try:
+            if self._context is not None:
+                self._context.close()
+            self._playwright.stop()
+        except Exception:
+            pass
+        self._playwright = self._context = None
+
+
+class ThreadOutput(io.TextIOBase):
+    """sys.stdout/sys.stderr stand-in that sends each thread's writes to its own stream."""
+
+    def __init__(self, default: TextIO) -> None:
+        self.default = default
+        self._local = threading.local()
+
+    def route(self, stream: TextIO | None) -> None:
+        self._local.stream = stream
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        return (getattr(self._local, "stream", None) or self.default).write(s)
+
+    def flush(self) -> None:
+        (getattr(self._local, "stream", None) or self.default).flush()
+
+
+class _Report:
+    def __init__(self, path: Path, statuses: list[JobStatus], console: TextIO) -> None:
+        self.path = path
+        self.statuses = statuses
+        self.console = console
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def update(self, status: JobStatus, **fields: Any) -> None:
+        with self._lock:
+            for key, value in fields.items():
+                setattr(status, key, value)
+            self._write()
+
+    def write(self) -> None:
+        with self._lock:
+            self._write()
+
+    def _write(self) -> None:
+        data = {"started_at": self.started_at, "jobs": [asdict(s) for s in self.statuses]}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def say(self, message: str) -> None:
+        with self._lock:
+            print(message, file=self.console, flush=True)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        jobs = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Invalid manifest {args.manifest}: {e}", file=sys.stderr)
+        return 2
+    if not jobs:
+        print("The manifest has no jobs.", file=sys.stderr)
+        return 2
+
+    workers = max(1, min(int(args.workers), len(jobs)))
+    log_dir = Path(args.log_dir) if args.log_dir else None
+    statuses = [
+        JobStatus(
+            name=job.name,
+            output=job.args.output,
+            log=str((log_dir / f"{n:03d}-{job.name}.log") if log_dir else Path(job.args.output).with_suffix(".log")),
+        )
+        for n, job in enumerate(jobs, start=1)
+    ]
+    report_path = Path(args.report) if args.report else Path(args.manifest).with_suffix(".report.json")
+    console = sys.stdout
+    report = _Report(report_path, statuses, console)
+    report.write()
+
+    # One limiter for the batch, so jobs on the same site share its pace instead of adding up.
+    limiter = HostRateLimiter(
+        max_interval_s=max(max(0.0, job.args.max_delay) for job in jobs),
+        on_backoff=lambda host, reason, interval_s: report.say(
+            f"Slowing down requests to {host} ({reason}): one every {interval_s:.1f}s"
+        ),
+    )
+    pending: queue.Queue[int] = queue.Queue()
+    for n in range(len(jobs)):
+        pending.put(n)
+
+    stdout, stderr = ThreadOutput(sys.stdout), ThreadOutput(sys.stderr)
+    sys.stdout, sys.stderr = stdout, stderr
+    browser = SharedBrowser(
+        cdp_url=args.cdp_url, profile_dir=args.profile_dir, headless=bool(args.headless), browser=args.browser
+    )
+    try:
+        endpoint = browser.start()
+        report.say(f"Running {len(jobs)} jobs on {workers} workers — report: {report_path}")
+
+        threads = [
+            threading.Thread(
+                target=_work,
+                args=(n, endpoint, jobs, statuses, pending, report, limiter, (stdout, stderr)),
+                name=f"batch-worker-{n}",
+                daemon=True,
+            )
+            for n in range(1, workers + 1)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            while t.is_alive():
+                t.join(timeout=0.5)
+    except KeyboardInterrupt:
+        report.say("Stopped by user; running jobs are abandoned.")
+        for status in statuses:
+            if status.state in ("pending", "running"):
+                report.update(status, state="cancelled")
+        return 130
+    except (OSError, TimeoutError, PlaywrightError) as e:
+        print(f"Could not start the shared browser: {e}", file=sys.stderr)
+        return 2
+    finally:
+        sys.stdout, sys.stderr = stdout.default, stderr.default
+        browser.close()
+
+    failed = [s for s in statuses if s.state != "ok"]
+    report.say(f"Batch finished: {len(statuses) - len(failed)} ok, {len(failed)} failed — report: {report_path}")
+    return 1 if failed else 0
+
+
+def _work(
+    worker: int,
+    endpoint: str,
+    jobs: list[Job],
+    statuses: list[JobStatus],
+    pending: queue.Queue[int],
+    report: _Report,
+    limiter: HostRateLimiter,
+    outputs: tuple[ThreadOutput, ThreadOutput],
+) -> None:
+    with sync_playwright() as p:
+        context = connect_context(p, endpoint)
+        while True:
+            try:
+                n = pending.get_nowait()
+            except queue.Empty:
+                return
+            job, status = jobs[n], statuses[n]
+            if context is None:
+                report.update(status, state="failed", exit_code=2, error=f"could not connect to {endpoint}")
+                continue
+            _run_one(worker, job, status, context, report, limiter, outputs)
+
+
+def _run_one(
+    worker: int,
+    job: Job,
+    status: JobStatus,
+    context: BrowserContext,
+    report: _Report,
+    limiter: HostRateLimiter,
+    outputs: tuple[ThreadOutput, ThreadOutput],
+) -> None:
+    started = time.time()
+    report.update(status, state="running", worker=worker, started_at=started)
+    report.say(f"[start] {job.name} (worker {worker})")
+
+    metrics = Metrics()
+    error: str | None = None
+    log_path = Path(status.log)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with log_path.open("w", encoding="utf-8") as log:
+        for output in outputs:
+            output.route(log)
+        try:
+            exit_code = run_job(job.args, context=context, limiter=limiter, metrics=metrics)
+        except Exception as e:
+            exit_code = 1
+            error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        finally:
+            for output in outputs:
+                output.route(None)
+
+    finished = time.time()
+    pages = len(metrics.report()["pages"])
+    if exit_code != 0 and error is None:
+        error = f"exit code {exit_code}, see {status.log}"
+    report.update(
+        status,
+        state="ok" if exit_code == 0 else "failed",
+        exit_code=exit_code,
+        finished_at=finished,
+        duration_s=round(finished - started, 3),
+        pages=pages,
+        error=error,
+    )
+    label = "ok" if exit_code == 0 else "failed"
+    report.say(f"[{label}] {job.name}: {pages} pages in {finished - started:.1f}s — {job.args.output}")
+
+
+def _wait_for_debugging_endpoint(port_file: Path, *, timeout_s: float = 30.0) -> str:
+    # Chromium writes the port it picked for --remote-debugging-port=0 into the profile.
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            port = port_file.read_text(encoding="utf-8").splitlines()[0].strip()
+        except (OSError, IndexError):
+            port = ""
+        if port.isdigit():
+            return f"http://127.0.0.1:{port}"
+        time.sleep(0.1)
+    raise TimeoutError(f"the browser didn't report its debugging port in {port_file}")
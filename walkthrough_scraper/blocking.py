@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable
+from urllib.parse import urlparse
+
+from playwright.sync_api import Page, Request, Response, Route
+
+
+# Ads, analytics and embeds that Neoseeker pages pull in. Matched as host suffixes.
+TRACKER_HOSTS = (
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googletagservices.com",
+    "googletagmanager.com",
+    "google-analytics.com",
+    "adservice.google.com",
+    "amazon-adsystem.com",
+    "adnxs.com",
+    "rubiconproject.com",
+    "pubmatic.com",
+    "openx.net",
+    "criteo.com",
+    "criteo.net",
+    "casalemedia.com",
+    "taboola.com",
+    "outbrain.com",
+    "moatads.com",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "quantcount.com",
+    "hotjar.com",
+    "facebook.net",
+    "youtube.com",
+    "youtube-nocookie.com",
+    "ytimg.com",
+    "player.vimeo.com",
+    "twitch.tv",
+)
+
+# Never block these: the site's anti-bot verification needs them.
+_ALWAYS_ALLOWED_HOSTS = ("challenges.cloudflare.com",)
+
+RESOURCE_TYPES = ("image", "media", "font", "stylesheet")
+
+
+@dataclass
+class BlockStats:
+    blocked: Counter = field(default_factory=Counter)
+    allowed: int = 0
+    bytes_loaded: int = 0
+
+    @property
+    def blocked_total(self) -> int:
+        return sum(self.blocked.values())
+
+    def summary(self) -> str:
+        parts = ", ".join(f"{n} {reason}" for reason, n in self.blocked.most_common())
+        return f"blocked {self.blocked_total} requests ({parts or 'none'}), {self.bytes_loaded / 1e6:.1f} MB loaded"
+
+
+class RequestBlocker:
+    """Drop crawl-tab requests the DOM extraction never needs.
+
+    Attach it to crawl tabs only (never to the PDF render tab). Main-frame
+    navigations and the verification hosts always load, so anti-bot pages
+    keep working. Stats are kept per tab until take_stats() is called.
+
+    Blocked requests are never sent, so their size is unknown; bytes_loaded
+    counts the Content-Length of the responses that were allowed through.
+    """
+
+    def __init__(self, *, resource_types: Iterable[str] = (), hosts: Iterable[str] = ()) -> None:
+        self.resource_types = frozenset(t.strip().lower() for t in resource_types if t.strip())
+        self.hosts = tuple(h.strip().lower().lstrip(".") for h in hosts if h.strip())
+        self._stats: dict[Page, BlockStats] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.resource_types or self.hosts)
+
+    def attach(self, page: Page) -> None:
+        stats = self._stats.setdefault(page, BlockStats())
+
+        def on_route(route: Route) -> None:
+            try:
+                reason = self._block_reason(route.request, page)
+            except Exception:
+                # e.g. service-worker requests have no frame; let them through.
+                reason = None
+            if reason is None:
+                route.continue_()
+                return
+            stats.blocked[reason] += 1
+            route.abort("blockedbyclient")
+
+        def on_response(response: Response) -> None:
+            stats.allowed += 1
+            try:
+                stats.bytes_loaded += int(response.headers.get("content-length") or 0)
+            except ValueError:
+                pass
+
+        page.route("**/*", on_route)
+        page.on("response", on_response)
+
+    def take_stats(self, page: Page) -> BlockStats:
+        """Return the stats gathered on page since the last call and start over."""
+
+        stats = self._stats.get(page)
+        if stats is None:
+            return BlockStats()
+        snapshot = BlockStats(blocked=Counter(stats.blocked), allowed=stats.allowed, bytes_loaded=stats.bytes_loaded)
+        stats.blocked.clear()
+        stats.allowed = 0
+        stats.bytes_loaded = 0
+        return snapshot
+
+    def _block_reason(self, request: Request, page: Page) -> str | None:
+        if request.is_navigation_request() and request.frame == page.main_frame:
+            return None
+
+        host = (urlparse(request.url).hostname or "").lower()
+        if _host_matches(host, _ALWAYS_ALLOWED_HOSTS):
+            return None
+        if self.hosts and _host_matches(host, self.hosts):
+            return "tracker"
+
+        resource_type = request.resource_type
+        if resource_type in self.resource_types:
+            return resource_type
+        return None
+
+
+def _host_matches(host: str, suffixes: tuple[str, ...]) -> bool:
+    return any(host == s or host.endswith("." + s) for s in suffixes)
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass
+import hashlib
+import math
+from typing import Iterable, Sequence
+
+import lxml.html
+
+from .model import ScrapedPage
+from .neoseeker import parse_fragment, serialize_fragment
+from .store import PageStore
+
+
+# Elements judged as a unit; inline markup is judged with the block around it.
+_BLOCK_TAGS = (
+    "div",
+    "section",
+    "article",
+    "header",
+    "footer",
+    "nav",
+    "aside",
+    "form",
+    "center",
+    "table",
+    "ul",
+    "ol",
+    "dl",
+    "p",
+    "figure",
+    "blockquote",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+)
+
+# A block whose text is at least this much link text, with at most _NAV_MAX_LINKS
+# links, is navigation (e.g. "« Previous | Next: Chapter 5 »"): its text differs
+# on every page, so it's matched by tag, id and class instead.
+_NAV_LINK_SHARE = 0.6
+_NAV_MAX_LINKS = 4
+
+
+@dataclass
+class BoilerplateStats:
+    pages: int = 0
+    pages_changed: int = 0
+    blocks_removed: int = 0
+    bytes_removed: int = 0
+    fingerprints: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"removed {self.blocks_removed} repeated blocks ({self.fingerprints} kinds, "
+            f"{self.bytes_removed / 1e3:.1f} KB) from {self.pages_changed} of {self.pages} pages"
+        )
+
+
+def remove_boilerplate(
+    pages: Iterable[ScrapedPage],
+    *,
+    min_share: float = 0.6,
+    min_pages: int = 3,
+    into: PageStore | None = None,
+) -> tuple[Sequence[ScrapedPage], BoilerplateStats]:
+    """Drop block elements that repeat across most pages of a walkthrough.
+
+    A first pass fingerprints every block-level element of each page's
+    content_html and counts the pages each fingerprint is on; a second pass
+    removes the outermost blocks whose fingerprint is on at least min_share
+    of the pages (and at least min_pages). Chapter navigation, Next/Previous
+    blocks, banners and empty ad slots go; the page's own text stays. Only one
+    page's tree is alive at a time, and a page that would be left without any
+    text is kept as it was.
+
+    The cleaned pages are appended to `into` when given and returned as a new
+    list otherwise.
+    """
+
+    if not isinstance(pages, Sequence):
+        pages = list(pages)
+    stats = BoilerplateStats(pages=len(pages))
+    cleaned = into if into is not None else []
+    threshold = max(1, min_pages, math.ceil(min_share * len(pages)))
+
+    counts: Counter = Counter()
+    if len(pages) >= threshold:
+        for page in pages:
+            root = parse_fragment(page.content_html)
+            counts.update({key for el in root.iter(*_BLOCK_TAGS) if el is not root for key in _fingerprints(el)})
+    common = {key for key, n in counts.items() if n >= threshold}
+
+    removed_keys: set[str] = set()
+    for page in pages:
+        if not common:
+            cleaned.append(page)
+            continue
+        root = parse_fragment(page.content_html)
+        dropped = _common_blocks(root, common)
+        if not dropped:
+            cleaned.append(page)
+            continue
+        sizes = [len(lxml.html.tostring(el, encoding="unicode", with_tail=False)) for el, _key in dropped]
+        for el, _key in dropped:
+            el.drop_tree()
+        if not root.text_content().strip():
+            cleaned.append(page)
+            continue
+        cleaned.append(ScrapedPage(url=page.url, title=page.title, content_html=serialize_fragment(root)))
+        stats.pages_changed += 1
+        stats.blocks_removed += len(dropped)
+        stats.bytes_removed += sum(sizes)
+        removed_keys.update(key for _el, key in dropped)
+
+    stats.fingerprints = len(removed_keys)
+    return cleaned, stats
+
+
+def _common_blocks(root: lxml.html.HtmlElement, common: set[str]) -> list[tuple[lxml.html.HtmlElement, str]]:
+    # Outermost matches only: once a block goes, its descendants go with it.
+    found = []
+    stack = list(root)
+    while stack:
+        el = stack.pop()
+        if not isinstance(el.tag, str):
+            continue
+        if el.tag in _BLOCK_TAGS:
+            key = next((k for k in _fingerprints(el) if k in common), None)
+            if key is not None:
+                found.append((el, key))
+                continue
+        stack.extend(el)
+    return found
+
+
+def _fingerprints(el: lxml.html.HtmlElement) -> list[str]:
+    ident = f"{el.tag}#{el.get('id', '')}.{' '.join(sorted((el.get('class') or '').split()))}"
+    text = " ".join(el.text_content().split())
+    images = " ".join(sorted(img.get("src", "") for img in el.iter("img")))
+    keys = ["text:" + _digest(f"{ident}|{text}|{images}")]
+
+    if el.get("id") or el.get("class"):
+        links = list(el.iter("a"))
+        link_text = sum(len(" ".join(a.text_content().split())) for a in links)
+        if text and 0 < len(links) <= _NAV_MAX_LINKS and link_text >= _NAV_LINK_SHARE * len(text):
+            keys.append("nav:" + _digest(ident))
+    return keys
+
+
+def _digest(s: str) -> str:
+    return hashlib.blake2b(s.encode("utf-8"), digest_size=12).hexdigest()
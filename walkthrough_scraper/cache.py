@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+import time
+
+from .model import ScrapedPage
+from .neoseeker import ExtractedContent, parse_fragment, serialize_fragment
+from .store import PageStore
+
+
+# Bumped when content_hash changes; stored hashes of another version are recomputed.
+# 1 hashed the raw HTML, 2 hashes it re-serialized through lxml.
+HASH_VERSION = 2
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    page: ScrapedPage
+    extracted_title: str
+    content_selector: str
+    text_len: int
+    next_url: str | None
+    fetched_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+    content_hash: str = ""  # empty when not stored in the current HASH_VERSION
+
+    def current_hash(self) -> str:
+        """The page's content_hash, computed now if the entry didn't store a current one."""
+
+        return self.content_hash or content_hash(self.page.content_html)
+
+
+class PageCache:
+    """On-disk store of extracted pages, keyed by normalized URL.
+
+    One JSON file per page, so a rebuild only reads the pages it needs and a
+    crash mid-write can at worst lose the page being written.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self.pages_dir = self.root / "pages"
+
+    def get(self, url: str, *, max_age_s: float | None = None) -> CachedPage | None:
+        path = self._path_for(url)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if data.get("url") != url:
+            return None
+
+        fetched_at = float(data.get("fetched_at", 0) or 0)
+        if max_age_s is not None and time.time() - fetched_at > max_age_s:
+            return None
+
+        content_html = data.get("content_html", "")
+        return CachedPage(
+            page=ScrapedPage(url=url, title=data.get("title", "") or url, content_html=content_html),
+            extracted_title=data.get("extracted_title", ""),
+            content_selector=data.get("content_selector", ""),
+            text_len=int(data.get("text_len", 0) or 0),
+            next_url=data.get("next_url") or None,
+            fetched_at=fetched_at,
+            etag=data.get("etag") or None,
+            last_modified=data.get("last_modified") or None,
+            content_hash=(data.get("content_hash") or "") if data.get("hash_version") == HASH_VERSION else "",
+        )
+
+    def put(
+        self,
+        page: ScrapedPage,
+        extracted: ExtractedContent,
+        next_url: str | None,
+        *,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        content_hash: str | None = None,
+    ) -> None:
+        """Store page; etag/last_modified are the response validators for --incremental.
+
+        content_hash is stored when the caller already computed it (--incremental).
+        """
+
+        self.pages_dir.mkdir(parents=True, exist_ok=True)
+        data = {
+            "url": page.url,
+            "title": page.title,
+            "content_html": page.content_html,
+            "extracted_title": extracted.title,
+            "content_selector": extracted.content_selector,
+            "text_len": extracted.text_len,
+            "next_url": next_url,
+            "fetched_at": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+        if content_hash:
+            data["content_hash"] = content_hash
+            data["hash_version"] = HASH_VERSION
+        path = self._path_for(page.url)
+        # Unique per writer: batch and serve jobs sharing a cache dir may store the same page at once.
+        tmp_path = path.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def load_chain(
+        self,
+        start_url: str,
+        *,
+        max_pages: int,
+        max_age_s: float | None = None,
+        into: PageStore | None = None,
+    ) -> tuple[list[CachedPage], str | None]:
+        """Follow cached next-URLs from start_url.
+
+        Returns the pages found and the first URL that was missing (or stale), if any.
+        With into, each page is appended there as it is read and the returned
+        records carry an empty content_html, so the list stays small.
+        """
+
+        found: list[CachedPage] = []
+        seen: set[str] = set()
+        url: str | None = start_url
+        while url and url not in seen and len(found) < max_pages:
+            seen.add(url)
+            cached = self.get(url, max_age_s=max_age_s)
+            if cached is None:
+                return found, url
+            found.append(_spill(cached, into))
+            url = cached.next_url
+        return found, None
+
+    def load_list(
+        self,
+        urls: list[str],
+        *,
+        max_age_s: float | None = None,
+        into: PageStore | None = None,
+    ) -> tuple[list[CachedPage], list[str]]:
+        """Load urls from the cache; returns the pages found and the missing URLs.
+
+        into works as in load_chain.
+        """
+
+        found: list[CachedPage] = []
+        missing: list[str] = []
+        for url in urls:
+            cached = self.get(url, max_age_s=max_age_s)
+            if cached is None:
+                missing.append(url)
+            else:
+                found.append(_spill(cached, into))
+        return found, missing
+
+    def _path_for(self, url: str) -> Path:
+        h = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+        return self.pages_dir / f"{h}.json"
+
+
+def content_hash(content_html: str) -> str:
+    """Fingerprint of a page's extracted HTML, to tell changed pages from unchanged ones.
+
+    The browser and lxml extractors serialize the same markup differently
+    (void tags, attribute quoting, entities), so the HTML is re-serialized
+    through lxml before hashing.
+    """
+
+    normalized = serialize_fragment(parse_fragment(content_html)) if content_html.strip() else ""
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def conditional_headers(cached: CachedPage) -> dict[str, str]:
+    """If-None-Match / If-Modified-Since headers that revalidate cached."""
+
+    headers = {}
+    if cached.etag:
+        headers["If-None-Match"] = cached.etag
+    if cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+    return headers
+
+
+def _spill(cached: CachedPage, into: PageStore | None) -> CachedPage:
+    if into is None:
+        return cached
+    into.append(cached.page)
+    return replace(cached, page=replace(cached.page, content_html=""))
@@ -1,26 +1,75 @@
 from __future__ import annotations
 
 import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, suppress
+import dataclasses
+import shutil
 import sys
+import tempfile
 import time
 from pathlib import Path
+from typing import Iterator
 from urllib.parse import urldefrag
 
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import BrowserContext, sync_playwright
 from playwright.sync_api import Error as PlaywrightError
 
-from .assets import localize_assets
+from .asset_cache import AssetCache
+from .assets import localize_page_assets
+from .blocking import RESOURCE_TYPES, TRACKER_HOSTS, RequestBlocker
+from .boilerplate import remove_boilerplate
+from .cache import CachedPage, PageCache, conditional_headers, content_hash
+from .ebook import OUTPUT_FORMATS, write_epub, write_html_bundle
+from .fetch import DEFAULT_USER_AGENT, FetchResult, HttpClient
+from .images import ImageOptions, ImageStats, pillow_available
+from .journal import CrawlJournal, iter_journal
+from .metrics import Metrics, dir_stats
 from .model import ScrapedPage
-from .neoseeker import extract_main_content, find_next_url, looks_like_bot_challenge, walkthrough_prefix
-from .pdf import build_combined_html, render_pdf
+from .neoseeker import (
+    ExtractedContent,
+    PageAnalysis,
+    analyze_page,
+    extract_main_content_from_html,
+    find_next_url_in_html,
+    find_toc_urls_in_html,
+    looks_like_bot_challenge,
+    looks_like_bot_challenge_html,
+    parse_html,
+    wait_for_challenge_to_clear,
+    wait_for_content_ready,
+    walkthrough_prefix,
+)
+from .pdf import iter_chunk_documents, render_pdf_chunked, render_pdf_file, write_combined_html
+from .ratelimit import HostRateLimiter
+from .store import PageStore
+from .tabs import TabPool
+
+
+class _StopCrawl(Exception):
+    """Raised inside the crawl loop to end the run with a specific exit code."""
+
+    def __init__(self, exit_code: int) -> None:
+        super().__init__(exit_code)
+        self.exit_code = exit_code
+
+
+# Shortest load-state wait once a readiness budget is used up.
+_LAST_WAIT_MS = 5_000
+
+
+def _remaining_ms(deadline: float) -> int:
+    return max(0, int((deadline - time.monotonic()) * 1000))
 
 
 def _wait_for_settle(page, *, timeout_ms: int = 60_000) -> None:
-    """Best-effort wait for page to finish navigating.
+    """Best-effort wait for page to finish navigating, within about timeout_ms.
 
     Some sites (and bot-check pages) never reach 'networkidle'.
     """
 
+    deadline = time.monotonic() + timeout_ms / 1000
     try:
         page.wait_for_load_state("networkidle", timeout=timeout_ms)
         return
@@ -28,35 +77,58 @@ def _wait_for_settle(page, *, timeout_ms: int = 60_000) -> None:
         pass
 
     try:
-        page.wait_for_load_state("load", timeout=timeout_ms)
+        page.wait_for_load_state("load", timeout=max(_LAST_WAIT_MS, _remaining_ms(deadline)))
     except Exception:
         pass
 
 
-def _wait_for_verification_to_clear(page, *, timeout_s: int = 300) -> bool:
-    """Poll until the anti-bot verification page is gone."""
+def _wait_for_ready(page, *, strategy: str, selector: str | None, quiet_ms: int, timeout_ms: int = 60_000) -> None:
+    """Wait until a crawled page can be extracted, within about timeout_ms overall.
 
-    deadline = time.time() + max(1, timeout_s)
-    last_title = ""
+    "content" watches the DOM for the content container and a quiet period;
+    "networkidle" is the old blanket wait. If content readiness times out (or the
+    page navigated mid-wait), the load-state waits get whatever budget is left.
+    """
 
-    while time.time() < deadline:
-        try:
-            last_title = page.title()
-        except Exception:
-            last_title = ""
+    if strategy != "content":
+        _wait_for_settle(page, timeout_ms=timeout_ms)
+        return
 
-        if not looks_like_bot_challenge(page):
-            return True
+    deadline = time.monotonic() + timeout_ms / 1000
+    try:
+        page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+    except Exception:
+        pass
+    remaining = _remaining_ms(deadline)
+    if remaining and wait_for_content_ready(page, selector=selector, quiet_ms=quiet_ms, timeout_ms=remaining):
+        return
+    remaining = _remaining_ms(deadline)
+    if remaining:
+        _wait_for_settle(page, timeout_ms=remaining)
+        return
+    try:
+        page.wait_for_load_state("load", timeout=_LAST_WAIT_MS)
+    except Exception:
+        pass
 
-        remaining = int(deadline - time.time())
-        # Keep the output single-line-ish so it feels alive.
-        print(f"Waiting for verification to complete... ({remaining}s remaining) [{last_title}]", file=sys.stderr)
-        try:
-            page.wait_for_timeout(2000)
-        except Exception:
-            time.sleep(2)
 
-    return not looks_like_bot_challenge(page)
+def _wait_for_verification_to_clear(page, *, timeout_s: int = 300) -> bool:
+    """Wait until the anti-bot verification page is gone.
+
+    The page itself reports when the challenge clears (DOM mutations or a
+    redirect), so nothing is polled; a status line is printed every 30s.
+    """
+
+    deadline = time.time() + max(1, timeout_s)
+
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return not looks_like_bot_challenge(page)
+        # Keep the output single-line-ish so it feels alive.
+        print(f"Waiting for verification to complete... ({int(remaining)}s remaining)", file=sys.stderr)
+        if wait_for_challenge_to_clear(page, timeout_ms=int(min(remaining, 30) * 1000)):
+            return True
 
 
 def _normalize_url(url: str) -> str:
@@ -65,10 +137,121 @@ def _normalize_url(url: str) -> str:
     return normalized
 
 
-def build_parser() -> argparse.ArgumentParser:
+_PAGE_REQUEST_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def _extract_fetched(
+    result: FetchResult,
+    *,
+    selector: str | None,
+    allowed_prefix: str,
+    follow_next: bool,
+    find_toc: bool = False,
+) -> tuple[PageAnalysis | None, str]:
+    """Extract a page fetched over plain HTTP.
+
+    Returns (analysis, reason); analysis is None when the page has to be loaded
+    in a browser tab instead, and reason says why.
+    """
+
+    if not result.ok:
+        return None, result.error or f"HTTP {result.status}"
+    if result.content_type not in ("", "text/html", "application/xhtml+xml"):
+        return None, f"unexpected content type {result.content_type}"
+
+    doc = parse_html(result.text(), result.url)
+    if looks_like_bot_challenge_html(doc):
+        return None, "verification page"
+    extracted = extract_main_content_from_html(doc, result.url, selector=selector)
+    if extracted is None:
+        return None, "selector needs a browser"
+    if not extracted.text_len or not extracted.content_html.strip():
+        return None, "no content found"
+
+    next_url = None
+    if follow_next:
+        nxt = find_next_url_in_html(doc, result.url, allowed_prefix=allowed_prefix)
+        next_url = _normalize_url(nxt) if nxt else None
+    toc_urls = find_toc_urls_in_html(doc, result.url, allowed_prefix=allowed_prefix) if find_toc else []
+    return PageAnalysis(challenge=False, content=extracted, next_url=next_url, toc_urls=tuple(toc_urls)), ""
+
+
+@dataclasses.dataclass(frozen=True)
+class _Fetched:
+    """Outcome of requesting one page over HTTP."""
+
+    analysis: PageAnalysis | None
+    # Why analysis is None; empty when no request was made.
+    reason: str = ""
+    etag: str | None = None
+    last_modified: str | None = None
+    not_modified: bool = False
+
+
+def _analysis_from_cache(cached: CachedPage, *, follow_next: bool) -> PageAnalysis:
+    content = ExtractedContent(
+        title=cached.extracted_title,
+        content_html=cached.page.content_html,
+        content_selector=cached.content_selector,
+        text_len=cached.text_len,
+    )
+    return PageAnalysis(challenge=False, content=content, next_url=cached.next_url if follow_next else None)
+
+
+def _print_changes(changes: list[tuple[int, str, str, str]]) -> None:
+    counts = Counter(change for _index, change, _title, _url in changes)
+    print(f"Incremental: {counts['changed']} changed, {counts['new']} new, {counts['unchanged']} unchanged")
+    for index, change, title, url in changes:
+        if change != "unchanged":
+            print(f"  {change}: [{index}] {title} — {url}")
+
+
+def _split_csv(value: str | None) -> list[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def _resource_types_arg(value: str) -> str:
+    # argparse turns the error into parser.error(), so a typo can't silently block nothing.
+    unknown = [part for part in _split_csv(value) if part not in RESOURCE_TYPES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown resource type(s): {', '.join(unknown)} (choices: {', '.join(RESOURCE_TYPES)})"
+        )
+    return value
+
+
+def _print_resume_hint(journal: CrawlJournal | None, scraped: int) -> None:
+    if journal is not None and scraped:
+        print(f"{scraped} pages are saved in {journal.path}; rerun with --resume to continue.", file=sys.stderr)
+
+
+def _save_asset_cache(asset_cache: AssetCache | None) -> None:
+    if asset_cache is None:
+        return
+    evicted = asset_cache.save()
+    print(
+        f"Asset cache: {asset_cache.hits} reused ({asset_cache.revalidated} revalidated), "
+        f"{evicted} evicted — {asset_cache.root}"
+    )
+
+
+def _print_image_stats(image_options: ImageOptions | None, stats: ImageStats) -> None:
+    if image_options is None:
+        return
+    print(
+        f"Optimized images: {stats.processed} transcoded, {stats.reused} from cache, {stats.skipped} left as-is "
+        f"({stats.bytes_before / 1e6:.1f} MB -> {stats.bytes_after / 1e6:.1f} MB)"
+    )
+
+
+def build_parser(*, allow_abbrev: bool = True) -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(
         prog="walkthrough-scraper",
-        description="Scrape a Neoseeker walkthrough (paged) into a single PDF.",
+        description="Scrape a Neoseeker walkthrough (paged) into a single PDF, EPUB or HTML file.",
+        allow_abbrev=allow_abbrev,
     )
     src = p.add_mutually_exclusive_group(required=True)
     src.add_argument("--start", help="Start URL (first page of the walkthrough)")
@@ -76,9 +259,114 @@ def build_parser() -> argparse.ArgumentParser:
         "--urls-file",
         help="Path to a text file containing URLs (one per line) to scrape in order",
     )
-    p.add_argument("--output", required=True, help="Output PDF path")
+    p.add_argument("--output", required=True, help="Output file path (a PDF unless --format says otherwise)")
+    p.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="pdf",
+        help=(
+            "pdf is printed by the browser; epub (one chapter per page, images packaged) and html "
+            "(one self-contained file) are written directly without a render pass. epub and html "
+            "always download images, as with --offline-assets"
+        ),
+    )
     p.add_argument("--max-pages", type=int, default=300, help="Safety cap to avoid infinite loops")
-    p.add_argument("--delay", type=float, default=1.0, help="Delay (seconds) between pages")
+    p.add_argument(
+        "--delay",
+        type=float,
+        default=1.0,
+        help=(
+            "Starting interval (seconds) between requests to the walkthrough's host. It shrinks while the "
+            "site responds normally and grows on 429/503, Retry-After or verification pages"
+        ),
+    )
+    p.add_argument(
+        "--min-delay",
+        type=float,
+        default=0.2,
+        help="Shortest interval --delay may shrink to (set it equal to --delay to never speed up)",
+    )
+    p.add_argument(
+        "--max-delay",
+        type=float,
+        default=60.0,
+        help="Longest interval a host may be slowed down to after pushing back",
+    )
+    p.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help=(
+            "Number of tabs (or HTTP requests with --fetch http) to load in parallel with --urls-file. "
+            "Request starts are still paced per host (see --delay)."
+        ),
+    )
+    p.add_argument(
+        "--discover-toc",
+        action="store_true",
+        help=(
+            "With --start, read the walkthrough's chapter list from the first page and fetch the "
+            "chapters as a list (in parallel with --concurrency) instead of following Next links one by one"
+        ),
+    )
+    p.add_argument(
+        "--toc-check",
+        type=int,
+        default=2,
+        help=(
+            "With --discover-toc, how many pages to crawl by following Next first; the chapter list "
+            "is only used if those pages match its order"
+        ),
+    )
+    p.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="With --start, begin loading the next page in a second tab while the current one is extracted",
+    )
+    p.add_argument(
+        "--fetch",
+        choices=["browser", "http"],
+        default="browser",
+        help=(
+            "How to load crawled pages: 'browser' navigates a tab for every page; 'http' requests the "
+            "server HTML directly with the browser's cookies and extracts it in Python, falling back to "
+            "a tab for verification pages or pages it can't extract"
+        ),
+    )
+    p.add_argument(
+        "--wait",
+        choices=["content", "networkidle"],
+        default="content",
+        help=(
+            "How to decide a crawled page is ready: 'content' waits for the content container and a quiet DOM; "
+            "'networkidle' waits for network idle (slow on ad-heavy pages)"
+        ),
+    )
+    p.add_argument(
+        "--quiet-ms",
+        type=int,
+        default=500,
+        help="With --wait content, how long the DOM must stop changing before a page counts as ready",
+    )
+    p.add_argument(
+        "--block-resources",
+        default="",
+        type=_resource_types_arg,
+        help=(
+            "Comma-separated resource types to drop in crawl tabs, e.g. image,media,font "
+            f"(choices: {','.join(RESOURCE_TYPES)}). The PDF render is not affected."
+        ),
+    )
+    p.add_argument(
+        "--block-trackers",
+        action="store_true",
+        help="Drop requests to known ad/analytics/video-embed hosts in crawl tabs",
+    )
+    p.add_argument(
+        "--block-hosts",
+        default="",
+        help="Extra comma-separated host suffixes to drop in crawl tabs",
+    )
     p.add_argument(
         "--selector",
         default=None,
@@ -119,11 +407,131 @@ def build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Optional path to save the combined HTML before PDF rendering",
     )
+    p.add_argument(
+        "--cache-dir",
+        default=str(Path(".cache").resolve()),
+        help="Directory where every extracted page is stored for later --from-cache rebuilds",
+    )
+    p.add_argument(
+        "--from-cache",
+        action="store_true",
+        help="Rebuild the output from pages stored in --cache-dir without navigating to them",
+    )
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Revalidate pages already in --cache-dir with conditional HTTP requests (ETag/Last-Modified) "
+            "before loading them in the browser, reuse the ones that haven't changed, and report which "
+            "sections changed since the last build"
+        ),
+    )
+    p.add_argument(
+        "--max-age",
+        type=float,
+        default=None,
+        help="With --from-cache, treat cached pages older than this many hours as missing",
+    )
+    p.add_argument(
+        "--journal",
+        default=None,
+        help="Crawl journal path (defaults next to the output PDF, with a .journal.jsonl suffix)",
+    )
+    p.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reload pages from the crawl journal and continue after the last recorded page",
+    )
+    p.add_argument(
+        "--strip-boilerplate",
+        action="store_true",
+        help=(
+            "Before rendering, drop blocks that repeat on most pages (chapter navigation, "
+            "Next/Previous links, banners, empty ad slots). The cache keeps the pages as scraped"
+        ),
+    )
+    p.add_argument(
+        "--boilerplate-share",
+        type=float,
+        default=0.6,
+        help="With --strip-boilerplate, a block counts as repeated if it is on at least this share of pages",
+    )
     p.add_argument(
         "--offline-assets",
         action="store_true",
         help="Download <img> assets and rewrite to local files before rendering PDF",
     )
+    p.add_argument(
+        "--asset-workers",
+        type=int,
+        default=8,
+        help="Parallel downloads for --offline-assets",
+    )
+    p.add_argument(
+        "--asset-host-limit",
+        type=int,
+        default=4,
+        help="Maximum concurrent --offline-assets downloads per host",
+    )
+    p.add_argument(
+        "--asset-cache-mb",
+        type=float,
+        default=2048,
+        help=(
+            "Size cap (MB) of the shared asset cache under --cache-dir; assets are revalidated "
+            "with ETag/Last-Modified and deduplicated by content (0 disables the cache)"
+        ),
+    )
+    p.add_argument(
+        "--optimize-images",
+        action="store_true",
+        help="With --offline-assets, downscale images to the printable page width and re-encode them (requires Pillow)",
+    )
+    p.add_argument("--image-dpi", type=int, default=150, help="Target resolution for --optimize-images")
+    p.add_argument("--image-quality", type=int, default=80, help="JPEG/WebP quality for --optimize-images")
+    p.add_argument(
+        "--image-format",
+        choices=["jpeg", "webp"],
+        default="jpeg",
+        help="Output format for --optimize-images",
+    )
+    p.add_argument(
+        "--chunk-size",
+        type=int,
+        default=0,
+        help=(
+            "Render the PDF in chunks of this many pages and stitch them with pypdf, "
+            "so renderer memory stays bounded on long walkthroughs (0 = render in one pass)"
+        ),
+    )
+    p.add_argument(
+        "--render-workers",
+        type=int,
+        default=1,
+        help=(
+            "Print PDF chunks in this many parallel headless browser processes (Chromium, or Chrome with --browser chrome). "
+            "Without --chunk-size the pages are split evenly across workers. "
+            "Workers get a copy of the browser's cookies, but --offline-assets avoids fetching images again."
+        ),
+    )
+    p.add_argument(
+        "--mmap-pages",
+        action="store_true",
+        help=(
+            "Read spilled page HTML back through a memory map. Scraped pages are always kept "
+            "in a temporary file next to the output PDF rather than in memory"
+        ),
+    )
+    p.add_argument(
+        "--metrics-json",
+        default=None,
+        help="Write per-page and per-stage timings, sizes and peak memory to this JSON file",
+    )
+    p.add_argument(
+        "--trace",
+        default=None,
+        help="Write a Chrome trace-event file of the run's stages (open in chrome://tracing or Perfetto)",
+    )
     p.add_argument(
         "--assets-dir",
         default=None,
@@ -133,14 +541,145 @@ def build_parser() -> argparse.ArgumentParser:
 
 
 def main(argv: list[str] | None = None) -> int:
-    args = build_parser().parse_args(argv)
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Subcommands import lazily: they build on this module.
+    if argv[:1] == ["batch"]:
+        from .batch import main as batch_main
+
+        return batch_main(argv[1:])
+    if argv[:1] == ["serve"]:
+        from .serve import main as serve_main
+
+        return serve_main(argv[1:])
+    return run_job(build_parser().parse_args(argv))
+
+
+def run_job(
+    args: argparse.Namespace,
+    *,
+    context: BrowserContext | None = None,
+    limiter: HostRateLimiter | None = None,
+    metrics: Metrics | None = None,
+) -> int:
+    """Run one scrape from parsed CLI args and write its --metrics-json/--trace."""
+
+    metrics = metrics if metrics is not None else Metrics()
+    try:
+        with ExitStack() as cleanup:
+            return _run(args, metrics, cleanup, context=context, limiter=limiter)
+    finally:
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+            print(f"Wrote metrics: {args.metrics_json}", file=sys.stderr)
+        if args.trace:
+            metrics.write_trace(args.trace)
+            print(f"Wrote trace: {args.trace}", file=sys.stderr)
+
+
+def launch_context(
+    playwright,
+    *,
+    profile_dir: str,
+    headless: bool,
+    browser: str = "chromium",
+    extra_args: list[str] | None = None,
+) -> BrowserContext:
+    """Launch the persistent browser profile that crawls run in."""
+
+    return playwright.chromium.launch_persistent_context(
+        user_data_dir=profile_dir,
+        headless=headless,
+        channel="chrome" if browser == "chrome" else None,
+        args=extra_args or [],
+        viewport={"width": 1280, "height": 720},
+        user_agent=DEFAULT_USER_AGENT,
+    )
+
+
+def connect_context(playwright, cdp_url: str) -> BrowserContext | None:
+    """Attach to a running Chrome over CDP; prints a fix checklist and returns None on failure."""
+
+    try:
+        browser = playwright.chromium.connect_over_cdp(cdp_url)
+    except PlaywrightError as e:
+        print(f"Failed to connect to CDP at: {cdp_url}", file=sys.stderr)
+        print(str(e), file=sys.stderr)
+        print(
+            "\nFix checklist:\n"
+            "1) Start Chrome with remote debugging enabled, e.g.:\n"
+            "   & \"$env:ProgramFiles\\Google\\Chrome\\Application\\chrome.exe\" --remote-debugging-port=9222 --user-data-dir \"$env:TEMP\\chrome-cdp-profile\"\n"
+            "2) Keep that Chrome window open while scraping.\n"
+            "3) In a browser, open this to confirm the endpoint is live:\n"
+            "   http://127.0.0.1:9222/json/version\n"
+            "4) If you used a different port (e.g. 9223), pass it in --cdp-url.\n"
+            "5) If you see ECONNREFUSED, Chrome is not listening on that port.",
+            file=sys.stderr,
+        )
+        return None
+    return browser.contexts[0] if browser.contexts else browser.new_context()
+
+
+@contextmanager
+def _browser_context(args: argparse.Namespace, shared: BrowserContext | None) -> Iterator[BrowserContext | None]:
+    """Yield the context a run uses: a shared one as is, or one opened for this run.
+
+    Only persistent contexts launched here are closed afterwards; a CDP browser
+    is the user's and is left alone. Yields None if CDP can't be reached.
+    """
+
+    if shared is not None:
+        yield shared
+        return
+    with sync_playwright() as p:
+        if args.cdp_url:
+            yield connect_context(p, args.cdp_url)
+            return
+        context = launch_context(
+            p, profile_dir=str(Path(args.profile_dir).resolve()), headless=bool(args.headless), browser=args.browser
+        )
+        try:
+            yield context
+        finally:
+            context.close()
+
+
+def _run(
+    args: argparse.Namespace,
+    metrics: Metrics,
+    cleanup: ExitStack,
+    *,
+    context: BrowserContext | None = None,
+    limiter: HostRateLimiter | None = None,
+) -> int:
+    """One scrape-and-render job.
+
+    Batch and serve mode pass a shared browser context and rate limiter; a
+    plain CLI run opens its own.
+    """
 
     start_url: str | None = args.start
     output_pdf: str = args.output
     max_pages: int = args.max_pages
     delay_s: float = max(0.0, float(args.delay))
     selector: str | None = args.selector
-    profile_dir = str(Path(args.profile_dir).resolve())
+    concurrency: int = max(1, int(args.concurrency))
+    render_workers: int = max(1, int(args.render_workers))
+
+    if args.optimize_images and not pillow_available():
+        print("--optimize-images requires Pillow: pip install Pillow", file=sys.stderr)
+        return 2
+
+    if args.save_html and args.format != "pdf":
+        print("--save-html only applies to --format pdf (use --format html for a standalone HTML file)", file=sys.stderr)
+        return 2
+
+    if args.incremental and args.from_cache:
+        print("--incremental revalidates pages against the site; it can't be combined with --from-cache", file=sys.stderr)
+        return 2
+
+    if args.prefetch and args.fetch == "http":
+        print("--prefetch loads pages in a second browser tab; it can't be combined with --fetch http", file=sys.stderr)
+        return 2
 
     urls: list[str] | None = None
     if args.urls_file:
@@ -161,62 +700,135 @@ def main(argv: list[str] | None = None) -> int:
 
     allowed_prefix = walkthrough_prefix(start_url)
 
-    pages: list[ScrapedPage] = []
+    def report_backoff(host: str, reason: str, interval_s: float) -> None:
+        metrics.count("rate_limit_backoffs")
+        print(f"Slowing down requests to {host} ({reason}): one every {interval_s:.1f}s", file=sys.stderr)
+
+    # Shared by page loads, HTTP page fetches and asset downloads. Only the
+    # walkthrough's host starts paced; other hosts are paced once they push back.
+    # A limiter shared between jobs keeps the pace it has already learned.
+    if limiter is None:
+        limiter = HostRateLimiter(max_interval_s=max(0.0, args.max_delay), on_backoff=report_backoff)
+    if not limiter.configured(start_url):
+        limiter.configure(start_url, interval_s=delay_s, min_interval_s=min(max(0.0, args.min_delay), delay_s))
+
+    # Page HTML is spilled to disk so memory stays flat however long the walkthrough is.
+    spill_dir = Path(output_pdf).resolve().parent
+    spill_dir.mkdir(parents=True, exist_ok=True)
+    pages = cleanup.enter_context(PageStore(dir=spill_dir, use_mmap=args.mmap_pages))
     visited: set[str] = set()
     bot_challenge_hits = 0
+    page_cache = PageCache(Path(args.cache_dir).resolve())
+    doc_title = "Neoseeker Walkthrough"
 
-    with sync_playwright() as p:
-        if args.cdp_url:
-            try:
-                browser = p.chromium.connect_over_cdp(args.cdp_url)
-            except PlaywrightError as e:
-                print(f"Failed to connect to CDP at: {args.cdp_url}", file=sys.stderr)
-                print(str(e), file=sys.stderr)
-                print(
-                    "\nFix checklist:\n"
-                    "1) Start Chrome with remote debugging enabled, e.g.:\n"
-                    "   & \"$env:ProgramFiles\\Google\\Chrome\\Application\\chrome.exe\" --remote-debugging-port=9222 --user-data-dir \"$env:TEMP\\chrome-cdp-profile\"\n"
-                    "2) Keep that Chrome window open while scraping.\n"
-                    "3) In a browser, open this to confirm the endpoint is live:\n"
-                    "   http://127.0.0.1:9222/json/version\n"
-                    "4) If you used a different port (e.g. 9223), pass it in --cdp-url.\n"
-                    "5) If you see ECONNREFUSED, Chrome is not listening on that port.",
-                    file=sys.stderr,
-                )
-                return 2
-            context = browser.contexts[0] if browser.contexts else browser.new_context()
+    if args.from_cache:
+        max_age_s = args.max_age * 3600 if args.max_age is not None else None
+        if urls:
+            wanted = list(dict.fromkeys(_normalize_url(u) for u in urls))[:max_pages]
+            with metrics.span("cache_load"):
+                cached, missing = page_cache.load_list(wanted, max_age_s=max_age_s, into=pages)
         else:
-            channel = "chrome" if args.browser == "chrome" else None
-            context = p.chromium.launch_persistent_context(
-                user_data_dir=profile_dir,
-                headless=bool(args.headless),
-                channel=channel,
-                viewport={"width": 1280, "height": 720},
-                user_agent=(
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/131.0.0.0 Safari/537.36"
-                ),
-            )
+            with metrics.span("cache_load"):
+                cached, first_missing = page_cache.load_chain(
+                    _normalize_url(start_url), max_pages=max_pages, max_age_s=max_age_s, into=pages
+                )
+            missing = [first_missing] if first_missing and not cached else []
+            if first_missing and cached:
+                # The last crawl may have stopped at --max-pages; build what the chain covers.
+                print(f"Cached Next chain ends before: {first_missing}", file=sys.stderr)
+        if missing:
+            print(f"{len(missing)} page(s) are missing from the cache (or older than --max-age), e.g.: {missing[0]}", file=sys.stderr)
+            print("Rerun without --from-cache to crawl them.", file=sys.stderr)
+            return 1
+        if cached and cached[0].extracted_title:
+            doc_title = cached[0].extracted_title
+        print(f"Loaded {len(pages)} pages from cache: {page_cache.root}")
+
+    journal: CrawlJournal | None = None
+    resume_url: str | None = _normalize_url(start_url)
+    if not args.from_cache:
+        journal_path = Path(args.journal) if args.journal else Path(output_pdf).with_suffix(".journal.jsonl")
+        if args.resume:
+            last_next: str | None = None
+            for entry in iter_journal(journal_path):
+                if not pages and entry.extracted_title:
+                    doc_title = entry.extracted_title
+                pages.append(entry.page)
+                visited.add(entry.page.url)
+                last_next = entry.next_url
+            if pages:
+                # In Next-chain mode, pick up where the last recorded page pointed.
+                if not urls:
+                    resume_url = last_next if last_next and last_next not in visited else None
+                print(f"Resuming after {len(pages)} journaled pages: {journal_path}")
+        journal = CrawlJournal(journal_path, append=bool(args.resume))
+
+    with _browser_context(args, context) as context:
+        if context is None:
+            return 2
+
+        blocker = RequestBlocker(
+            resource_types=_split_csv(args.block_resources),
+            hosts=(TRACKER_HOSTS if args.block_trackers else ()) + tuple(_split_csv(args.block_hosts)),
+        )
+        setup_tab = blocker.attach if blocker.enabled else None
+
+        # Opened on first use: the concurrent and prefetch modes load pages in a TabPool instead.
+        page = None
+
+        def serial_tab():
+            nonlocal page
+            if page is None:
+                page = context.new_page()
+                if setup_tab is not None:
+                    setup_tab(page)
+            return page
 
-        page = context.new_page()
-        url = _normalize_url(start_url)
-        doc_title = "Neoseeker Walkthrough"
+        url = resume_url
+
+        http_client: HttpClient | None = None
+        if args.fetch == "http":
+            http_client = HttpClient.from_context(context, per_host_limit=concurrency, limiter=limiter)
+        # With --incremental in browser mode, pages from an earlier build are revalidated over HTTP first.
+        check_client: HttpClient | None = None
+        if args.incremental and http_client is None:
+            check_client = HttpClient.from_context(context, per_host_limit=concurrency, limiter=limiter)
+        # (index, "new"/"changed"/"unchanged", title, url) per page, for --incremental.
+        changes: list[tuple[int, str, str, str]] = []
 
         scrape_list = urls[:max_pages] if urls else None
+        measuring = bool(args.metrics_json or args.trace)
+        # Chapter list found by --discover-toc (filled by the first page that has one).
+        toc_urls: list[str] = []
 
-        def scrape_one(target_url: str, idx: int) -> str | None:
-            target_url = _normalize_url(target_url)
-            if target_url in visited:
-                return None
-            visited.add(target_url)
+        def want_toc() -> bool:
+            return bool(args.discover_toc) and scrape_list is None and not toc_urls
+
+        def wait_ready(tab, target_url: str) -> None:
+            with metrics.span("wait_ready", url=target_url):
+                _wait_for_ready(tab, strategy=args.wait, selector=selector, quiet_ms=args.quiet_ms, timeout_ms=60000)
 
-            page.goto(target_url, wait_until="domcontentloaded", timeout=60000)
-            _wait_for_settle(page, timeout_ms=60000)
+        def analyze(tab, target_url: str) -> PageAnalysis:
+            with metrics.span("analyze", url=target_url):
+                return analyze_page(
+                    tab,
+                    selector=selector,
+                    allowed_prefix=allowed_prefix,
+                    find_next=scrape_list is None,
+                    find_toc=want_toc(),
+                    measure=measuring,
+                )
 
+        def handle_loaded(tab, target_url: str, idx: int, prefetch=None, response=None) -> str | None:
             nonlocal bot_challenge_hits
-            if looks_like_bot_challenge(page):
+            headers = response.headers if response is not None else {}
+            analysis = analyze(tab, target_url)
+            if analysis.challenge:
+                # The response was the verification page; its validators don't describe the content.
+                headers = {}
                 bot_challenge_hits += 1
+                metrics.count("verification_pages")
+                limiter.record(target_url, challenge=True)
                 if bot_challenge_hits >= 3:
                     print(
                         "Neoseeker keeps returning a security verification page in this automated browser session.\n"
@@ -225,14 +837,14 @@ def main(argv: list[str] | None = None) -> int:
                         "Suggested fallback: open the pages in your normal browser and Print to PDF per chapter, then merge PDFs with scripts/merge_pdfs.py.",
                         file=sys.stderr,
                     )
-                    return 2
+                    raise _StopCrawl(2)
                 if args.headless:
                     print(
                         "Hit a bot-verification page in headless mode. "
                         "Rerun without --headless so you can complete verification in the browser window.",
                         file=sys.stderr,
                     )
-                    return 2
+                    raise _StopCrawl(2)
 
                 print(
                     "Neoseeker is showing a security verification page.\n"
@@ -242,78 +854,503 @@ def main(argv: list[str] | None = None) -> int:
                 )
                 # Cloudflare/anti-bot flows often trigger their own redirects.
                 # Don't issue a new goto() here; wait for the verification to clear.
-                if not _wait_for_verification_to_clear(page, timeout_s=int(args.verification_timeout)):
+                with metrics.span("verification", url=target_url):
+                    cleared = _wait_for_verification_to_clear(tab, timeout_s=int(args.verification_timeout))
+                if not cleared:
                     print(
                         "Verification did not clear. You may need to complete additional steps in the browser window (e.g., checkbox/captcha) or try again later.",
                         file=sys.stderr,
                     )
-                    return 2
+                    raise _StopCrawl(2)
 
-                _wait_for_settle(page, timeout_ms=60000)
+                wait_ready(tab, target_url)
+                analysis = analyze(tab, target_url)
 
-            extracted = extract_main_content(page, selector=selector)
+            if want_toc():
+                toc_urls.extend(analysis.toc_urls)
+            next_url = _normalize_url(analysis.next_url) if analysis.next_url else None
+            # With look-ahead, the following page starts loading in the other tab right away.
+            if prefetch is not None and next_url:
+                prefetch(next_url, idx + 1)
+
+            note = f" [{blocker.take_stats(tab).summary()}]" if blocker.enabled else ""
+            record_page(
+                target_url,
+                analysis.content,
+                next_url,
+                note=note,
+                etag=headers.get("etag"),
+                last_modified=headers.get("last-modified"),
+                fetch="browser",
+                html_bytes=analysis.html_len,
+                transfer_bytes=analysis.transfer_bytes,
+            )
+            return next_url
+
+        def record_page(
+            target_url: str,
+            extracted: ExtractedContent,
+            next_url: str | None,
+            *,
+            note: str = "",
+            etag: str | None = None,
+            last_modified: str | None = None,
+            **page_metrics,
+        ) -> None:
             nonlocal doc_title
-            if idx == 0 and extracted.title:
+            if not pages and extracted.title:
                 doc_title = extracted.title
 
-            pages.append(ScrapedPage(url=target_url, title=extracted.title or target_url, content_html=extracted.content_html))
-            print(f"[{len(pages)}] {extracted.title} ({extracted.text_len} chars) — {target_url}")
+            scraped = ScrapedPage(url=target_url, title=extracted.title or target_url, content_html=extracted.content_html)
+            new_hash: str | None = None
+            if args.incremental:
+                new_hash = content_hash(scraped.content_html)
+                previous = page_cache.get(target_url)
+                if previous is None:
+                    change = "new"
+                elif previous.current_hash() == new_hash:
+                    change = "unchanged"
+                else:
+                    change = "changed"
+                changes.append((len(pages) + 1, change, scraped.title, target_url))
+                metrics.count(f"pages_{change}")
+                page_metrics["change"] = change
+                if change != "unchanged":
+                    note += f" [{change}]"
+            pages.append(scraped)
+            print(f"[{len(pages)}] {extracted.title} ({extracted.text_len} chars) — {target_url}{note}")
+            metrics.count(f"pages_{page_metrics.get('fetch', 'browser')}")
+            metrics.count("bytes_transferred", page_metrics.get("transfer_bytes", 0))
+            metrics.page(
+                target_url,
+                index=len(pages),
+                title=extracted.title,
+                text_len=extracted.text_len,
+                content_bytes=len(extracted.content_html),
+                **page_metrics,
+            )
+
+            page_cache.put(scraped, extracted, next_url, etag=etag, last_modified=last_modified, content_hash=new_hash)
+            if journal is not None:
+                journal.append(scraped, extracted_title=extracted.title, next_url=next_url)
+
+        def record_response(target_url: str, response) -> None:
+            if response is not None:
+                limiter.record(target_url, status=response.status, retry_after=response.headers.get("retry-after"))
+
+        def await_navigation(nav) -> None:
+            # TabPool tabs start loading at submit; the goto span runs until the tab is ours.
+            try:
+                nav.raise_for_error()
+            finally:
+                metrics.span_since("goto", nav.submitted_at, url=nav.url)
+
+        def load_in_tab(target_url: str, idx: int) -> str | None:
+            limiter.acquire(target_url)
+            tab = serial_tab()
+            with metrics.span("goto", url=target_url):
+                response = tab.goto(target_url, wait_until="domcontentloaded", timeout=60000)
+                record_response(target_url, response)
+            wait_ready(tab, target_url)
+            return handle_loaded(tab, target_url, idx, response=response)
+
+        def fetch_and_extract(target_url: str) -> _Fetched:
+            # Runs on worker threads with --concurrency; the client paces requests through the limiter.
+            cached = page_cache.get(target_url) if args.incremental else None
+            if cached is None and http_client is None:
+                # Browser mode: only pages from an earlier build are checked over HTTP.
+                return _Fetched(None)
+            headers = _PAGE_REQUEST_HEADERS if cached is None else {**_PAGE_REQUEST_HEADERS, **conditional_headers(cached)}
+            with metrics.span("http_fetch", url=target_url) as span:
+                result = (http_client or check_client).get(target_url, headers=headers)
+                span["bytes"] = result.size
+                span["status"] = result.status
+            etag = result.headers.get("etag")
+            last_modified = result.headers.get("last-modified")
+            if cached is not None and result.status == 304:
+                return _Fetched(
+                    _analysis_from_cache(cached, follow_next=scrape_list is None),
+                    etag=etag or cached.etag,
+                    last_modified=last_modified or cached.last_modified,
+                    not_modified=True,
+                )
+            with metrics.span("parse_extract", url=target_url):
+                analysis, reason = _extract_fetched(
+                    result,
+                    selector=selector,
+                    allowed_prefix=allowed_prefix,
+                    follow_next=scrape_list is None,
+                    find_toc=want_toc(),
+                )
+            if analysis is None:
+                return _Fetched(None, reason or "no content")
+            analysis = dataclasses.replace(analysis, html_len=result.size, transfer_bytes=result.size)
+            return _Fetched(analysis, etag=etag, last_modified=last_modified)
+
+        def handle_fetched(target_url: str, idx: int, fetched: _Fetched) -> str | None:
+            analysis = fetched.analysis
+            if analysis is not None:
+                if want_toc():
+                    toc_urls.extend(analysis.toc_urls)
+                record_page(
+                    target_url,
+                    analysis.content,
+                    analysis.next_url,
+                    note=" [not modified]" if fetched.not_modified else " [http]",
+                    etag=fetched.etag,
+                    last_modified=fetched.last_modified,
+                    fetch="not_modified" if fetched.not_modified else "http",
+                    html_bytes=analysis.html_len,
+                    transfer_bytes=analysis.transfer_bytes,
+                )
+                return analysis.next_url
 
-            if scrape_list is not None:
+            if fetched.reason:
+                metrics.count("http_fallbacks")
+                print(f"HTTP fetch fell back to the browser ({fetched.reason}): {target_url}", file=sys.stderr)
+            next_url = load_in_tab(target_url, idx)
+            if fetched.reason:
+                # The tab may have passed a verification page; later requests need its new cookies.
+                (http_client or check_client).set_cookies(context.cookies())
+            return next_url
+
+        def scrape_one(target_url: str, idx: int) -> str | None:
+            target_url = _normalize_url(target_url)
+            if target_url in visited:
                 return None
+            visited.add(target_url)
 
-            nxt = find_next_url(page, allowed_prefix=allowed_prefix)
-            return _normalize_url(nxt) if nxt else None
+            if http_client is not None or args.incremental:
+                return handle_fetched(target_url, idx, fetch_and_extract(target_url))
+            return load_in_tab(target_url, idx)
 
-        try:
-            if scrape_list is not None:
-                for idx, target_url in enumerate(scrape_list):
+        def fetch_concurrently(targets: list[str]) -> None:
+            unique: list[str] = []
+            for target_url in targets:
+                target_url = _normalize_url(target_url)
+                if target_url not in visited:
+                    visited.add(target_url)
+                    unique.append(target_url)
+
+            # Fetch and parse on worker threads; record (and fall back) in list order here.
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                futures = [pool.submit(fetch_and_extract, target_url) for target_url in unique]
+                try:
+                    for idx, (target_url, future) in enumerate(zip(unique, futures)):
+                        handle_fetched(target_url, idx, future.result())
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+        def scrape_concurrently(targets: list[str]) -> None:
+            unique: list[str] = []
+            for target_url in targets:
+                target_url = _normalize_url(target_url)
+                if target_url not in visited:
+                    visited.add(target_url)
+                    unique.append(target_url)
+
+            checked: dict[str, _Fetched] = {}
+            if args.incremental:
+                # Revalidate pages from the last build over HTTP first; only the rest need tabs.
+                with ThreadPoolExecutor(max_workers=concurrency) as workers:
+                    checked = dict(zip(unique, workers.map(fetch_and_extract, unique)))
+
+            pool = TabPool(context, concurrency, throttle=limiter.acquire, setup=setup_tab)
+            try:
+                for target_url in unique:
+                    if target_url not in checked or checked[target_url].analysis is None:
+                        pool.submit(target_url)
+                for idx, target_url in enumerate(unique):
+                    fetched = checked.get(target_url)
+                    if fetched is not None and fetched.analysis is not None:
+                        handle_fetched(target_url, idx, fetched)
+                        continue
+                    if fetched is not None and fetched.reason:
+                        metrics.count("http_fallbacks")
+                    nav = pool.next()
+                    try:
+                        await_navigation(nav)
+                        record_response(nav.url, nav.response)
+                        wait_ready(nav.page, nav.url)
+                        handle_loaded(nav.page, nav.url, idx, response=nav.response)
+                    finally:
+                        pool.release(nav.page)
+                    if fetched is not None and fetched.reason:
+                        # The tab may have passed a verification page; later requests need its new cookies.
+                        (http_client or check_client).set_cookies(context.cookies())
+            finally:
+                pool.close()
+
+        def scrape_chain_prefetched(first_url: str, first_idx: int) -> None:
+            pool = TabPool(context, 2, throttle=limiter.acquire, setup=setup_tab)
+
+            def prefetch(next_url: str, next_idx: int) -> None:
+                # Same stop conditions as the serial loop: a revisit or the page cap ends the chain.
+                if next_url in visited or next_idx >= max_pages:
+                    return
+                visited.add(next_url)
+                pool.submit(next_url)
+
+            try:
+                visited.add(first_url)
+                pool.submit(first_url)
+                idx = first_idx
+                while (nav := pool.next()) is not None:
+                    try:
+                        await_navigation(nav)
+                        record_response(nav.url, nav.response)
+                        wait_ready(nav.page, nav.url)
+                        handle_loaded(nav.page, nav.url, idx, prefetch=prefetch, response=nav.response)
+                    finally:
+                        pool.release(nav.page)
+                    idx += 1
+            finally:
+                pool.close()
+
+        def scrape_listed(targets: list[str]) -> None:
+            if concurrency > 1 and http_client is not None:
+                fetch_concurrently(targets)
+            elif concurrency > 1:
+                scrape_concurrently(targets)
+            else:
+                for idx, target_url in enumerate(targets):
+                    if _normalize_url(target_url) in visited:
+                        continue
                     scrape_one(target_url, idx)
-                    if delay_s:
-                        time.sleep(delay_s)
+
+        def follow_chain(first_url: str, first_idx: int) -> None:
+            url = first_url
+            for idx in range(first_idx, max_pages):
+                next_url = scrape_one(url, idx)
+                if not next_url:
+                    break
+                url = next_url
+
+        def scrape_discovered(first_url: str, first_idx: int) -> None:
+            # Crawl the first few pages by Next: the first one yields the chapter list,
+            # and the hops show whether the list's order can be trusted.
+            sampled: list[str | None] = []
+            url, idx = first_url, first_idx
+            while len(sampled) < max(1, args.toc_check) and idx < max_pages:
+                next_url = scrape_one(url, idx)
+                sampled.append(next_url)
+                idx += 1
+                if not next_url:
+                    return
+                url = next_url
+            if idx >= max_pages:
+                return
+
+            toc = list(dict.fromkeys(_normalize_url(u) for u in toc_urls))
+            if not toc:
+                print("No chapter list found; following Next links.", file=sys.stderr)
+                follow_chain(url, idx)
+                return
+
+            pos = toc.index(first_url) if first_url in toc else -1
+            expected = toc[pos + 1 : pos + 1 + len(sampled)]
+            if sampled != expected:
+                print(
+                    f"The chapter list ({len(toc)} links) doesn't match the Next links; following Next links.",
+                    file=sys.stderr,
+                )
+                follow_chain(url, idx)
+                return
+
+            remaining = toc[pos + len(sampled) :][: max_pages - idx]
+            print(f"Chapter list matches the Next links; fetching the remaining {len(remaining)} pages as a list.")
+            scrape_listed(remaining)
+
+        try:
+            if args.from_cache or not url:
+                pass
+            elif scrape_list is not None:
+                scrape_listed(scrape_list)
+            elif args.discover_toc:
+                scrape_discovered(url, len(pages))
+            elif args.prefetch and http_client is None and not args.incremental:
+                scrape_chain_prefetched(url, len(pages))
             else:
-                for idx in range(max_pages):
-                    next_url = scrape_one(url, idx)
-                    if not next_url:
-                        break
-                    url = next_url
-                    if delay_s:
-                        time.sleep(delay_s)
+                follow_chain(url, len(pages))
+        except _StopCrawl as stop:
+            _print_resume_hint(journal, len(pages))
+            return stop.exit_code
+        except PlaywrightError as e:
+            print(f"Navigation failed: {e}", file=sys.stderr)
+            _print_resume_hint(journal, len(pages))
+            return 1
         except KeyboardInterrupt:
             print("Stopped by user.", file=sys.stderr)
+            _print_resume_hint(journal, len(pages))
             return 130
+        finally:
+            # The crawl tab isn't needed for rendering; in a shared browser it mustn't linger.
+            if page is not None:
+                with suppress(PlaywrightError):
+                    page.close()
+            if journal is not None:
+                journal.close()
+            if http_client is not None:
+                http_client.close()
+            if check_client is not None:
+                check_client.close()
+
+        if args.incremental:
+            _print_changes(changes)
 
         if not pages:
             print("No pages scraped.", file=sys.stderr)
             return 1
 
-        base_href = None if args.offline_assets else "https://www.neoseeker.com/"
-        html = build_combined_html(doc_title=doc_title, pages=pages, start_url=start_url, base_href=base_href)
+        if args.strip_boilerplate:
+            # Before asset downloads, so images that only appear in repeated blocks aren't fetched.
+            with metrics.span("boilerplate") as span:
+                stripped = cleanup.enter_context(PageStore(dir=spill_dir, use_mmap=args.mmap_pages))
+                _, boilerplate = remove_boilerplate(pages, min_share=args.boilerplate_share, into=stripped)
+                span["blocks"] = boilerplate.blocks_removed
+                span["bytes"] = boilerplate.bytes_removed
+            pages.close()
+            pages = stripped
+            metrics.count("boilerplate_blocks", boilerplate.blocks_removed)
+            metrics.count("boilerplate_bytes", boilerplate.bytes_removed)
+            print(f"Boilerplate: {boilerplate.summary()}")
+
+        # EPUB and HTML output package the images, so they always need local copies.
+        localize = args.offline_assets or args.format != "pdf"
+        base_href = None if localize else "https://www.neoseeker.com/"
 
         assets_base_dir: str | None = None
-        if args.offline_assets:
+        if localize:
             pdf_path = Path(output_pdf)
-            default_assets_dir = pdf_path.parent / f"{pdf_path.stem}_assets"
-            assets_dir = Path(args.assets_dir) if args.assets_dir else default_assets_dir
-            html, downloaded = localize_assets(
-                context=context,
-                html=html,
-                output_dir=str(assets_dir),
-                asset_subdir="assets",
-                referer_url=start_url,
-            )
-            print(f"Downloaded {downloaded} assets into: {assets_dir}")
+            if args.assets_dir:
+                assets_dir = Path(args.assets_dir)
+            elif args.format != "pdf":
+                # Only needed until the images are packaged into the output.
+                assets_dir = Path(
+                    cleanup.enter_context(tempfile.TemporaryDirectory(prefix=f"{pdf_path.stem}-assets-", dir=spill_dir))
+                )
+            else:
+                assets_dir = pdf_path.parent / f"{pdf_path.stem}_assets"
             assets_base_dir = str(assets_dir.resolve())
 
-        if args.save_html:
-            html_path = Path(args.save_html)
-            html_path.parent.mkdir(parents=True, exist_ok=True)
-            html_path.write_text(html, encoding="utf-8")
+            image_options: ImageOptions | None = None
+            image_stats = ImageStats()
+            if args.optimize_images:
+                image_options = ImageOptions(
+                    cache_dir=Path(args.cache_dir).resolve() / "images",
+                    dpi=args.image_dpi,
+                    quality=args.image_quality,
+                    format=args.image_format,
+                )
+            asset_cache: AssetCache | None = None
+            if args.asset_cache_mb > 0:
+                asset_cache = cleanup.enter_context(
+                    AssetCache(Path(args.cache_dir).resolve() / "assets", max_bytes=int(args.asset_cache_mb * 1024 * 1024))
+                )
 
-        render_pdf(context=context, html=html, output_pdf=output_pdf, content_base_dir=assets_base_dir)
-        # Only close persistent contexts that we launched; for CDP we leave the user's browser alone.
-        if not args.cdp_url:
-            context.close()
+            # Rewrite each page's own HTML rather than re-parsing the combined document.
+            asset_client = HttpClient.from_context(context, per_host_limit=args.asset_host_limit, limiter=limiter)
+            try:
+                with metrics.span("assets") as span:
+                    localized = cleanup.enter_context(PageStore(dir=spill_dir, use_mmap=args.mmap_pages))
+                    _, downloaded = localize_page_assets(
+                        context=context,
+                        pages=pages,
+                        output_dir=str(assets_dir),
+                        asset_subdir="assets",
+                        referer_url=start_url,
+                        workers=args.asset_workers,
+                        client=asset_client,
+                        cache=asset_cache,
+                        image_options=image_options,
+                        image_stats=image_stats,
+                        limiter=limiter,
+                        into=localized,
+                    )
+                    span["downloaded"] = downloaded
+            finally:
+                asset_client.close()
+            pages.close()
+            pages = localized
+            if measuring:
+                files, size = dir_stats(assets_dir / "assets")
+                metrics.count("assets_downloaded", downloaded)
+                metrics.count("asset_files", files)
+                metrics.count("asset_bytes", size)
+            print(f"Downloaded {downloaded} assets into: {assets_dir}")
+            _save_asset_cache(asset_cache)
+            _print_image_stats(image_options, image_stats)
+
+        if args.format != "pdf":
+            write_output = write_epub if args.format == "epub" else write_html_bundle
+            with metrics.span(f"write_{args.format}") as span:
+                span["bytes"] = write_output(
+                    output_pdf, doc_title=doc_title, pages=pages, start_url=start_url, assets_dir=assets_base_dir
+                )
+            print(f"Wrote {args.format.upper()}: {output_pdf}")
+            return 0
+
+        chunk_size = int(args.chunk_size)
+        if render_workers > 1 and chunk_size <= 0:
+            chunk_size = max(1, -(-len(pages) // render_workers))
+
+        if chunk_size > 0:
+
+            def chunk_documents():
+                docs = iter_chunk_documents(
+                    doc_title=doc_title,
+                    pages=pages,
+                    start_url=start_url,
+                    chunk_size=chunk_size,
+                    base_href=base_href,
+                )
+                for n, chunk_html in enumerate(docs, start=1):
+                    if args.save_html:
+                        html_path = Path(args.save_html)
+                        html_path.parent.mkdir(parents=True, exist_ok=True)
+                        html_path.with_name(f"{html_path.stem}.part{n:04d}{html_path.suffix}").write_text(chunk_html, encoding="utf-8")
+                    yield chunk_html
+
+            with metrics.span("render_pdf", chunk_size=chunk_size, workers=render_workers) as span:
+                chunks = render_pdf_chunked(
+                    context=context,
+                    documents=chunk_documents(),
+                    output_pdf=output_pdf,
+                    content_base_dir=assets_base_dir,
+                    workers=render_workers,
+                    # A CDP browser can't be launched again; its workers fall back to Chromium.
+                    channel="chrome" if args.browser == "chrome" and not args.cdp_url else None,
+                )
+                span["chunks"] = chunks
+            print(f"Rendered {chunks} chunks of up to {chunk_size} pages")
+            print(f"Wrote PDF: {output_pdf}")
+            return 0
+
+        # The combined document is streamed to disk and loaded via file://. Offline
+        # assets use paths relative to the assets dir, so it has to live there.
+        save_path = Path(args.save_html) if args.save_html else None
+        if assets_base_dir:
+            html_file = Path(assets_base_dir) / "combined.html"
+        elif save_path is not None:
+            html_file = save_path
+        else:
+            html_file = Path(output_pdf).with_suffix(".combined.html")
+        with metrics.span("build_html") as span:
+            span["bytes"] = write_combined_html(
+                html_file, doc_title=doc_title, pages=pages, start_url=start_url, base_href=base_href
+            )
+        if save_path is not None and save_path != html_file:
+            save_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(html_file, save_path)
+
+        try:
+            with metrics.span("render_pdf"):
+                render_pdf_file(context=context, html_file=html_file, output_pdf=output_pdf)
+        finally:
+            if not assets_base_dir and save_path is None:
+                html_file.unlink(missing_ok=True)
 
     print(f"Wrote PDF: {output_pdf}")
     return 0
@@ -0,0 +1,454 @@
+from __future__ import annotations
+
+import base64
+from collections.abc import Sequence
+from dataclasses import replace
+from datetime import datetime, timezone
+import functools
+from html import escape
+import mimetypes
+import os
+from pathlib import Path
+import re
+from typing import Callable, Iterator
+from urllib.parse import urldefrag, urlparse
+import uuid
+import zipfile
+
+import lxml.etree
+import lxml.html
+
+from .model import ScrapedPage
+from .neoseeker import parse_fragment, serialize_fragment
+from .pdf import write_combined_html
+from .store import PageStore
+
+
+OUTPUT_FORMATS = ("pdf", "epub", "html")
+
+_EPUB_CSS = """
+body { font-family: serif; line-height: 1.45; }
+h1 { font-size: 1.5em; margin: 0 0 0.3em 0; }
+.meta { color: #555; font-size: 0.8em; margin-bottom: 1em; }
+img { max-width: 100%; height: auto; }
+pre { white-space: pre-wrap; font-size: 0.85em; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border: 1px solid #ccc; padding: 0.3em; vertical-align: top; }
+nav ol { list-style: none; padding-left: 0; }
+"""
+
+_CONTAINER_XML = """<?xml version="1.0" encoding="utf-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+<rootfiles>
+<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+</rootfiles>
+</container>
+"""
+
+# Elements an EPUB reader won't run or a single file can't carry.
+_DROP_TAGS = ("script", "noscript", "style", "iframe", "object", "embed", "link", "meta", "base")
+
+# Tag and attribute names that serialize as well-formed XML (no prefixes).
+_XML_NAME_RE = re.compile(r"^[A-Za-z_][\w.-]*$")
+
+_STYLE_URL_RE = re.compile(r"url\((?P<q>['\"]?)(?P<u>.*?)(?P=q)\)", re.IGNORECASE)
+
+_SVG_NS = "http://www.w3.org/2000/svg"
+_MATHML_NS = "http://www.w3.org/1998/Math/MathML"
+_XLINK_NS = "http://www.w3.org/1999/xlink"
+
+# The HTML parser lowercases every name; these are the mixed-case SVG and MathML
+# ones to restore (the HTML spec's "adjust SVG/MathML" tables).
+_SVG_TAGS = {
+    name.lower(): name
+    for name in """
+    altGlyph altGlyphDef altGlyphItem animateColor animateMotion animateTransform clipPath feBlend
+    feColorMatrix feComponentTransfer feComposite feConvolveMatrix feDiffuseLighting feDisplacementMap
+    feDistantLight feDropShadow feFlood feFuncA feFuncB feFuncG feFuncR feGaussianBlur feImage feMerge
+    feMergeNode feMorphology feOffset fePointLight feSpecularLighting feSpotLight feTile feTurbulence
+    foreignObject glyphRef linearGradient radialGradient textPath
+    """.split()
+}
+_SVG_ATTRS = {
+    name.lower(): name
+    for name in """
+    attributeName attributeType baseFrequency baseProfile calcMode clipPathUnits diffuseConstant edgeMode
+    filterUnits glyphRef gradientTransform gradientUnits kernelMatrix kernelUnitLength keyPoints keySplines
+    keyTimes lengthAdjust limitingConeAngle markerHeight markerUnits markerWidth maskContentUnits maskUnits
+    numOctaves pathLength patternContentUnits patternTransform patternUnits pointsAtX pointsAtY pointsAtZ
+    preserveAlpha preserveAspectRatio primitiveUnits refX refY repeatCount repeatDur requiredExtensions
+    requiredFeatures specularConstant specularExponent spreadMethod startOffset stdDeviation stitchTiles
+    surfaceScale systemLanguage tableValues targetX targetY textLength viewBox viewTarget xChannelSelector
+    yChannelSelector zoomAndPan
+    """.split()
+}
+_MATHML_ATTRS = {"definitionurl": "definitionURL"}
+
+# Already compressed; deflating them again only costs time.
+_STORED_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp", "image/avif")
+
+
+def write_epub(
+    path: str | Path,
+    *,
+    doc_title: str,
+    pages: Sequence[ScrapedPage],
+    start_url: str,
+    assets_dir: str | Path | None = None,
+    language: str = "en",
+) -> int:
+    """Package pages as an EPUB 3 book with one chapter per page.
+
+    The book is assembled directly from the pages, with no browser involved and
+    one chapter in memory at a time. It has a title page, a nav document and
+    an NCX table of contents for older readers. Images that
+    localize_page_assets wrote under assets_dir go into the book. Links
+    between scraped pages point at their chapters. Inline SVG and MathML are
+    moved into their own namespaces. Returns the file size.
+    """
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    assets_root = Path(assets_dir).resolve() if assets_dir else None
+    targets = _page_targets(pages, lambda i, frag: _chapter_name(i) + (f"#{frag}" if frag else ""))
+
+    chapters: list[tuple[str, str, str]] = []  # (file name, title, manifest properties)
+    packaged: dict[str, str] = {}  # asset href -> media type
+
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as book:
+        # The mimetype entry has to come first, uncompressed.
+        book.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        book.writestr("META-INF/container.xml", _CONTAINER_XML)
+        book.writestr("OEBPS/style.css", _EPUB_CSS)
+        book.writestr(
+            "OEBPS/title.xhtml",
+            _xhtml_document(
+                doc_title,
+                f"<h1>{escape(doc_title)}</h1>\n<p class=\"meta\">Source: "
+                f"<a href=\"{escape(start_url)}\">{escape(start_url)}</a></p>",
+                language=language,
+            ),
+        )
+
+        total = len(pages)
+        for i, page in enumerate(pages, start=1):
+            root = _prepare(page, targets)
+            remote = False
+            for el, ref in list(_image_refs(root)):
+                if not _is_local(ref):
+                    remote = True
+                    continue
+                if ref not in packaged:
+                    file = _asset_file(assets_root, ref)
+                    if file is None:
+                        # Not downloaded; a dangling local reference would make the book invalid.
+                        if el.tag == "img":
+                            el.drop_tree()
+                        else:
+                            el.attrib.pop("style", None)
+                        continue
+                    media_type = mimetypes.guess_type(file.name)[0] or "application/octet-stream"
+                    book.write(
+                        file,
+                        f"OEBPS/{ref}",
+                        compress_type=zipfile.ZIP_STORED if media_type in _STORED_TYPES else zipfile.ZIP_DEFLATED,
+                    )
+                    packaged[ref] = media_type
+            properties = _namespace_foreign(root)
+            if remote:
+                properties.append("remote-resources")
+            root.set("class", "content")
+            body = "\n".join(
+                [
+                    f"<h1>{escape(page.title)}</h1>",
+                    f"<p class=\"meta\">{i}/{total} • <a href=\"{escape(page.url)}\">{escape(page.url)}</a></p>",
+                    lxml.etree.tostring(root, method="xml", encoding="unicode"),
+                ]
+            )
+            name = _chapter_name(i)
+            book.writestr(f"OEBPS/{name}", _xhtml_document(page.title, body, language=language))
+            chapters.append((name, page.title, " ".join(properties)))
+
+        book.writestr("OEBPS/nav.xhtml", _nav_document(doc_title, chapters, language=language))
+        book.writestr("OEBPS/toc.ncx", _ncx_document(doc_title, chapters, book_id=_book_id(start_url)))
+        book.writestr(
+            "OEBPS/content.opf",
+            _package_document(doc_title, chapters, packaged, start_url=start_url, language=language),
+        )
+
+    os.replace(tmp_path, path)
+    return path.stat().st_size
+
+
+def write_html_bundle(
+    path: str | Path,
+    *,
+    doc_title: str,
+    pages: Sequence[ScrapedPage],
+    start_url: str,
+    assets_dir: str | Path | None = None,
+) -> int:
+    """Write the combined document as one self-contained HTML file.
+
+    Local images under assets_dir are inlined as data: URIs and links between
+    scraped pages jump to their sections, so the file opens anywhere on its
+    own. Pages are streamed as in write_combined_html. Returns the file size.
+    """
+
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    assets_root = Path(assets_dir).resolve() if assets_dir else None
+    targets = _page_targets(pages, lambda i, frag: f"#{frag}" if frag else f"#page-{i}")
+
+    def inline(page: ScrapedPage) -> ScrapedPage:
+        root = _prepare(page, targets)
+        for el, ref in list(_image_refs(root)):
+            file = _asset_file(assets_root, ref) if _is_local(ref) else None
+            if file is None:
+                continue
+            if el.tag == "img" and el.get("src") == ref:
+                el.set("src", _data_uri(str(file)))
+            else:
+                el.set("style", el.get("style", "").replace(ref, _data_uri(str(file))))
+        return replace(page, content_html=serialize_fragment(root))
+
+    write_combined_html(
+        tmp_path,
+        doc_title=doc_title,
+        pages=_MappedPages(pages, inline),
+        start_url=start_url,
+        base_href=None,
+    )
+    os.replace(tmp_path, path)
+    return path.stat().st_size
+
+
+class _MappedPages(Sequence):
+    # Applies fn lazily so only one transformed page exists at a time.
+    def __init__(self, pages: Sequence[ScrapedPage], fn: Callable[[ScrapedPage], ScrapedPage]) -> None:
+        self._pages = pages
+        self._fn = fn
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._fn(p) for p in self._pages[index]]
+        return self._fn(self._pages[index])
+
+    def __iter__(self) -> Iterator[ScrapedPage]:
+        return (self._fn(p) for p in self._pages)
+
+
+def _page_targets(
+    pages: Sequence[ScrapedPage], href: Callable[[int, str], str]
+) -> Callable[[str], str | None]:
+    urls = pages.urls() if isinstance(pages, PageStore) else [p.url for p in pages]
+    index: dict[str, int] = {}
+    for i, url in enumerate(urls, start=1):
+        index.setdefault(_url_key(url), i)
+
+    def target(link: str) -> str | None:
+        url, frag = urldefrag(link)
+        i = index.get(_url_key(url))
+        return href(i, frag) if i is not None else None
+
+    return target
+
+
+def _url_key(url: str) -> str:
+    return url.rstrip("/")
+
+
+def _prepare(page: ScrapedPage, target: Callable[[str], str | None]) -> lxml.html.HtmlElement:
+    """Parse a page's content and make it safe to serialize as XHTML."""
+
+    root = parse_fragment(page.content_html)
+    for el in list(root.iter(*_DROP_TAGS, lxml.etree.Comment, lxml.etree.ProcessingInstruction)):
+        el.drop_tree()
+    for el in root.iter():
+        if not isinstance(el.tag, str):
+            continue
+        if not _XML_NAME_RE.match(el.tag):
+            el.tag = "span"
+        if "xlink:href" in el.attrib:
+            # SVG 2 spelling; _namespace_foreign puts it back in the XLink namespace for EPUB.
+            value = el.attrib.pop("xlink:href")
+            if el.get("href") is None:
+                el.set("href", value)
+        for name in list(el.attrib):
+            if not _XML_NAME_RE.match(name) or name.lower().startswith("on"):
+                del el.attrib[name]
+        if el.tag == "a" and el.get("href"):
+            href = target(el.get("href"))
+            if href is not None:
+                el.set("href", href)
+    return root
+
+
+def _namespace_foreign(root: lxml.html.HtmlElement) -> list[str]:
+    """Move inline <svg> and <math> into their XML namespaces, with mixed-case names restored.
+
+    XHTML readers only render them in their own namespaces. Returns the EPUB
+    manifest properties ("svg", "mathml") the chapter now needs.
+    """
+
+    properties: list[str] = []
+    # Converted subtrees are namespaced, so each pass finds the next outermost one.
+    while (el := next(root.iter("svg", "math"), None)) is not None:
+        ns, prop = (_SVG_NS, "svg") if el.tag == "svg" else (_MATHML_NS, "mathml")
+        if prop not in properties:
+            properties.append(prop)
+        copy = _foreign_copy(el, ns, None)
+        copy.tail = el.tail
+        el.getparent().replace(el, copy)
+    return properties
+
+
+def _foreign_copy(el: lxml.html.HtmlElement, ns: str, parent: lxml.etree._Element | None) -> lxml.etree._Element:
+    tags, attrs = (_SVG_TAGS, _SVG_ATTRS) if ns == _SVG_NS else ({}, _MATHML_ATTRS)
+    tag = f"{{{ns}}}{tags.get(el.tag, el.tag)}"
+    if parent is None:
+        nsmap = {None: ns, "xlink": _XLINK_NS} if ns == _SVG_NS else {None: ns}
+        copy = lxml.etree.Element(tag, nsmap=nsmap)
+    else:
+        copy = lxml.etree.SubElement(parent, tag)
+    for name, value in el.attrib.items():
+        if ns == _SVG_NS and name == "href":
+            copy.set(f"{{{_XLINK_NS}}}href", value)
+        else:
+            copy.set(attrs.get(name, name), value)
+    copy.text = el.text
+    for child in el:
+        # foreignObject holds HTML, which would need its own namespace handling; it's dropped.
+        if isinstance(child.tag, str) and child.tag != "foreignobject":
+            _foreign_copy(child, ns, copy).tail = child.tail
+    return copy
+
+
+def _image_refs(root: lxml.html.HtmlElement) -> Iterator[tuple[lxml.html.HtmlElement, str]]:
+    for el in root.iter():
+        if el.tag == "img" and el.get("src"):
+            yield el, el.get("src")
+        style = el.get("style")
+        if style and "url(" in style:
+            for m in _STYLE_URL_RE.finditer(style):
+                if m.group("u"):
+                    yield el, m.group("u")
+
+
+def _is_local(ref: str) -> bool:
+    return not urlparse(ref).scheme and not ref.startswith(("/", "#"))
+
+
+def _asset_file(assets_root: Path | None, ref: str) -> Path | None:
+    if assets_root is None:
+        return None
+    file = (assets_root / ref).resolve()
+    return file if file.is_relative_to(assets_root) and file.is_file() else None
+
+
+@functools.lru_cache(maxsize=128)
+def _data_uri(file: str) -> str:
+    media_type = mimetypes.guess_type(file)[0] or "application/octet-stream"
+    return f"data:{media_type};base64,{base64.b64encode(Path(file).read_bytes()).decode('ascii')}"
+
+
+def _chapter_name(i: int) -> str:
+    return f"page-{i:04d}.xhtml"
+
+
+def _book_id(start_url: str) -> str:
+    # Stable across rebuilds, so readers treat a rebuilt book as the same book.
+    return f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, start_url)}"
+
+
+def _xhtml_document(title: str, body: str, *, language: str) -> str:
+    return "\n".join(
+        [
+            '<?xml version="1.0" encoding="utf-8"?>',
+            "<!DOCTYPE html>",
+            f'<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="{escape(language)}" lang="{escape(language)}">',
+            "<head>",
+            '<meta charset="utf-8"/>',
+            f"<title>{escape(title)}</title>",
+            '<link rel="stylesheet" type="text/css" href="style.css"/>',
+            "</head>",
+            "<body>",
+            body,
+            "</body>",
+            "</html>",
+        ]
+    )
+
+
+def _nav_document(doc_title: str, chapters: list[tuple[str, str, str]], *, language: str) -> str:
+    items = "\n".join(f'<li><a href="{name}">{escape(title)}</a></li>' for name, title, _properties in chapters)
+    body = f'<nav epub:type="toc" id="toc">\n<h1>{escape(doc_title)}</h1>\n<ol>\n{items}\n</ol>\n</nav>'
+    return _xhtml_document(doc_title, body, language=language)
+
+
+def _ncx_document(doc_title: str, chapters: list[tuple[str, str, str]], *, book_id: str) -> str:
+    points = "\n".join(
+        f'<navPoint id="nav-{n}" playOrder="{n}"><navLabel><text>{escape(title)}</text></navLabel>'
+        f'<content src="{name}"/></navPoint>'
+        for n, (name, title, _properties) in enumerate(chapters, start=1)
+    )
+    return "\n".join(
+        [
+            '<?xml version="1.0" encoding="utf-8"?>',
+            '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">',
+            f'<head><meta name="dtb:uid" content="{book_id}"/></head>',
+            f"<docTitle><text>{escape(doc_title)}</text></docTitle>",
+            "<navMap>",
+            points,
+            "</navMap>",
+            "</ncx>",
+        ]
+    )
+
+
+def _package_document(
+    doc_title: str,
+    chapters: list[tuple[str, str, str]],
+    packaged: dict[str, str],
+    *,
+    start_url: str,
+    language: str,
+) -> str:
+    modified = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    manifest = [
+        '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>',
+        '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>',
+        '<item id="css" href="style.css" media-type="text/css"/>',
+        '<item id="title" href="title.xhtml" media-type="application/xhtml+xml"/>',
+    ]
+    for name, _title, properties in chapters:
+        attr = f' properties="{properties}"' if properties else ""
+        manifest.append(f'<item id="{name[:-6]}" href="{name}" media-type="application/xhtml+xml"{attr}/>')
+    for n, (href, media_type) in enumerate(packaged.items(), start=1):
+        manifest.append(f'<item id="asset-{n}" href="{escape(href)}" media-type="{media_type}"/>')
+    spine = ['<itemref idref="title"/>'] + [f'<itemref idref="{name[:-6]}"/>' for name, _title, _properties in chapters]
+
+    return "\n".join(
+        [
+            '<?xml version="1.0" encoding="utf-8"?>',
+            f'<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id" xml:lang="{escape(language)}">',
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">',
+            f'<dc:identifier id="book-id">{_book_id(start_url)}</dc:identifier>',
+            f"<dc:title>{escape(doc_title)}</dc:title>",
+            f"<dc:language>{escape(language)}</dc:language>",
+            f"<dc:source>{escape(start_url)}</dc:source>",
+            f'<meta property="dcterms:modified">{modified}</meta>',
+            "</metadata>",
+            "<manifest>",
+            *manifest,
+            "</manifest>",
+            '<spine toc="ncx">',
+            *spine,
+            "</spine>",
+            "</package>",
+        ]
+    )
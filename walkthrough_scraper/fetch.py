@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import http.client
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Callable
+import weakref
+from urllib.parse import urljoin, urlparse
+
+from playwright.sync_api import BrowserContext
+
+from .ratelimit import HostRateLimiter
+
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/131.0.0.0 Safari/537.36"
+)
+
+_CHUNK_SIZE = 64 * 1024
+_MAX_REDIRECTS = 5
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    headers: dict[str, str] = field(default_factory=dict)
+    path: Path | None = None
+    body: bytes | None = None
+    size: int = 0
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and 200 <= self.status < 300
+
+    @property
+    def content_type(self) -> str:
+        return (self.headers.get("content-type") or "").split(";")[0].strip().lower()
+
+    def text(self) -> str:
+        """Decode an in-memory body using the Content-Type charset (UTF-8 if absent)."""
+
+        charset = "utf-8"
+        for param in (self.headers.get("content-type") or "").split(";")[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "charset" and value.strip():
+                charset = value.strip().strip("\"'")
+        try:
+            return (self.body or b"").decode(charset, errors="replace")
+        except LookupError:
+            return (self.body or b"").decode("utf-8", errors="replace")
+
+
+# navigator.userAgent per context, read once.
+_user_agents: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def browser_user_agent(context: BrowserContext) -> str:
+    """The user agent the context's pages send (DEFAULT_USER_AGENT if it can't be read)."""
+
+    try:
+        return _user_agents[context]
+    except (KeyError, TypeError):
+        pass
+    user_agent = DEFAULT_USER_AGENT
+    try:
+        if context.pages:
+            user_agent = context.pages[0].evaluate("navigator.userAgent") or user_agent
+        else:
+            page = context.new_page()
+            try:
+                user_agent = page.evaluate("navigator.userAgent") or user_agent
+            finally:
+                page.close()
+    except Exception:
+        return user_agent
+    try:
+        _user_agents[context] = user_agent
+    except TypeError:
+        pass
+    return user_agent
+
+
+class HttpClient:
+    """Thread-safe HTTP client that reuses a BrowserContext's cookies.
+
+    Playwright's sync API (including context.request) can only be used from the
+    thread that created it, so worker threads use http.client instead. Cookies
+    are snapshotted from the context up front. Each thread keeps one keep-alive
+    connection per host, and a per-host semaphore caps concurrent requests.
+    With a limiter, every request (redirect hops included) is paced by it and
+    its status fed back.
+    """
+
+    def __init__(
+        self,
+        *,
+        cookies: list[dict] | None = None,
+        user_agent: str = DEFAULT_USER_AGENT,
+        per_host_limit: int = 4,
+        timeout_s: float = 60.0,
+        limiter: HostRateLimiter | None = None,
+    ) -> None:
+        self._cookies = list(cookies or [])
+        self.limiter = limiter
+        self.user_agent = user_agent
+        self._per_host_limit = max(1, per_host_limit)
+        self._timeout_s = timeout_s
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._all_conns: list[http.client.HTTPConnection] = []
+
+    @classmethod
+    def from_context(cls, context: BrowserContext, **kwargs) -> "HttpClient":
+        """A client with the context's cookies that sends the browser's own user agent.
+
+        Clearance cookies are tied to the user agent, which for a CDP-attached
+        or branded Chrome differs from DEFAULT_USER_AGENT.
+        """
+
+        try:
+            cookies = context.cookies()
+        except Exception:
+            cookies = []
+        kwargs.setdefault("user_agent", browser_user_agent(context))
+        return cls(cookies=cookies, **kwargs)
+
+    def get(
+        self,
+        url: str,
+        *,
+        headers: dict[str, str] | None = None,
+        dest: Path | Callable[[FetchResult], Path] | None = None,
+    ) -> FetchResult:
+        """GET url, following redirects.
+
+        With dest, a successful body is streamed to that file instead of being kept
+        in memory. dest may be a callable that picks the path once the final
+        response headers are known (e.g. to choose an extension).
+        """
+
+        current = url
+        for _ in range(_MAX_REDIRECTS + 1):
+            if self.limiter is not None:
+                self.limiter.acquire(current)
+            try:
+                result, location = self._request_once(current, headers=headers, dest=dest)
+            except (OSError, http.client.HTTPException) as e:
+                return FetchResult(url=current, status=0, error=str(e) or type(e).__name__)
+            if self.limiter is not None:
+                self.limiter.record(current, status=result.status, retry_after=result.headers.get("retry-after"))
+            if location is None:
+                return result
+            current = urljoin(current, location)
+        return FetchResult(url=current, status=0, error="too many redirects")
+
+    def set_cookies(self, cookies: list[dict]) -> None:
+        """Replace the cookie snapshot, e.g. after the browser passed a verification page."""
+
+        with self._lock:
+            self._cookies = list(cookies)
+
+    def close(self) -> None:
+        with self._lock:
+            conns, self._all_conns = self._all_conns, []
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def cookie_header(self, url: str) -> str:
+        parsed = urlparse(url)
+        host = (parsed.hostname or "").lower()
+        path = parsed.path or "/"
+        secure = parsed.scheme == "https"
+
+        now = time.time()
+        pairs = []
+        for c in self._cookies:
+            # Playwright reports session cookies with expires == -1.
+            expires = c.get("expires")
+            if expires is not None and 0 < expires <= now:
+                continue
+            domain = (c.get("domain") or "").lower().lstrip(".")
+            if not domain or not (host == domain or host.endswith("." + domain)):
+                continue
+            if not path.startswith(c.get("path") or "/"):
+                continue
+            if c.get("secure") and not secure:
+                continue
+            pairs.append(f"{c.get('name')}={c.get('value')}")
+        return "; ".join(pairs)
+
+    def _request_once(
+        self,
+        url: str,
+        *,
+        headers: dict[str, str] | None,
+        dest: Path | Callable[[FetchResult], Path] | None,
+    ) -> tuple[FetchResult, str | None]:
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            return FetchResult(url=url, status=0, error="unsupported URL"), None
+
+        req_headers = {"User-Agent": self.user_agent, "Accept": "*/*"}
+        cookie = self.cookie_header(url)
+        if cookie:
+            req_headers["Cookie"] = cookie
+        req_headers.update(headers or {})
+
+        target = parsed.path or "/"
+        if parsed.query:
+            target += "?" + parsed.query
+
+        with self._slot(parsed.netloc):
+            for attempt in range(2):
+                conn = self._connection(parsed.scheme, parsed.netloc)
+                try:
+                    conn.request("GET", target, headers=req_headers)
+                    resp = conn.getresponse()
+                    break
+                except (OSError, http.client.HTTPException):
+                    # A reused keep-alive connection may have been closed by the server.
+                    self._drop_connection(parsed.scheme, parsed.netloc)
+                    if attempt == 1:
+                        raise
+
+            resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+            result = FetchResult(url=url, status=resp.status, headers=resp_headers)
+
+            if resp.status in (301, 302, 303, 307, 308) and resp_headers.get("location"):
+                resp.read()
+                return result, resp_headers["location"]
+
+            if not result.ok or dest is None:
+                result.body = resp.read()
+                result.size = len(result.body)
+                return result, None
+
+            if callable(dest):
+                dest = dest(result)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_name(f".{dest.name}.{threading.get_ident()}.part")
+            try:
+                with tmp.open("wb") as f:
+                    while True:
+                        chunk = resp.read(_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        result.size += len(chunk)
+                os.replace(tmp, dest)
+            finally:
+                tmp.unlink(missing_ok=True)
+            result.path = dest
+            return result, None
+
+    def _slot(self, netloc: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._host_slots.get(netloc)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self._per_host_limit)
+                self._host_slots[netloc] = slot
+            return slot
+
+    def _connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        key = (scheme, netloc)
+        conn = conns.get(key)
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = cls(netloc, timeout=self._timeout_s)
+            conns[key] = conn
+            with self._lock:
+                self._all_conns.append(conn)
+        return conn
+
+    def _drop_connection(self, scheme: str, netloc: str) -> None:
+        conns = getattr(self._local, "conns", {})
+        conn = conns.pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
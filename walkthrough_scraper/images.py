@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+import multiprocessing
+import os
+from pathlib import Path
+import threading
+
+from .asset_cache import file_sha256, link_or_copy
+
+try:
+    from PIL import Image
+except ImportError:  # Optional: only needed for --optimize-images.
+    Image = None
+
+
+# Letter is 8.5in wide; the PDF uses 14mm left/right margins.
+PRINTABLE_WIDTH_IN = 8.5 - 2 * 14 / 25.4
+
+_RASTER_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+
+# Spawned workers each re-import Pillow, so pools outlive a single call (and a
+# single job under batch/serve). Keyed by worker count.
+_pools: dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ImageOptions:
+    cache_dir: Path
+    dpi: int = 150
+    quality: int = 80
+    format: str = "jpeg"
+    workers: int = 0
+
+    @property
+    def max_width_px(self) -> int:
+        return max(1, int(PRINTABLE_WIDTH_IN * self.dpi))
+
+    @property
+    def ext(self) -> str:
+        return ".webp" if self.format == "webp" else ".jpg"
+
+
+@dataclass
+class ImageStats:
+    processed: int = 0
+    reused: int = 0
+    skipped: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+
+def pillow_available() -> bool:
+    return Image is not None
+
+
+def optimize_images(
+    local_paths: dict[str, str],
+    *,
+    base_dir: Path,
+    options: ImageOptions,
+    stats: ImageStats | None = None,
+) -> tuple[dict[str, str], ImageStats]:
+    """Downscale and re-encode downloaded images for print.
+
+    local_paths maps URL -> path relative to base_dir (as produced by
+    localize_assets). Returns the same mapping pointing at the optimized files
+    where that helped. Transcoded files are cached under options.cache_dir by
+    source hash and settings, so each source is only transcoded once across runs,
+    and the downloaded originals they replace are deleted from base_dir.
+    Pass `stats` to accumulate counts over several calls.
+    """
+
+    if stats is None:
+        stats = ImageStats()
+    if Image is None or not local_paths:
+        return dict(local_paths), stats
+
+    options.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # Several URLs can share one local file (content-addressed assets).
+    jobs: dict[str, tuple[Path, Path]] = {}
+    for rel in set(local_paths.values()):
+        src = base_dir / rel
+        if src.suffix.lower() not in _RASTER_EXTS or not src.exists():
+            stats.skipped += 1
+            continue
+        digest = file_sha256(src)[:32]
+        cached = options.cache_dir / f"img-{digest}-{options.max_width_px}w-q{options.quality}{options.ext}"
+        jobs[rel] = (src, cached)
+
+    todo = [
+        (rel, src, cached)
+        for rel, (src, cached) in jobs.items()
+        if not cached.exists() and not _skip_marker(cached).exists()
+    ]
+    stats.reused += sum(1 for _src, cached in jobs.values() if cached.exists())
+
+    produced: set[str] = set()
+    if todo:
+        pool = _shared_pool(options.workers or (os.cpu_count() or 1))
+        try:
+            futures = {
+                rel: pool.submit(_transcode, str(src), str(cached), options.max_width_px, options.format, options.quality)
+                for rel, src, cached in todo
+            }
+            for rel, future in futures.items():
+                if future.result():
+                    produced.add(rel)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            raise
+        stats.processed += len(produced)
+
+    optimized_rel: dict[str, str] = {}
+    for rel, (src, cached) in jobs.items():
+        if not cached.exists():
+            stats.skipped += 1
+            continue
+        stats.bytes_before += src.stat().st_size
+        stats.bytes_after += cached.stat().st_size
+        dest = src.with_name(cached.name)
+        link_or_copy(cached, dest)
+        if dest != src:
+            # Nothing points at the original any more; don't ship it alongside the copy.
+            src.unlink(missing_ok=True)
+        optimized_rel[rel] = str(Path(rel).with_name(cached.name).as_posix())
+
+    rewritten = {url: optimized_rel.get(rel, rel) for url, rel in local_paths.items()}
+    return rewritten, stats
+
+
+def _shared_pool(workers: int) -> ProcessPoolExecutor:
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            # Spawn starts workers on demand, so an idle slot costs nothing.
+            pool = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn"))
+            _pools[workers] = pool
+        return pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    # A worker died; the next call starts a fresh pool.
+    with _pools_lock:
+        for workers, existing in list(_pools.items()):
+            if existing is pool:
+                del _pools[workers]
+    pool.shutdown(wait=False)
+
+
+def _skip_marker(cached: Path) -> Path:
+    return cached.with_name(cached.name + ".skip")
+
+
+def _transcode(src: str, dest: str, max_width: int, fmt: str, quality: int) -> bool:
+    """Worker: write a downscaled/re-encoded copy of src to dest.
+
+    Returns False when the image can't be decoded, is animated, or re-encoding
+    wouldn't make it smaller; a marker file records that so it isn't retried.
+    """
+
+    try:
+        done = _transcode_to(src, dest, max_width, fmt, quality)
+    except Exception:
+        done = False
+    if not done:
+        _skip_marker(Path(dest)).touch()
+    return done
+
+
+def _transcode_to(src: str, dest: str, max_width: int, fmt: str, quality: int) -> bool:
+    with Image.open(src) as im:
+        if getattr(im, "is_animated", False):
+            return False
+
+        im.load()
+        resized = False
+        if im.width > max_width:
+            height = max(1, round(im.height * max_width / im.width))
+            im = im.resize((max_width, height), Image.LANCZOS)
+            resized = True
+
+        if fmt == "webp":
+            if im.mode not in ("RGB", "RGBA"):
+                im = im.convert("RGBA" if "A" in im.getbands() or "transparency" in im.info else "RGB")
+            save_kwargs = {"format": "WEBP", "quality": quality, "method": 4}
+        else:
+            # JPEG has no alpha; flatten onto white like the printed page.
+            if im.mode in ("RGBA", "LA", "P"):
+                rgba = im.convert("RGBA")
+                flat = Image.new("RGB", rgba.size, (255, 255, 255))
+                flat.paste(rgba, mask=rgba.getchannel("A"))
+                im = flat
+            elif im.mode != "RGB":
+                im = im.convert("RGB")
+            save_kwargs = {"format": "JPEG", "quality": quality, "optimize": True, "progressive": True}
+
+        tmp = Path(dest).with_suffix(f".{os.getpid()}.tmp")
+        im.save(tmp, **save_kwargs)
+
+    if not resized and tmp.stat().st_size >= Path(src).stat().st_size:
+        tmp.unlink(missing_ok=True)
+        return False
+    os.replace(tmp, dest)
+    return True
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+import time
+from typing import Iterator
+
+from .model import ScrapedPage
+
+
+@dataclass(frozen=True)
+class JournalEntry:
+    page: ScrapedPage
+    extracted_title: str
+    next_url: str | None
+
+
+class CrawlJournal:
+    """Append-only JSONL record of scraped pages, for --resume.
+
+    Records are flushed on every append and fsync'd in batches; a crash can
+    lose at most the last unsynced batch, and torn lines are skipped on load.
+    """
+
+    def __init__(self, path: str | Path, *, append: bool, sync_every: int = 10, sync_interval_s: float = 5.0) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = self.path.open("a" if append else "w", encoding="utf-8")
+        if append and self._f.tell() > 0 and not _ends_with_newline(self.path):
+            # Don't glue the next record onto a torn line.
+            self._f.write("\n")
+        self._sync_every = max(1, sync_every)
+        self._sync_interval_s = sync_interval_s
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, page: ScrapedPage, *, extracted_title: str, next_url: str | None) -> None:
+        record = {
+            "url": page.url,
+            "title": page.title,
+            "content_html": page.content_html,
+            "extracted_title": extracted_title,
+            "next_url": next_url,
+        }
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self._unsynced += 1
+        if self._unsynced >= self._sync_every or time.monotonic() - self._last_sync >= self._sync_interval_s:
+            self.sync()
+
+    def sync(self) -> None:
+        if self._f.closed or not self._unsynced:
+            return
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        self.sync()
+        self._f.close()
+
+
+def iter_journal(path: str | Path) -> Iterator[JournalEntry]:
+    """Yield the journal's entries one at a time, skipping torn lines."""
+
+    path = Path(path)
+    if not path.exists():
+        return
+
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                # Torn write from a crash; skip it and keep the rest.
+                continue
+            url = data.get("url") or ""
+            if not url:
+                continue
+            yield JournalEntry(
+                page=ScrapedPage(url=url, title=data.get("title", "") or url, content_html=data.get("content_html", "")),
+                extracted_title=data.get("extracted_title", ""),
+                next_url=data.get("next_url") or None,
+            )
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with path.open("rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
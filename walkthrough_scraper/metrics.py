@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+from typing import Any, Iterator
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is reported as null.
+    resource = None
+
+
+class Metrics:
+    """Stage timings, per-page records and counters for one run.
+
+    span() times a stage; spans that carry a url are also rolled up into that
+    page's record. Everything is kept in memory and written at the end as a
+    JSON report (write_json) and/or a Chrome trace-event file (write_trace)
+    that chrome://tracing or Perfetto can open. Safe to use from worker threads.
+    """
+
+    def __init__(self) -> None:
+        self._t0 = time.perf_counter()
+        self._started_at = time.time()
+        self._lock = threading.Lock()
+        self._spans: list[tuple[str, float, float, int, dict[str, Any]]] = []
+        self._pages: dict[str, dict[str, Any]] = {}
+        self._counters: Counter = Counter()
+        self._threads: dict[int, int] = {}
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[dict[str, Any]]:
+        """Time the enclosed block as stage `name`.
+
+        Yields args so the block can attach results (sizes, counts) to the span.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self._add_span(name, start, time.perf_counter() - start, args)
+
+    def span_since(self, name: str, start: float, **args: Any) -> None:
+        """Record stage `name` as running from `start` (a time.perf_counter() value) until now.
+
+        For stages that begin before the code that finishes them, such as a
+        navigation submitted to a TabPool and awaited later.
+        """
+
+        self._add_span(name, start, time.perf_counter() - start, args)
+
+    def count(self, name: str, n: int | float = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def page(self, url: str, **fields: Any) -> None:
+        """Merge fields into url's per-page record."""
+
+        with self._lock:
+            self._pages.setdefault(url, {"url": url, "timings": {}}).update(fields)
+
+    def page_count(self) -> int:
+        with self._lock:
+            return len(self._pages)
+
+    def report(self) -> dict[str, Any]:
+        with self._lock:
+            spans = list(self._spans)
+            pages = [dict(p, timings=dict(p["timings"])) for p in self._pages.values()]
+            counters = dict(self._counters)
+
+        stages: dict[str, dict[str, float]] = defaultdict(lambda: {"count": 0, "total_s": 0.0, "max_s": 0.0})
+        for name, _start, dur, _tid, _args in spans:
+            stage = stages[name]
+            stage["count"] += 1
+            stage["total_s"] += dur
+            stage["max_s"] = max(stage["max_s"], dur)
+        for stage in stages.values():
+            stage["mean_s"] = stage["total_s"] / stage["count"]
+
+        wall_s = time.perf_counter() - self._t0
+        return {
+            "started_at": self._started_at,
+            "wall_s": wall_s,
+            "pages_per_s": len(pages) / wall_s if wall_s > 0 else 0.0,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "peak_rss_children_bytes": peak_rss_bytes(children=True),
+            "counters": counters,
+            "stages": {name: _rounded(stage) for name, stage in sorted(stages.items())},
+            "pages": pages,
+        }
+
+    def write_json(self, path: str | Path) -> None:
+        _write(Path(path), self.report())
+
+    def write_trace(self, path: str | Path) -> None:
+        with self._lock:
+            spans = list(self._spans)
+            threads = dict(self._threads)
+        pid = os.getpid()
+        events: list[dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": "main" if tid == 0 else f"worker {tid}"}}
+            for tid in sorted(threads.values())
+        ]
+        for name, start, dur, tid, args in spans:
+            events.append(
+                {
+                    "name": name,
+                    "cat": "scraper",
+                    "ph": "X",
+                    "ts": round((start - self._t0) * 1e6),
+                    "dur": round(dur * 1e6),
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {k: v for k, v in args.items() if isinstance(v, (str, int, float, bool)) or v is None},
+                }
+            )
+        _write(Path(path), {"traceEvents": events, "displayTimeUnit": "ms"})
+
+    def _add_span(self, name: str, start: float, dur: float, args: dict[str, Any]) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            # Small, stable thread ids read better in a trace viewer; the main thread is 0.
+            tid = self._threads.setdefault(ident, 0 if threading.current_thread() is threading.main_thread() else len(self._threads) + 1)
+            self._spans.append((name, start, dur, tid, args))
+            url = args.get("url")
+            if url:
+                record = self._pages.setdefault(url, {"url": url, "timings": {}})
+                record["timings"][name] = round(record["timings"].get(name, 0.0) + dur, 6)
+
+
+def peak_rss_bytes(*, children: bool = False) -> int | None:
+    """Peak resident set size of this process (or of its finished children)."""
+
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is bytes on macOS, KiB elsewhere.
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def dir_stats(path: str | Path) -> tuple[int, int]:
+    """(file count, total bytes) under path."""
+
+    files = size = 0
+    for root, _dirs, names in os.walk(path):
+        for name in names:
+            try:
+                size += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+            files += 1
+    return files, size
+
+
+def _rounded(stage: dict[str, float]) -> dict[str, float]:
+    return {k: (round(v, 6) if isinstance(v, float) else v) for k, v in stage.items()}
+
+
+def _write(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2), encoding="utf-8")
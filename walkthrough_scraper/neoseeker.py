@@ -1,10 +1,13 @@
 from __future__ import annotations
 
-import re
+import copy
 from dataclasses import dataclass
-from typing import Iterable
-from urllib.parse import urlparse
+from html import escape
+import re
+from urllib.parse import urljoin, urlparse
 
+import lxml.html
+from playwright.sync_api import Error as PlaywrightError
 from playwright.sync_api import Page
 
 
@@ -19,55 +22,28 @@ class ExtractedContent:
     text_len: int
 
 
-def looks_like_bot_challenge(page: Page) -> bool:
-    try:
-        title = page.title()
-    except Exception:
-        title = ""
-    if _CLOUDFLARE_TITLE_RE.search(title or ""):
-        return True
-
-    body_text = ""
-    try:
-        body_text = page.inner_text("body")
-    except Exception:
-        return False
-
-    lowered = body_text.lower()
-    return (
-        "security verification" in lowered
-        or "verify you are not a bot" in lowered
-        or "checking your browser" in lowered
-    )
-
-
-def walkthrough_prefix(url: str) -> str:
-    parsed = urlparse(url)
-    parts = [p for p in parsed.path.split("/") if p]
-    # Neoseeker walkthrough pages use: /<game-slug>/<page>
-    slug = parts[0] if parts else ""
-    return f"{parsed.scheme}://{parsed.netloc}/{slug}/" if slug else f"{parsed.scheme}://{parsed.netloc}/"
-
-
-def extract_main_content(page: Page, *, selector: str | None = None) -> ExtractedContent:
-    selectors: Iterable[str] = (
-        [selector] if selector else []
-    ) + [
-        "main",
-        "article",
-        "[role=main]",
-        "#content",
-        ".content",
-        "#main",
-        ".main",
-        ".faqtext",
-        "#faqtext",
-        ".post_content",
-        ".entry-content",
-    ]
+@dataclass(frozen=True)
+class PageAnalysis:
+    challenge: bool
+    content: ExtractedContent
+    next_url: str | None
+    toc_urls: tuple[str, ...] = ()
+    html_len: int = 0
+    transfer_bytes: int = 0
+
+
+# In-page halves of the checks below. analyze_page runs all three in one evaluate.
+_CHALLENGE_JS = """
+() => {
+  if (/\\bjust a moment\\b/i.test(document.title || '')) return true;
+  const text = ((document.body && document.body.innerText) || '').toLowerCase();
+  return text.includes('security verification')
+    || text.includes('verify you are not a bot')
+    || text.includes('checking your browser');
+}
+"""
 
-    result = page.evaluate(
-        """
+_EXTRACT_JS = """
 (selectors) => {
   const cleanAndAbsolutize = (root) => {
     // Remove noisy bits inside the chosen container.
@@ -132,21 +108,9 @@ def extract_main_content(page: Page, *, selector: str | None = None) -> Extracte
     textLen: chosen.textLen,
   };
 }
-        """,
-        list(selectors),
-    )
-
-    return ExtractedContent(
-        title=result.get("title", ""),
-        content_html=result.get("html", ""),
-        content_selector=result.get("selector", ""),
-        text_len=int(result.get("textLen", 0) or 0),
-    )
-
+"""
 
-def find_next_url(page: Page, *, allowed_prefix: str) -> str | None:
-    next_url = page.evaluate(
-        """
+_NEXT_JS = """
 (allowedPrefix) => {
   const current = location.href;
 
@@ -202,10 +166,301 @@ def find_next_url(page: Page, *, allowed_prefix: str) -> str | None:
   if (best && bestScore > 10) return best.href;
   return null;
 }
-        """,
-        allowed_prefix,
+"""
+
+# The chapter list is the list/nav/sidebar container holding the most distinct
+# links under the walkthrough prefix, in document order.
+_TOC_CONTAINERS = (
+    "nav",
+    "ul",
+    "ol",
+    '[class*="toc" i]',
+    '[id*="toc" i]',
+    '[class*="sidebar" i]',
+    '[class*="chapter" i]',
+)
+_TOC_MIN_LINKS = 3
+
+_TOC_JS = """
+({ allowedPrefix, containers, minLinks }) => {
+  let best = [];
+  for (const el of document.querySelectorAll(containers.join(','))) {
+    const seen = new Set();
+    const urls = [];
+    for (const a of el.querySelectorAll('a[href]')) {
+      const href = (a.href || '').split('#')[0];
+      if (!href.startsWith(allowedPrefix) || seen.has(href)) continue;
+      seen.add(href);
+      urls.push(href);
+    }
+    if (urls.length > best.length) best = urls;
+  }
+  return best.length >= minLinks ? best : [];
+}
+"""
+
+_ANALYZE_JS = (
+    "({ selectors, allowedPrefix, findNext, findToc, tocContainers, tocMinLinks, measure }) => ({\n"
+    "  challenge: (" + _CHALLENGE_JS.strip() + ")(),\n"
+    "  content: (" + _EXTRACT_JS.strip() + ")(selectors),\n"
+    "  nextUrl: findNext ? (" + _NEXT_JS.strip() + ")(allowedPrefix) : null,\n"
+    "  tocUrls: findToc ? (" + _TOC_JS.strip() + ")"
+    "({ allowedPrefix, containers: tocContainers, minLinks: tocMinLinks }) : [],\n"
+    # Resource timing only counts what the buffer (250 entries by default) kept,
+    # and cross-origin responses without Timing-Allow-Origin report 0 bytes.
+    "  htmlLen: measure ? document.documentElement.outerHTML.length : 0,\n"
+    "  transferBytes: measure ? performance.getEntries().reduce((n, e) => n + (e.transferSize || 0), 0) : 0,\n"
+    "})"
+)
+
+
+# Playwright messages for an evaluate cut short by a navigation (not a closed or crashed page).
+_NAVIGATION_ERRORS = (
+    "Execution context was destroyed",
+    "Cannot find context with specified id",
+    "because of a navigation",
+)
+
+
+def looks_like_bot_challenge(page: Page) -> bool:
+    # One evaluate; the body text is searched in the page instead of being sent over.
+    # A closed or crashed page raises: it must not pass for a cleared challenge.
+    try:
+        return bool(page.evaluate(_CHALLENGE_JS))
+    except PlaywrightError as e:
+        if is_navigation_error(e):
+            return False
+        raise
+
+
+def is_navigation_error(e: Exception) -> bool:
+    """Whether a page call failed because the page navigated while it ran."""
+
+    message = str(e)
+    return isinstance(e, PlaywrightError) and any(m in message for m in _NAVIGATION_ERRORS)
+
+
+def wait_for_challenge_to_clear(page: Page, *, timeout_ms: int) -> bool:
+    """Block until the verification page is gone or timeout_ms passes.
+
+    Driven by DOM mutations inside the page rather than polling from Python;
+    when the challenge redirects, the destroyed execution context ends the wait
+    and the new document is checked once it has loaded. Returns True once the
+    page no longer looks like a challenge.
+    """
+
+    try:
+        cleared = page.evaluate(
+            """
+({ timeoutMs }) => new Promise((resolve) => {
+  const isChallenge = """ + _CHALLENGE_JS.strip() + """;
+  if (!isChallenge()) return resolve(true);
+
+  let pending = null;
+  const finish = (cleared) => {
+    observer.disconnect();
+    clearTimeout(deadline);
+    clearTimeout(pending);
+    resolve(cleared);
+  };
+  // innerText forces layout, so re-check at most every 250ms however busy the page is.
+  const observer = new MutationObserver(() => {
+    if (pending) return;
+    pending = setTimeout(() => {
+      pending = null;
+      if (!isChallenge()) finish(true);
+    }, 250);
+  });
+  observer.observe(document.documentElement, { childList: true, subtree: true, characterData: true });
+  const deadline = setTimeout(() => finish(false), timeoutMs);
+})
+            """,
+            {"timeoutMs": timeout_ms},
+        )
+        return bool(cleared)
+    except PlaywrightError as e:
+        if not is_navigation_error(e):
+            raise
+        # Navigated away (usually the challenge passing). Check the new document.
+        try:
+            page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+        except Exception:
+            pass
+        return not looks_like_bot_challenge(page)
+
+
+def walkthrough_prefix(url: str) -> str:
+    parsed = urlparse(url)
+    parts = [p for p in parsed.path.split("/") if p]
+    # Neoseeker walkthrough pages use: /<game-slug>/<page>
+    slug = parts[0] if parts else ""
+    return f"{parsed.scheme}://{parsed.netloc}/{slug}/" if slug else f"{parsed.scheme}://{parsed.netloc}/"
+
+
+# Candidate containers for the walkthrough body, tried in this order.
+CONTENT_SELECTORS = (
+    "main",
+    "article",
+    "[role=main]",
+    "#content",
+    ".content",
+    "#main",
+    ".main",
+    ".faqtext",
+    "#faqtext",
+    ".post_content",
+    ".entry-content",
+)
+
+
+def content_selectors(selector: str | None = None) -> list[str]:
+    return ([selector] if selector else []) + list(CONTENT_SELECTORS)
+
+
+def wait_for_content_ready(
+    page: Page,
+    *,
+    selector: str | None = None,
+    quiet_ms: int = 500,
+    timeout_ms: int = 20_000,
+) -> bool:
+    """Wait until the content container is present and the DOM has stopped changing.
+
+    Runs entirely inside the page with a MutationObserver, so it doesn't care
+    about ads or trackers that keep the network busy. A page counts as ready
+    once a content container has text, a Next link is present, and no mutation
+    happened for quiet_ms. A page without a Next link (the last chapter) needs
+    to stay quiet four times as long. Returns False on timeout or when the page
+    navigated away mid-wait (e.g. a verification redirect). A "Just a moment"
+    verification page counts as ready so the challenge check sees it at once.
+    """
+
+    try:
+        result = page.evaluate(
+            """
+({ selectors, quietMs, timeoutMs }) => new Promise((resolve) => {
+  const started = performance.now();
+  let lastMutation = started;
+
+  const hasContent = () => {
+    for (const sel of selectors) {
+      if (!sel) continue;
+      let el = null;
+      try { el = document.querySelector(sel); } catch (_) { continue; }
+      if (el && (el.textContent || '').trim().length > 0) return true;
+    }
+    return false;
+  };
+
+  const hasNext = () => {
+    if (document.querySelector('link[rel~="next"], a[rel~="next"]')) return true;
+    for (const a of document.querySelectorAll('a[href]')) {
+      const t = (a.textContent || '').trim().toLowerCase();
+      if (t === 'next' || t.startsWith('next ') || t.endsWith(' next') || t === '›' || t === '»') return true;
+    }
+    return false;
+  };
+
+  const observer = new MutationObserver(() => { lastMutation = performance.now(); });
+  observer.observe(document.documentElement, { childList: true, subtree: true, characterData: true });
+
+  let timer = null;
+  const finish = (ready) => {
+    observer.disconnect();
+    clearInterval(timer);
+    resolve(ready);
+  };
+
+  timer = setInterval(() => {
+    const now = performance.now();
+    if (now - started > timeoutMs) return finish(false);
+    // A verification page has no content to wait for; hand it to the challenge check right away.
+    if (/just a moment/i.test(document.title)) return finish(true);
+    if (document.readyState === 'loading' || !hasContent()) return;
+    const quietFor = now - lastMutation;
+    if (quietFor >= quietMs && hasNext()) return finish(true);
+    if (quietFor >= quietMs * 4) return finish(true);
+  }, 50);
+})
+            """,
+            {"selectors": content_selectors(selector), "quietMs": quiet_ms, "timeoutMs": timeout_ms},
+        )
+    except Exception:
+        return False
+    return bool(result)
+
+
+def extract_main_content(page: Page, *, selector: str | None = None) -> ExtractedContent:
+    return _extracted_from_js(page.evaluate(_EXTRACT_JS, content_selectors(selector)))
+
+
+def analyze_page(
+    page: Page,
+    *,
+    selector: str | None = None,
+    allowed_prefix: str,
+    find_next: bool = True,
+    find_toc: bool = False,
+    measure: bool = False,
+) -> PageAnalysis:
+    """Challenge check, content extraction and Next lookup in one evaluate.
+
+    Equivalent to calling looks_like_bot_challenge, extract_main_content and
+    find_next_url in turn, but costs a single round-trip to the browser, which
+    matters most over a remote CDP connection. With find_toc, the chapter list
+    (see find_toc_urls) comes back in the same call, and with measure, the
+    size of the whole document and the bytes the page transferred.
+    """
+
+    result = page.evaluate(
+        _ANALYZE_JS,
+        {
+            "selectors": content_selectors(selector),
+            "allowedPrefix": allowed_prefix,
+            "findNext": find_next,
+            "findToc": find_toc,
+            "tocContainers": list(_TOC_CONTAINERS),
+            "tocMinLinks": _TOC_MIN_LINKS,
+            "measure": measure,
+        },
+    )
+    return PageAnalysis(
+        challenge=bool(result.get("challenge")),
+        content=_extracted_from_js(result.get("content") or {}),
+        next_url=_checked_next_url(result.get("nextUrl"), allowed_prefix),
+        toc_urls=tuple(u for u in result.get("tocUrls") or () if isinstance(u, str)),
+        html_len=int(result.get("htmlLen") or 0),
+        transfer_bytes=int(result.get("transferBytes") or 0),
+    )
+
+
+def find_toc_urls(page: Page, *, allowed_prefix: str) -> list[str]:
+    """Ordered chapter URLs from the walkthrough's index/sidebar navigation.
+
+    Returns [] when no container lists at least three pages under allowed_prefix.
+    """
+
+    urls = page.evaluate(
+        _TOC_JS,
+        {"allowedPrefix": allowed_prefix, "containers": list(_TOC_CONTAINERS), "minLinks": _TOC_MIN_LINKS},
+    )
+    return [u for u in urls or () if isinstance(u, str)]
+
+
+def _extracted_from_js(result: dict) -> ExtractedContent:
+    return ExtractedContent(
+        title=result.get("title", ""),
+        content_html=result.get("html", ""),
+        content_selector=result.get("selector", ""),
+        text_len=int(result.get("textLen", 0) or 0),
     )
 
+
+def find_next_url(page: Page, *, allowed_prefix: str) -> str | None:
+    return _checked_next_url(page.evaluate(_NEXT_JS, allowed_prefix), allowed_prefix)
+
+
+def _checked_next_url(next_url, allowed_prefix: str) -> str | None:
     if not next_url or not isinstance(next_url, str):
         return None
 
@@ -213,3 +468,270 @@ def find_next_url(page: Page, *, allowed_prefix: str) -> str | None:
         return None
 
     return next_url
+
+
+# --- Browserless ports ---------------------------------------------------------
+# The functions below mirror looks_like_bot_challenge, extract_main_content and
+# find_next_url on raw server HTML (lxml), for the HTTP fast path. Keep the
+# selector list and the Next scoring in sync with the in-page JavaScript above.
+
+_CHALLENGE_PHRASES = ("security verification", "verify you are not a bot", "checking your browser")
+_NOISY_TAGS = ("script", "style", "noscript", "nav", "footer", "header", "aside", "form", "button")
+_WS_RE = re.compile(r"\s+")
+# _TOC_CONTAINERS as one XPath union (case-insensitive substring matches like [class*="toc" i]).
+_TOC_XPATH = " | ".join(
+    ["//nav", "//ul", "//ol"]
+    + [
+        f"//*[contains(translate(@{attr}, '{word.upper()}', '{word}'), '{word}')]"
+        for attr, word in (("class", "toc"), ("id", "toc"), ("class", "sidebar"), ("class", "chapter"))
+    ]
+)
+_SIMPLE_SELECTOR_RE = re.compile(
+    r"^(?P<tag>[a-zA-Z][\w-]*)?"
+    r"(?:#(?P<id>[\w-]+))?"
+    r"(?:\.(?P<cls>[\w-]+))?"
+    r"(?:\[(?P<attr>[\w-]+)=[\"']?(?P<val>[^\"'\]]+)[\"']?\])?$"
+)
+
+
+def parse_html(html: str, url: str) -> lxml.html.HtmlElement:
+    return lxml.html.document_fromstring(html, base_url=url)
+
+
+def parse_fragment(html: str) -> lxml.html.HtmlElement:
+    """Parse a content_html fragment under a wrapper <div> (see serialize_fragment)."""
+
+    return lxml.html.fragment_fromstring(html, create_parent="div")
+
+
+def serialize_fragment(root: lxml.html.HtmlElement) -> str:
+    """The inner HTML of an element, such as a parse_fragment() wrapper."""
+
+    parts = [escape(root.text, quote=False)] if root.text else []
+    parts.extend(lxml.html.tostring(child, encoding="unicode") for child in root)
+    return "".join(parts)
+
+
+def looks_like_bot_challenge_html(doc: lxml.html.HtmlElement) -> bool:
+    title = doc.findtext(".//title") or ""
+    if _CLOUDFLARE_TITLE_RE.search(title):
+        return True
+    body = doc.find(".//body")
+    lowered = _visible_text(body).lower() if body is not None else ""
+    return any(phrase in lowered for phrase in _CHALLENGE_PHRASES)
+
+
+def extract_main_content_from_html(
+    doc: lxml.html.HtmlElement,
+    url: str,
+    *,
+    selector: str | None = None,
+) -> ExtractedContent | None:
+    """Python port of extract_main_content.
+
+    Returns None when a selector can't be evaluated without a browser (a custom
+    --selector that is not a simple tag/#id/.class/[attr=value] form and
+    cssselect isn't installed), so the caller can fall back to the real tab.
+    Text length is approximated from text content (no layout, so hidden
+    elements count too).
+    """
+
+    candidates: list[tuple[int, str, lxml.html.HtmlElement]] = []
+    for sel in content_selectors(selector):
+        xpath = _selector_to_xpath(sel)
+        if xpath is None:
+            return None
+        found = doc.xpath(xpath)
+        if not found:
+            continue
+        el = found[0]
+        candidates.append((len(_collapse(_visible_text(el))), sel, el))
+
+    # Fallback: pick the biggest <div> if our selectors all missed.
+    if not candidates:
+        divs = [(len(_collapse(_visible_text(el))), "div", el) for el in doc.iter("div")]
+        if divs:
+            candidates.append(max(divs, key=lambda c: c[0]))
+
+    title = _html_title(doc, url)
+    if not candidates:
+        return ExtractedContent(title=title, content_html="", content_selector="", text_len=0)
+
+    # Stable sort like Array.prototype.sort: earlier selectors win ties.
+    candidates.sort(key=lambda c: -c[0])
+    text_len, sel, chosen = candidates[0]
+
+    clone = copy.deepcopy(chosen)
+    _clean_and_absolutize(clone, _document_base(doc, url))
+    return ExtractedContent(title=title, content_html=serialize_fragment(clone), content_selector=sel, text_len=text_len)
+
+
+def find_next_url_in_html(doc: lxml.html.HtmlElement, url: str, *, allowed_prefix: str) -> str | None:
+    """Python port of find_next_url's link[rel=next] check and anchor scoring."""
+
+    base = _document_base(doc, url)
+    current = url
+
+    for link in doc.iter("link"):
+        if (link.get("rel") or "") == "next" and link.get("href"):
+            href = urljoin(base, link.get("href"))
+            if href.startswith(allowed_prefix) and href != current:
+                return href
+            break
+
+    best: str | None = None
+    best_score = -1e9
+    for a in doc.iter("a"):
+        raw = a.get("href")
+        if raw is None:
+            continue
+        href = urljoin(base, raw)
+        score = _score_anchor(a, href, current, allowed_prefix)
+        if score > best_score:
+            best_score = score
+            best = href
+
+    if best and best_score > 10 and best.startswith(allowed_prefix):
+        return best
+    return None
+
+
+def find_toc_urls_in_html(doc: lxml.html.HtmlElement, url: str, *, allowed_prefix: str) -> list[str]:
+    """Python port of find_toc_urls."""
+
+    base = _document_base(doc, url)
+    best: list[str] = []
+    for el in doc.xpath(_TOC_XPATH):
+        seen: set[str] = set()
+        found: list[str] = []
+        for a in el.iter("a"):
+            if a.get("href") is None:
+                continue
+            href = urljoin(base, a.get("href")).split("#")[0]
+            if href.startswith(allowed_prefix) and href not in seen:
+                seen.add(href)
+                found.append(href)
+        if len(found) > len(best):
+            best = found
+    return best if len(best) >= _TOC_MIN_LINKS else []
+
+
+def _score_anchor(a: lxml.html.HtmlElement, href: str, current: str, allowed_prefix: str) -> float:
+    if not href or not href.startswith(allowed_prefix) or href == current:
+        return -1e9
+
+    text = (a.text_content() or "").strip().lower()
+    aria = (a.get("aria-label") or "").strip().lower()
+    rel = (a.get("rel") or "").lower()
+    cls = (a.get("class") or "").lower()
+    title = (a.get("title") or "").strip().lower()
+
+    s = 0
+    if "next" in rel:
+        s += 100
+    if aria == "next" or "next" in aria:
+        s += 80
+    if title == "next" or "next" in title:
+        s += 70
+    if text == "next":
+        s += 90
+    if "next" in text:
+        s += 60
+    if text in ("›", "»", ">", "next »", "› next"):
+        s += 50
+    if "next" in cls:
+        s += 40
+
+    # Boost if it's inside a likely pagination container.
+    p = a.getparent()
+    for _ in range(4):
+        if p is None:
+            break
+        pcls = (p.get("class") or "").lower()
+        pid = (p.get("id") or "").lower()
+        if "pagination" in pcls or "pager" in pcls or "nav" in pcls or "pagination" in pid or "pager" in pid:
+            s += 25
+            break
+        p = p.getparent()
+
+    return s
+
+
+def _selector_to_xpath(sel: str) -> str | None:
+    m = _SIMPLE_SELECTOR_RE.match(sel.strip())
+    if m and any(m.groupdict().values()):
+        conds = []
+        if m.group("id"):
+            conds.append(f"@id='{m.group('id')}'")
+        if m.group("cls"):
+            conds.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {m.group('cls')} ')")
+        if m.group("attr"):
+            conds.append(f"@{m.group('attr')}='{m.group('val')}'")
+        tag = m.group("tag") or "*"
+        return f"//{tag}" + "".join(f"[{c}]" for c in conds)
+
+    try:
+        from cssselect import GenericTranslator, SelectorError
+    except ImportError:
+        return None
+    try:
+        return GenericTranslator().css_to_xpath(sel)
+    except SelectorError:
+        return None
+
+
+def _visible_text(el: lxml.html.HtmlElement) -> str:
+    # Like innerText without layout: all text except script/style/noscript.
+    parts: list[str] = []
+    stack = [el]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            parts.append(node)
+            continue
+        if node.text:
+            parts.append(node.text)
+        for child in reversed(node):
+            if child.tail:
+                stack.append(child.tail)
+            if isinstance(child.tag, str) and child.tag not in ("script", "style", "noscript"):
+                stack.append(child)
+    return " ".join(parts)
+
+
+def _collapse(text: str) -> str:
+    return _WS_RE.sub(" ", text).strip()
+
+
+def _html_title(doc: lxml.html.HtmlElement, url: str) -> str:
+    # prefer in-page h1 when present
+    h1 = next(doc.iter("h1"), None)
+    t = _collapse(h1.text_content()) if h1 is not None else ""
+    return t or _collapse(doc.findtext(".//title") or "") or urlparse(url).path
+
+
+def _document_base(doc: lxml.html.HtmlElement, url: str) -> str:
+    base = doc.find(".//base[@href]")
+    return urljoin(url, base.get("href")) if base is not None else url
+
+
+def _clean_and_absolutize(root: lxml.html.HtmlElement, base: str) -> None:
+    # Remove noisy bits inside the chosen container (keeping the text that follows them).
+    for el in list(root.iter(*_NOISY_TAGS)):
+        if el is not root:
+            el.drop_tree()
+
+    for attr in ("href", "src"):
+        for el in root.iter():
+            if not isinstance(el.tag, str):
+                continue
+            val = el.get(attr)
+            if not val:
+                continue
+            # ignore anchors, mailto, javascript
+            if val.startswith("#") or val.startswith("mailto:") or val.startswith("javascript:"):
+                continue
+            try:
+                el.set(attr, urljoin(base, val))
+            except ValueError:
+                pass
@@ -1,39 +1,23 @@
 from __future__ import annotations
 
+import atexit
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import multiprocessing
 import os
 from pathlib import Path
+import tempfile
 import time
+from typing import Iterable, Iterator, Sequence
 
 from playwright.sync_api import BrowserContext
 
+from .fetch import browser_user_agent
 from .model import ScrapedPage
+from .pdfmerge import merge_pdfs
 
 
-def build_combined_html(
-    *,
-    doc_title: str,
-    pages: list[ScrapedPage],
-    start_url: str,
-    base_href: str | None = "https://www.neoseeker.com/",
-) -> str:
-    generated_at = datetime.now().strftime("%Y-%m-%d %H:%M")
-
-    sections = []
-    for i, p in enumerate(pages, start=1):
-        sections.append(
-            "\n".join(
-                [
-                    '<section class="page">',
-                    f"<h1>{_escape(p.title)}</h1>",
-                    f"<div class=\"meta\">{i}/{len(pages)} • <a href=\"{_escape_attr(p.url)}\">{_escape(p.url)}</a></div>",
-                    f"<div class=\"content\">{p.content_html}</div>",
-                    "</section>",
-                ]
-            )
-        )
-
-    css = """
+_CSS = """
 :root { --text: #111; --muted: #555; --link: #1a56db; }
 @page { margin: 18mm 14mm; }
 * { box-sizing: border-box; }
@@ -44,6 +28,7 @@ a:hover { text-decoration: underline; }
 .cover h1 { font-size: 26px; margin: 0 0 6px 0; }
 .cover .meta { color: var(--muted); font-size: 12px; }
 .page { page-break-before: always; }
+body > .page:first-child { page-break-before: auto; }
 .page h1 { font-size: 22px; margin: 0 0 6px 0; }
 .meta { color: var(--muted); font-size: 11px; margin-bottom: 10px; }
 .content img { max-width: 100%; height: auto; }
@@ -53,6 +38,114 @@ a:hover { text-decoration: underline; }
 .content th, .content td { border: 1px solid #ddd; padding: 6px; vertical-align: top; }
 """
 
+_PDF_MARGIN = {"top": "18mm", "bottom": "18mm", "left": "14mm", "right": "14mm"}
+
+
+def build_combined_html(
+    *,
+    doc_title: str,
+    pages: Sequence[ScrapedPage],
+    start_url: str,
+    base_href: str | None = "https://www.neoseeker.com/",
+) -> str:
+    generated_at = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+    sections = [_section_html(p, i, len(pages)) for i, p in enumerate(pages, start=1)]
+
+    return _document_html(
+        doc_title=doc_title,
+        base_href=base_href,
+        body=[_cover_html(doc_title=doc_title, start_url=start_url, generated_at=generated_at), *sections],
+    )
+
+
+def iter_chunk_documents(
+    *,
+    doc_title: str,
+    pages: Sequence[ScrapedPage],
+    start_url: str,
+    chunk_size: int,
+    base_href: str | None = "https://www.neoseeker.com/",
+) -> Iterator[str]:
+    """Yield standalone HTML documents of at most chunk_size sections each.
+
+    The first document also carries the cover. Section numbering ("i/N") is
+    global, so the merged PDF reads the same as a single-pass render.
+    """
+
+    generated_at = datetime.now().strftime("%Y-%m-%d %H:%M")
+    chunk_size = max(1, chunk_size)
+    total = len(pages)
+
+    for start in range(0, total, chunk_size):
+        body = [_section_html(p, i, total) for i, p in enumerate(pages[start : start + chunk_size], start=start + 1)]
+        if start == 0:
+            body.insert(0, _cover_html(doc_title=doc_title, start_url=start_url, generated_at=generated_at))
+        yield _document_html(doc_title=doc_title, base_href=base_href, body=body)
+
+
+def write_combined_html(
+    path: str | Path,
+    *,
+    doc_title: str,
+    pages: Sequence[ScrapedPage],
+    start_url: str,
+    base_href: str | None = "https://www.neoseeker.com/",
+) -> int:
+    """Write the same document as build_combined_html to path, one section at a time.
+
+    Only one page's HTML is held at once, so this pairs with a PageStore to
+    keep memory flat for long walkthroughs. Returns the bytes written.
+    """
+
+    generated_at = datetime.now().strftime("%Y-%m-%d %H:%M")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    total = len(pages)
+
+    with path.open("w", encoding="utf-8", newline="") as f:
+        f.write(_document_head(doc_title=doc_title, base_href=base_href))
+        f.write("\n")
+        f.write(_cover_html(doc_title=doc_title, start_url=start_url, generated_at=generated_at))
+        for i, p in enumerate(pages, start=1):
+            f.write("\n")
+            f.write(_section_html(p, i, total))
+        f.write("\n")
+        f.write(_DOCUMENT_TAIL)
+    return path.stat().st_size
+
+
+def _section_html(p: ScrapedPage, i: int, total: int) -> str:
+    return "\n".join(
+        [
+            f'<section class="page" id="page-{i}">',
+            f"<h1>{_escape(p.title)}</h1>",
+            f"<div class=\"meta\">{i}/{total} • <a href=\"{_escape_attr(p.url)}\">{_escape(p.url)}</a></div>",
+            f"<div class=\"content\">{p.content_html}</div>",
+            "</section>",
+        ]
+    )
+
+
+def _cover_html(*, doc_title: str, start_url: str, generated_at: str) -> str:
+    return "\n".join(
+        [
+            "<section class=\"cover\">",
+            f"<h1>{_escape(doc_title)}</h1>",
+            f"<div class=\"meta\">Generated {generated_at} • Start: <a href=\"{_escape_attr(start_url)}\">{_escape(start_url)}</a></div>",
+            "</section>",
+        ]
+    )
+
+
+_DOCUMENT_TAIL = "</body>\n</html>"
+
+
+def _document_html(*, doc_title: str, base_href: str | None, body: list[str]) -> str:
+    return "\n".join([_document_head(doc_title=doc_title, base_href=base_href), *body, _DOCUMENT_TAIL])
+
+
+def _document_head(*, doc_title: str, base_href: str | None) -> str:
     # A <base> tag helps relative URLs inside captured HTML resolve.
     # For offline asset rewriting, pass base_href=None to avoid breaking local paths.
     base_tag = f"<base href=\"{_escape_attr(base_href)}\">" if base_href else ""
@@ -65,16 +158,9 @@ a:hover { text-decoration: underline; }
             "<meta charset=\"utf-8\">",
             base_tag,
             f"<title>{_escape(doc_title)}</title>",
-            f"<style>{css}</style>",
+            f"<style>{_CSS}</style>",
             "</head>",
             "<body>",
-            "<section class=\"cover\">",
-            f"<h1>{_escape(doc_title)}</h1>",
-            f"<div class=\"meta\">Generated {generated_at} • Start: <a href=\"{_escape_attr(start_url)}\">{_escape(start_url)}</a></div>",
-            "</section>",
-            *sections,
-            "</body>",
-            "</html>",
         ]
     )
 
@@ -91,26 +177,166 @@ def render_pdf(
 
     tmp_path = out_path.with_suffix(out_path.suffix + ".tmp")
 
+    _print_document(
+        context=context,
+        html=html,
+        pdf_path=tmp_path,
+        html_file=Path(content_base_dir).resolve() / "combined.html" if content_base_dir else None,
+    )
+    _replace_with_retry(tmp_path, out_path)
+
+
+def render_pdf_file(*, context: BrowserContext, html_file: str | Path, output_pdf: str) -> None:
+    """Render an HTML file already on disk (see write_combined_html) via file://.
+
+    Relative asset paths resolve against the file's directory.
+    """
+
+    out_path = Path(output_pdf)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix(out_path.suffix + ".tmp")
+
+    page = context.new_page()
+    try:
+        page.goto(Path(html_file).resolve().as_uri(), wait_until="networkidle")
+        _print_loaded_page(page, tmp_path)
+    finally:
+        page.close()
+    _replace_with_retry(tmp_path, out_path)
+
+
+def render_pdf_chunked(
+    *,
+    context: BrowserContext,
+    documents: Iterable[str],
+    output_pdf: str,
+    content_base_dir: str | None = None,
+    workers: int = 1,
+    channel: str | None = None,
+) -> int:
+    """Render each document separately and stitch the PDFs together with pypdf.
+
+    Only one chunk is loaded per renderer at a time, so renderer memory is bounded
+    by the chunk size instead of the whole walkthrough, and the parts are merged
+    one at a time with identical streams stored once. With workers > 1 the chunks
+    are printed concurrently by headless browsers in worker processes (Chromium,
+    or the given Playwright channel such as "chrome"), each given a copy of the
+    context's cookies, storage and user agent so remote assets load as they
+    would in the scraping browser. Returns the chunk count.
+    """
+
+    out_path = Path(output_pdf)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix(out_path.suffix + ".tmp")
+
+    with tempfile.TemporaryDirectory(prefix=f"{out_path.stem}-parts-", dir=out_path.parent) as parts_dir:
+        html_dir = Path(content_base_dir).resolve() if content_base_dir else Path(parts_dir)
+        part_paths: list[Path] = []
+        html_files: list[Path] = []
+
+        if workers > 1:
+            # spawn: forking a process that holds a Playwright connection is unsafe.
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_render_worker,
+                initargs=(context.storage_state(), browser_user_agent(context), channel),
+            ) as pool:
+                futures = []
+                for n, html in enumerate(documents, start=1):
+                    part_path = Path(parts_dir) / f"part-{n:04d}.pdf"
+                    html_file = html_dir / f"combined-part-{n:04d}.html"
+                    html_dir.mkdir(parents=True, exist_ok=True)
+                    html_file.write_text(html, encoding="utf-8")
+                    futures.append(pool.submit(_render_file_in_worker, str(html_file), str(part_path)))
+                    part_paths.append(part_path)
+                    html_files.append(html_file)
+                for future in futures:
+                    future.result()
+        else:
+            for n, html in enumerate(documents, start=1):
+                part_path = Path(parts_dir) / f"part-{n:04d}.pdf"
+                html_file = html_dir / f"combined-part-{n:04d}.html" if content_base_dir else None
+                _print_document(context=context, html=html, pdf_path=part_path, html_file=html_file)
+                if html_file is not None:
+                    html_files.append(html_file)
+                part_paths.append(part_path)
+
+        for html_file in html_files:
+            html_file.unlink(missing_ok=True)
+
+        # Parts repeat the same fonts and images; the streaming merge stores them once.
+        merge_pdfs(part_paths, tmp_path)
+
+    _replace_with_retry(tmp_path, out_path)
+    return len(part_paths)
+
+
+def _print_document(*, context: BrowserContext, html: str, pdf_path: Path, html_file: Path | None) -> None:
     page = context.new_page()
 
-    if content_base_dir:
-        base_dir = Path(content_base_dir).resolve()
-        base_dir.mkdir(parents=True, exist_ok=True)
-        html_file = base_dir / "combined.html"
+    if html_file is not None:
+        html_file.parent.mkdir(parents=True, exist_ok=True)
         html_file.write_text(html, encoding="utf-8")
         page.goto(html_file.as_uri(), wait_until="networkidle")
     else:
         page.set_content(html, wait_until="networkidle")
 
+    _print_loaded_page(page, pdf_path)
+    page.close()
+
+
+def _print_loaded_page(page, pdf_path: Path) -> None:
     page.emulate_media(media="print")
     page.pdf(
-        path=str(tmp_path),
+        path=str(pdf_path),
         format="Letter",
         print_background=True,
-        margin={"top": "18mm", "bottom": "18mm", "left": "14mm", "right": "14mm"},
+        margin=_PDF_MARGIN,
     )
-    page.close()
 
+
+# Per-process state for --render-workers; each worker keeps one headless browser warm.
+_worker_playwright = None
+_worker_browser = None
+_worker_context = None
+
+
+def _init_render_worker(storage_state: dict, user_agent: str | None, channel: str | None) -> None:
+    global _worker_playwright, _worker_browser, _worker_context
+    from playwright.sync_api import sync_playwright
+
+    _worker_playwright = sync_playwright().start()
+    _worker_browser = _worker_playwright.chromium.launch(headless=True, channel=channel)
+    _worker_context = _worker_browser.new_context(storage_state=storage_state, user_agent=user_agent)
+    atexit.register(_close_render_worker)
+
+
+def _close_render_worker() -> None:
+    global _worker_playwright, _worker_browser, _worker_context
+    try:
+        if _worker_browser is not None:
+            _worker_browser.close()
+        if _worker_playwright is not None:
+            _worker_playwright.stop()
+    except Exception:
+        pass
+    _worker_context = None
+    _worker_browser = None
+    _worker_playwright = None
+
+
+def _render_file_in_worker(html_file: str, pdf_path: str) -> str:
+    page = _worker_context.new_page()
+    try:
+        page.goto(Path(html_file).as_uri(), wait_until="networkidle")
+        _print_loaded_page(page, Path(pdf_path))
+    finally:
+        page.close()
+    return pdf_path
+
+
+def _replace_with_retry(tmp_path: Path, out_path: Path) -> None:
     # Atomically replace the final PDF. On Windows, the destination may be locked
     # (e.g., open in a PDF viewer). Retry briefly, then keep the tmp file.
     for attempt in range(1, 6):
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import gc
+import hashlib
+import io
+import os
+from pathlib import Path
+import time
+from typing import BinaryIO, Iterable, Sequence
+
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    PdfObject,
+    StreamObject,
+    TextStringObject,
+)
+
+
+# Page keys that point back into the input's own page tree or article threads.
+_SKIPPED_PAGE_KEYS = ("/Parent", "/B")
+
+
+@dataclass
+class MergeStats:
+    inputs: int = 0
+    pages: int = 0
+    objects: int = 0
+    streams_deduped: int = 0
+    bytes_deduped: int = 0
+    input_bytes: int = 0
+    output_bytes: int = 0
+    elapsed_s: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.pages} pages from {self.inputs} PDFs in {self.elapsed_s:.1f}s: "
+            f"{self.input_bytes / 1e6:.1f} MB -> {self.output_bytes / 1e6:.1f} MB, "
+            f"{self.streams_deduped} duplicate streams ({self.bytes_deduped / 1e6:.1f} MB) stored once"
+        )
+
+
+def merge_pdfs(
+    inputs: Sequence[str | Path],
+    output: str | Path,
+    *,
+    bookmarks: Sequence[str] | None = None,
+    dedupe: bool = True,
+) -> MergeStats:
+    """Concatenate PDFs into output, writing each object as soon as it is copied.
+
+    Unlike PdfWriter, which holds every input's objects until write(), only
+    one input is open at a time and each of its objects goes straight to the
+    output file, so memory stays bounded by the largest input plus the xref
+    table. With dedupe, stream objects (fonts, images, content) that are
+    byte-identical after renumbering are stored once across all inputs.
+    bookmarks gives one outline title per input, pointing at its first page.
+    Named destinations are carried over; the first input to define a name wins.
+    """
+
+    started = time.perf_counter()
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output.with_suffix(output.suffix + ".tmp")
+    stats = MergeStats(inputs=len(inputs))
+    seen: dict[bytes, int] | None = {} if dedupe else None
+
+    with tmp_path.open("wb") as f:
+        out = _ObjectWriter(f)
+        catalog = out.reserve()
+        pages_root = out.reserve()
+        page_nums: list[int] = []
+        first_pages: list[tuple[str, int]] = []
+        dests: dict[str, PdfObject] = {}
+        named: dict[str, PdfObject] = {}
+
+        for n, path in enumerate(inputs):
+            stats.input_bytes += Path(path).stat().st_size
+            reader = PdfReader(str(path))
+            if reader.is_encrypted:
+                reader.decrypt("")
+            copier = _InputCopier(out, seen, stats)
+            pages = copier.copy_pages(reader, pages_root)
+            if pages and bookmarks is not None:
+                first_pages.append((bookmarks[n], pages[0]))
+            page_nums.extend(pages)
+            copier.copy_destinations(reader, dests, named)
+            stats.pages += len(pages)
+            # A reader and its objects reference each other; free them before the next input.
+            del reader, copier
+            gc.collect()
+
+        out.write(
+            pages_root,
+            DictionaryObject(
+                {
+                    NameObject("/Type"): NameObject("/Pages"),
+                    NameObject("/Kids"): ArrayObject(_ref(n) for n in page_nums),
+                    NameObject("/Count"): NumberObject(len(page_nums)),
+                }
+            ),
+        )
+        root = DictionaryObject({NameObject("/Type"): NameObject("/Catalog"), NameObject("/Pages"): _ref(pages_root)})
+        if first_pages:
+            root[NameObject("/Outlines")] = _ref(_write_outline(out, first_pages))
+            root[NameObject("/PageMode")] = NameObject("/UseOutlines")
+        if dests:
+            root[NameObject("/Dests")] = DictionaryObject({NameObject(k): v for k, v in dests.items()})
+        if named:
+            # A single leaf node; name trees must be sorted by key.
+            leaf = ArrayObject()
+            for key in sorted(named):
+                leaf.extend([TextStringObject(key), named[key]])
+            root[NameObject("/Names")] = DictionaryObject(
+                {NameObject("/Dests"): DictionaryObject({NameObject("/Names"): leaf})}
+            )
+        out.write(catalog, root)
+        out.finish(catalog)
+        stats.objects = out.count
+
+    os.replace(tmp_path, output)
+    stats.output_bytes = output.stat().st_size
+    stats.elapsed_s = time.perf_counter() - started
+    return stats
+
+
+class _ObjectWriter:
+    """Writes numbered objects to a file as they come and the xref table at the end."""
+
+    def __init__(self, f: BinaryIO) -> None:
+        self._f = f
+        self._offsets: list[int] = [0]  # by object number; 0 is the free-list head
+        f.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    @property
+    def count(self) -> int:
+        return len(self._offsets) - 1
+
+    def reserve(self) -> int:
+        self._offsets.append(0)
+        return len(self._offsets) - 1
+
+    def write(self, num: int, obj: PdfObject | bytes) -> None:
+        self._offsets[num] = self._f.tell()
+        self._f.write(b"%d 0 obj\n" % num)
+        self._f.write(obj if isinstance(obj, bytes) else _serialize(obj))
+        self._f.write(b"\nendobj\n")
+
+    def finish(self, root: int) -> None:
+        xref_at = self._f.tell()
+        self._f.write(b"xref\n0 %d\n" % len(self._offsets))
+        self._f.write(b"0000000000 65535 f \n")
+        for offset in self._offsets[1:]:
+            # Reserved but never written (can't happen today) stays a free entry.
+            self._f.write(b"%010d 00000 n \n" % offset if offset else b"0000000000 00001 f \n")
+        trailer = DictionaryObject({NameObject("/Size"): NumberObject(len(self._offsets)), NameObject("/Root"): _ref(root)})
+        self._f.write(b"trailer\n" + _serialize(trailer) + b"\nstartxref\n%d\n%%%%EOF\n" % xref_at)
+
+
+class _InputCopier:
+    """Copies one input's pages and everything they reference, renumbered."""
+
+    def __init__(self, out: _ObjectWriter, seen: dict[bytes, int] | None, stats: MergeStats) -> None:
+        self._out = out
+        self._seen = seen
+        self._stats = stats
+        self._copied: dict[tuple[int, int], int] = {}
+        # Objects being copied; a reference back to one (a cycle) gets its number early.
+        self._open: dict[tuple[int, int], int] = {}
+
+    def copy_pages(self, reader: PdfReader, pages_root: int) -> list[int]:
+        pages = list(reader.pages)
+        # Number every page first so links and destinations between pages resolve
+        # to the copies instead of pulling in the input's page tree.
+        nums = []
+        for page in pages:
+            ref = page.indirect_reference
+            nums.append(self._out.reserve())
+            self._copied[(ref.idnum, ref.generation)] = nums[-1]
+        for page, num in zip(pages, nums):
+            # reader.pages has inherited attributes (Resources, MediaBox, ...) filled in.
+            copy = DictionaryObject(
+                {NameObject(k): self._convert(v) for k, v in page.items() if k not in _SKIPPED_PAGE_KEYS}
+            )
+            copy[NameObject("/Parent")] = _ref(pages_root)
+            self._out.write(num, copy)
+        return nums
+
+    def copy_destinations(self, reader: PdfReader, dests: dict[str, PdfObject], named: dict[str, PdfObject]) -> None:
+        catalog = reader.trailer["/Root"]
+        old_style = _resolve(catalog.get("/Dests"))
+        if isinstance(old_style, DictionaryObject):
+            for key, value in old_style.items():
+                if key not in dests:
+                    dests[key] = self._convert(value)
+        names = _resolve(catalog.get("/Names"))
+        tree = _resolve(names.get("/Dests")) if isinstance(names, DictionaryObject) else None
+        if isinstance(tree, DictionaryObject):
+            for key, value in _name_tree_items(tree):
+                if key not in named:
+                    named[key] = self._convert(value)
+
+    def _convert(self, obj: PdfObject) -> PdfObject:
+        if isinstance(obj, IndirectObject):
+            return _ref(self._copy(obj))
+        if isinstance(obj, DictionaryObject):
+            return DictionaryObject({NameObject(k): self._convert(v) for k, v in obj.items()})
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._convert(v) for v in obj)
+        return obj
+
+    def _copy(self, ref: IndirectObject) -> int:
+        key = (ref.idnum, ref.generation)
+        num = self._copied.get(key)
+        if num is not None:
+            return num
+        if key in self._open:
+            if not self._open[key]:
+                self._open[key] = self._out.reserve()
+            return self._open[key]
+
+        self._open[key] = 0
+        obj = ref.get_object()
+        if obj is None:
+            obj = NullObject()
+        if isinstance(obj, StreamObject):
+            header = DictionaryObject({NameObject(k): self._convert(v) for k, v in obj.items() if k != "/Length"})
+            # _data is the stream as stored (still encoded), so it's copied without re-encoding.
+            data = obj._data
+            header[NameObject("/Length")] = NumberObject(len(data))
+            body = _serialize(header) + b"\nstream\n" + data + b"\nendstream"
+        else:
+            body = _serialize(self._convert(obj))
+        num = self._open.pop(key)
+
+        digest = None
+        if not num and self._seen is not None and isinstance(obj, StreamObject):
+            digest = hashlib.sha256(body).digest()
+            num = self._seen.get(digest)
+            if num is not None:
+                self._stats.streams_deduped += 1
+                self._stats.bytes_deduped += len(body)
+                self._copied[key] = num
+                return num
+        if not num:
+            num = self._out.reserve()
+        self._out.write(num, body)
+        if digest is not None:
+            self._seen[digest] = num
+        self._copied[key] = num
+        return num
+
+
+def _name_tree_items(node: DictionaryObject, depth: int = 0) -> Iterable[tuple[str, PdfObject]]:
+    names = _resolve(node.get("/Names"))
+    if isinstance(names, ArrayObject):
+        for i in range(0, len(names) - 1, 2):
+            key = names[i].get_object()
+            yield (key.decode("latin-1") if isinstance(key, bytes) else str(key)), names[i + 1]
+    kids = _resolve(node.get("/Kids"))
+    if isinstance(kids, ArrayObject) and depth < 32:
+        for kid in kids:
+            child = kid.get_object()
+            if isinstance(child, DictionaryObject):
+                yield from _name_tree_items(child, depth + 1)
+
+
+def _resolve(obj: PdfObject | None) -> PdfObject | None:
+    # dict.get on a pypdf dictionary returns references unresolved.
+    return obj.get_object() if obj is not None else None
+
+
+def _write_outline(out: _ObjectWriter, entries: list[tuple[str, int]]) -> int:
+    root = out.reserve()
+    items = [out.reserve() for _ in entries]
+    for i, ((title, page), num) in enumerate(zip(entries, items)):
+        item = DictionaryObject(
+            {
+                NameObject("/Title"): TextStringObject(title),
+                NameObject("/Parent"): _ref(root),
+                NameObject("/Dest"): ArrayObject([_ref(page), NameObject("/Fit")]),
+            }
+        )
+        if i > 0:
+            item[NameObject("/Prev")] = _ref(items[i - 1])
+        if i + 1 < len(items):
+            item[NameObject("/Next")] = _ref(items[i + 1])
+        out.write(num, item)
+    out.write(
+        root,
+        DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Outlines"),
+                NameObject("/First"): _ref(items[0]),
+                NameObject("/Last"): _ref(items[-1]),
+                NameObject("/Count"): NumberObject(len(items)),
+            }
+        ),
+    )
+    return root
+
+
+def _ref(num: int) -> IndirectObject:
+    return IndirectObject(num, 0, None)
+
+
+def _serialize(obj: PdfObject) -> bytes:
+    buf = io.BytesIO()
+    obj.write_to_stream(buf)
+    return buf.getvalue()
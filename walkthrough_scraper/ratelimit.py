@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+import threading
+import time
+from typing import Callable
+from urllib.parse import urlparse
+
+
+# After a throttling signal, a host that had no limit starts from this spacing.
+_BACKOFF_FLOOR_S = 0.5
+
+
+@dataclass
+class _HostState:
+    interval_s: float
+    min_interval_s: float
+    next_at: float = 0.0
+    hold_until: float = 0.0
+    backoffs: int = 0
+
+
+class HostRateLimiter:
+    """Per-host request pacing with AIMD adjustment, shared by every fetch path.
+
+    Each host is a token bucket holding `burst` tokens that refills one token per
+    interval (implemented as a virtual schedule, so waits are computed without a
+    timer). Healthy responses add `increase_per_s` to the host's request rate
+    until min_interval_s is reached; 429/503, a verification page or a
+    Retry-After header multiply the interval by `backoff`, and Retry-After
+    also holds the host until it has passed.
+
+    Hosts that were never configure()d start unthrottled and only slow down
+    once they push back. Safe to use from several threads.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_interval_s: float = 60.0,
+        increase_per_s: float = 0.1,
+        backoff: float = 2.0,
+        burst: int = 1,
+        on_backoff: Callable[[str, str, float], None] | None = None,
+    ) -> None:
+        self.max_interval_s = max(0.0, max_interval_s)
+        self.increase_per_s = max(0.0, increase_per_s)
+        self.backoff = max(1.0, backoff)
+        self.burst = max(1, burst)
+        self.on_backoff = on_backoff
+        self._lock = threading.Lock()
+        self._hosts: dict[str, _HostState] = {}
+        self._configured: set[str] = set()
+
+    def configure(self, url: str, *, interval_s: float, min_interval_s: float = 0.0) -> None:
+        """Set the starting interval and the fastest allowed interval for url's host."""
+
+        min_interval_s = max(0.0, min_interval_s)
+        with self._lock:
+            state = self._state(_host(url))
+            state.interval_s = max(min_interval_s, interval_s)
+            state.min_interval_s = min_interval_s
+            self._configured.add(_host(url))
+
+    def configured(self, url: str) -> bool:
+        """Whether configure() was called for url's host."""
+
+        with self._lock:
+            return _host(url) in self._configured
+
+    def acquire(self, url: str) -> float:
+        """Block until a request to url's host may start; return the seconds waited."""
+
+        with self._lock:
+            state = self._state(_host(url))
+            now = time.monotonic()
+            start = max(now - (self.burst - 1) * state.interval_s, state.next_at, state.hold_until)
+            state.next_at = start + state.interval_s
+        wait_s = start - now
+        if wait_s > 0:
+            time.sleep(wait_s)
+        return max(0.0, wait_s)
+
+    def record(
+        self,
+        url: str,
+        *,
+        status: int | None = None,
+        retry_after: str | None = None,
+        challenge: bool = False,
+    ) -> bool:
+        """Feed a response back into url's host rate. Returns True if it backed off."""
+
+        host = _host(url)
+        delay_s = parse_retry_after(retry_after)
+        reason = ""
+        if challenge:
+            reason = "verification page"
+        elif status in (429, 503):
+            reason = f"HTTP {status}"
+        elif delay_s is not None:
+            reason = "Retry-After"
+
+        with self._lock:
+            state = self._state(host)
+            if not reason:
+                if status is not None and 200 <= status < 400 and state.interval_s > state.min_interval_s:
+                    rate = 1.0 / state.interval_s + self.increase_per_s
+                    state.interval_s = max(state.min_interval_s, 1.0 / rate)
+                return False
+
+            state.backoffs += 1
+            state.interval_s = max(state.min_interval_s, min(self.max_interval_s, max(state.interval_s * self.backoff, _BACKOFF_FLOOR_S)))
+            if delay_s is not None:
+                state.hold_until = max(state.hold_until, time.monotonic() + delay_s)
+            interval_s = state.interval_s
+
+        if self.on_backoff is not None:
+            self.on_backoff(host, reason, interval_s)
+        return True
+
+    def interval(self, url: str) -> float:
+        with self._lock:
+            return self._state(_host(url)).interval_s
+
+    def backoffs(self) -> dict[str, int]:
+        with self._lock:
+            return {host: s.backoffs for host, s in self._hosts.items() if s.backoffs}
+
+    def _state(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(interval_s=0.0, min_interval_s=0.0)
+        return state
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _host(url: str) -> str:
+    return (urlparse(url).netloc or url).lower()
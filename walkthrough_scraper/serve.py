@@ -0,0 +1,393 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+from pathlib import Path
+import queue
+import shutil
+import sys
+import threading
+import time
+import traceback
+from typing import Any
+from urllib.parse import urlparse
+import uuid
+
+from playwright.sync_api import BrowserContext, sync_playwright
+from playwright.sync_api import Error as PlaywrightError
+
+from .batch import JobStatus, SharedBrowser, ThreadOutput, normalize_options, parse_job
+from .cli import build_parser as build_job_parser
+from .cli import connect_context, run_job
+from .ebook import OUTPUT_FORMATS
+from .metrics import Metrics
+from .ratelimit import HostRateLimiter
+
+
+# Options that name files on the server; it chooses these itself, inside the job's directory
+# (save_html is never written, assets_dir defaults next to the output).
+_PATH_OPTIONS = ("output", "urls_file", "save_html", "journal", "assets_dir", "metrics_json", "trace", "cache_dir")
+
+_MAX_BODY_BYTES = 1024 * 1024
+
+_MEDIA_TYPES = {".pdf": "application/pdf", ".epub": "application/epub+zip", ".html": "text/html; charset=utf-8"}
+
+
+@dataclass
+class ServerJob:
+    id: str
+    args: argparse.Namespace
+    status: JobStatus
+    submitted_at: float
+    metrics: Metrics = field(default_factory=Metrics)
+
+    def to_json(self) -> dict[str, Any]:
+        data = {"id": self.id, "submitted_at": self.submitted_at, **asdict(self.status)}
+        if self.status.state == "running":
+            data["pages"] = self.metrics.page_count()
+        data["log"] = f"/jobs/{self.id}/log"
+        data["download"] = f"/jobs/{self.id}/download" if self.status.state == "ok" else None
+        # Kept for clients written before --format; same file as download.
+        data["pdf"] = data["download"] if self.args.format == "pdf" else None
+        return data
+
+
+class JobServer:
+    """A bounded queue of scrape jobs and the worker threads that run them.
+
+    Workers attach to a SharedBrowser over CDP once and then take jobs as they
+    arrive, so a submitted job starts as soon as a worker is free. Each job
+    gets its own directory under jobs_dir for its output, log and metrics.
+    """
+
+    def __init__(
+        self,
+        *,
+        endpoint: str,
+        workers: int,
+        queue_size: int,
+        jobs_dir: str | Path,
+        cache_dir: str | Path,
+        limiter: HostRateLimiter,
+        outputs: tuple[ThreadOutput, ThreadOutput],
+    ) -> None:
+        self.endpoint = endpoint
+        self.workers = max(1, workers)
+        self.jobs_dir = Path(jobs_dir).resolve()
+        self.cache_dir = Path(cache_dir).resolve()
+        self.limiter = limiter
+        self._outputs = outputs
+        self._queue: queue.Queue[ServerJob] = queue.Queue(maxsize=max(1, queue_size))
+        self._jobs: dict[str, ServerJob] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        for n in range(1, self.workers + 1):
+            t = threading.Thread(target=self._work, args=(n,), name=f"serve-worker-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, *, timeout_s: float = 5.0) -> None:
+        """Stop taking jobs; running ones are abandoned after timeout_s."""
+
+        self._stopping.set()
+        deadline = time.monotonic() + timeout_s
+        for t in self._threads:
+            t.join(timeout=max(0.0, deadline - time.monotonic()))
+
+    def submit(self, options: dict[str, Any]) -> ServerJob:
+        """Validate and queue a job. ValueError if it's invalid, queue.Full if the queue is."""
+
+        options = normalize_options(options)
+        given = [k for k in _PATH_OPTIONS if k in options]
+        if given:
+            raise ValueError(f"{', '.join(given)} can't be set through the API; the server chooses file locations")
+        urls = options.pop("urls", None)
+        if urls is not None and (not isinstance(urls, list) or not urls or not all(isinstance(u, str) for u in urls)):
+            raise ValueError("urls must be a non-empty list of strings")
+
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = self.jobs_dir / job_id
+        fmt = options.get("format")
+        options["output"] = str(job_dir / f"output.{fmt if fmt in OUTPUT_FORMATS else 'pdf'}")
+        options["metrics_json"] = str(job_dir / "metrics.json")
+        options["journal"] = str(job_dir / "journal.jsonl")
+        options["trace"] = None
+        options["save_html"] = None
+        options["assets_dir"] = None
+        options["cache_dir"] = str(self.cache_dir)
+        options["urls_file"] = str(job_dir / "urls.txt") if urls is not None else None
+        # Exact option names only: with abbreviations, "save_htm" would reach --save-html.
+        args = parse_job(build_job_parser(allow_abbrev=False), options, label="job")
+
+        job_dir.mkdir(parents=True, exist_ok=True)
+        if urls is not None:
+            (job_dir / "urls.txt").write_text("\n".join(urls) + "\n", encoding="utf-8")
+        job = ServerJob(
+            id=job_id,
+            args=args,
+            status=JobStatus(name=str(options.get("name") or job_id), output=args.output, log=str(job_dir / "job.log")),
+            submitted_at=time.time(),
+        )
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                shutil.rmtree(job_dir, ignore_errors=True)
+                raise
+            self._jobs[job_id] = job
+        return job
+
+    def get(self, job_id: str) -> ServerJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list[ServerJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that hasn't started yet."""
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status.state != "pending":
+                return False
+            job.status.state = "cancelled"
+            return True
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            states = [j.status.state for j in self._jobs.values()]
+        return {state: states.count(state) for state in ("pending", "running", "ok", "failed", "cancelled")}
+
+    def _work(self, worker: int) -> None:
+        with sync_playwright() as p:
+            context = connect_context(p, self.endpoint)
+            while not self._stopping.is_set():
+                try:
+                    job = self._queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                with self._lock:
+                    if job.status.state != "pending":
+                        continue
+                    job.status.state = "running"
+                    job.status.worker = worker
+                    job.status.started_at = time.time()
+                if context is None:
+                    self._finish(job, exit_code=2, error=f"could not connect to {self.endpoint}")
+                    continue
+                self._run(job, context)
+
+    def _run(self, job: ServerJob, context: BrowserContext) -> None:
+        error: str | None = None
+        with open(job.status.log, "w", encoding="utf-8") as log:
+            for output in self._outputs:
+                output.route(log)
+            try:
+                exit_code = run_job(job.args, context=context, limiter=self.limiter, metrics=job.metrics)
+            except Exception as e:
+                exit_code = 1
+                error = f"{type(e).__name__}: {e}"
+                traceback.print_exc()
+            finally:
+                for output in self._outputs:
+                    output.route(None)
+        self._finish(job, exit_code=exit_code, error=error)
+
+    def _finish(self, job: ServerJob, *, exit_code: int, error: str | None) -> None:
+        finished = time.time()
+        with self._lock:
+            status = job.status
+            status.state = "ok" if exit_code == 0 else "failed"
+            status.exit_code = exit_code
+            status.finished_at = finished
+            status.duration_s = round(finished - (status.started_at or finished), 3)
+            status.pages = job.metrics.page_count()
+            status.error = error if error or exit_code == 0 else f"exit code {exit_code}, see /jobs/{job.id}/log"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # noqa: N802 (http.server API)
+        jobs: JobServer = self.server.jobs
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+
+        if parts == ["health"]:
+            return self._json(200, {"ok": True, "workers": jobs.workers, "jobs": jobs.counts()})
+        if parts == ["jobs"]:
+            return self._json(200, {"jobs": [j.to_json() for j in jobs.list()]})
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = jobs.get(parts[1])
+            if job is None:
+                return self._json(404, {"error": "no such job"})
+            if len(parts) == 2:
+                return self._json(200, job.to_json())
+            if parts[2] == "log":
+                return self._file(Path(job.status.log), "text/plain; charset=utf-8")
+            if parts[2] in ("download", "pdf"):
+                if job.status.state != "ok":
+                    return self._json(409, {"error": f"job is {job.status.state}", "state": job.status.state})
+                output = Path(job.args.output)
+                return self._file(output, _MEDIA_TYPES.get(output.suffix, "application/octet-stream"))
+        return self._json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:  # noqa: N802 (http.server API)
+        jobs: JobServer = self.server.jobs
+        if [p for p in urlparse(self.path).path.split("/") if p] != ["jobs"]:
+            return self._json(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if not 0 < length <= _MAX_BODY_BYTES:
+            return self._json(400, {"error": "expected a JSON job object as the request body"})
+        try:
+            options = json.loads(self.rfile.read(length))
+        except ValueError:
+            return self._json(400, {"error": "body is not valid JSON"})
+        if not isinstance(options, dict):
+            return self._json(400, {"error": "expected a JSON job object as the request body"})
+
+        # argparse reports problems on stderr; catch them for the response.
+        stderr: ThreadOutput = self.server.stderr
+        captured = io.StringIO()
+        stderr.route(captured)
+        try:
+            job = jobs.submit(options)
+        except ValueError as e:
+            detail = captured.getvalue().strip().splitlines()
+            return self._json(400, {"error": str(e), "detail": detail[-1] if detail else None})
+        except queue.Full:
+            return self._json(503, {"error": "job queue is full"}, headers={"Retry-After": "5"})
+        finally:
+            stderr.route(None)
+        return self._json(202, job.to_json(), headers={"Location": f"/jobs/{job.id}"})
+
+    def do_DELETE(self) -> None:  # noqa: N802 (http.server API)
+        jobs: JobServer = self.server.jobs
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        if len(parts) != 2 or parts[0] != "jobs":
+            return self._json(404, {"error": "not found"})
+        job = jobs.get(parts[1])
+        if job is None:
+            return self._json(404, {"error": "no such job"})
+        if not jobs.cancel(job.id):
+            return self._json(409, {"error": f"job is {job.status.state}; only pending jobs can be cancelled"})
+        return self._json(200, job.to_json())
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _json(self, status: int, data: dict[str, Any], *, headers: dict[str, str] | None = None) -> None:
+        body = json.dumps(data, indent=2).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _file(self, path: Path, content_type: str) -> None:
+        try:
+            f = path.open("rb")
+        except OSError:
+            return self._json(404, {"error": "file not found"})
+        with f:
+            size = path.stat().st_size
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+            # A log may still be growing; send exactly what Content-Length promised.
+            remaining = size
+            while remaining > 0:
+                chunk = f.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="walkthrough-scraper serve",
+        description=(
+            "Keep a warm browser and run scrape jobs submitted over a local HTTP API. "
+            "POST /jobs with a JSON job (the scraper's long options, plus 'urls' for a list), "
+            "poll GET /jobs/<id>, then download GET /jobs/<id>/download."
+        ),
+    )
+    p.add_argument("--host", default="127.0.0.1", help="Address to listen on (the API has no authentication)")
+    p.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    p.add_argument("--workers", type=int, default=2, help="Jobs run at the same time")
+    p.add_argument("--queue-size", type=int, default=16, help="Jobs that may wait for a worker; more are refused with 503")
+    p.add_argument("--jobs-dir", default=str(Path("serve-jobs").resolve()), help="Where each job's PDF, log and metrics go")
+    p.add_argument("--cache-dir", default=str(Path(".cache").resolve()), help="Page and asset cache shared by all jobs")
+    p.add_argument("--cdp-url", default=None, help="Run jobs in an already running Chrome instead of launching one")
+    p.add_argument("--profile-dir", default=str(Path(".profile").resolve()), help="Persistent profile for the launched browser")
+    p.add_argument("--browser", choices=["chromium", "chrome"], default="chromium", help="Browser to launch")
+    p.add_argument("--headless", action="store_true", help="Launch the browser headless")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    console = sys.stdout
+
+    browser = SharedBrowser(
+        cdp_url=args.cdp_url, profile_dir=args.profile_dir, headless=bool(args.headless), browser=args.browser
+    )
+    try:
+        endpoint = browser.start()
+    except (OSError, TimeoutError, PlaywrightError) as e:
+        print(f"Could not start the shared browser: {e}", file=sys.stderr)
+        browser.close()
+        return 2
+
+    limiter = HostRateLimiter(
+        on_backoff=lambda host, reason, interval_s: print(
+            f"Slowing down requests to {host} ({reason}): one every {interval_s:.1f}s", file=console, flush=True
+        ),
+    )
+    stdout, stderr = ThreadOutput(sys.stdout), ThreadOutput(sys.stderr)
+    jobs = JobServer(
+        endpoint=endpoint,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        jobs_dir=args.jobs_dir,
+        cache_dir=args.cache_dir,
+        limiter=limiter,
+        outputs=(stdout, stderr),
+    )
+    try:
+        httpd = ThreadingHTTPServer((args.host, args.port), _Handler)
+    except OSError as e:
+        print(f"Could not listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        browser.close()
+        return 2
+    httpd.daemon_threads = True
+    httpd.jobs = jobs
+    httpd.stderr = stderr
+
+    sys.stdout, sys.stderr = stdout, stderr
+    jobs.start()
+    print(f"Serving on http://{args.host}:{httpd.server_address[1]}/ with {jobs.workers} workers (Ctrl+C to stop)", file=console, flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping; running jobs are abandoned.", file=console)
+    finally:
+        httpd.server_close()
+        jobs.stop()
+        sys.stdout, sys.stderr = stdout.default, stderr.default
+        browser.close()
+    return 0
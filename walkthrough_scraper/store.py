@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+import mmap
+from pathlib import Path
+import tempfile
+import threading
+from typing import Iterable, Iterator, overload
+
+from .model import ScrapedPage
+
+
+class _PageRecord:
+    __slots__ = ("url", "title", "offset", "length")
+
+    def __init__(self, url: str, title: str, offset: int, length: int) -> None:
+        self.url = url
+        self.title = title
+        self.offset = offset
+        self.length = length
+
+
+class PageStore(Sequence):
+    """Append-only list of ScrapedPage whose content HTML lives on disk.
+
+    Each page keeps only its url, title and an (offset, length) into an
+    anonymous spill file, so memory doesn't grow with walkthrough length.
+    Indexing reads that page's HTML back (through mmap when use_mmap=True) and
+    returns a regular ScrapedPage; slicing returns a list. The spill file is
+    deleted on close().
+    """
+
+    def __init__(
+        self,
+        pages: Iterable[ScrapedPage] = (),
+        *,
+        dir: str | Path | None = None,
+        use_mmap: bool = False,
+    ) -> None:
+        self._file = tempfile.TemporaryFile(prefix="pages-", suffix=".html", dir=dir)
+        self._records: list[_PageRecord] = []
+        self._size = 0
+        self._use_mmap = use_mmap
+        self._map: mmap.mmap | None = None
+        self._lock = threading.Lock()
+        self.extend(pages)
+
+    @property
+    def content_bytes(self) -> int:
+        """Total UTF-8 size of the stored content HTML."""
+
+        return self._size
+
+    def urls(self) -> list[str]:
+        """Every page's URL, in order, without reading any content back."""
+
+        return [r.url for r in self._records]
+
+    def append(self, page: ScrapedPage) -> None:
+        data = page.content_html.encode("utf-8")
+        with self._lock:
+            self._file.seek(self._size)
+            self._file.write(data)
+            self._records.append(_PageRecord(page.url, page.title, self._size, len(data)))
+            self._size += len(data)
+
+    def extend(self, pages: Iterable[ScrapedPage]) -> None:
+        for page in pages:
+            self.append(page)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @overload
+    def __getitem__(self, index: int) -> ScrapedPage: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[ScrapedPage]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._load(r) for r in self._records[index]]
+        return self._load(self._records[index])
+
+    def __iter__(self) -> Iterator[ScrapedPage]:
+        for record in self._records:
+            yield self._load(record)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+
+    def __enter__(self) -> PageStore:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _load(self, record: _PageRecord) -> ScrapedPage:
+        html = self._read(record.offset, record.length).decode("utf-8")
+        return ScrapedPage(url=record.url, title=record.title, content_html=html)
+
+    def _read(self, offset: int, length: int) -> bytes:
+        if not length:
+            return b""
+        with self._lock:
+            if not self._use_mmap:
+                self._file.flush()
+                self._file.seek(offset)
+                return self._file.read(length)
+            if self._map is None or len(self._map) < offset + length:
+                # The file grew since it was mapped; map it again at its current size.
+                self._file.flush()
+                if self._map is not None:
+                    self._map.close()
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map[offset : offset + length]
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+import time
+from typing import Any, Callable
+
+from playwright.sync_api import BrowserContext, Page, Response
+
+
+@dataclass
+class Navigation:
+    url: str
+    page: Page
+    key: Any = None
+    error: Exception | None = None
+    response: Response | None = None
+    # time.perf_counter() when the url was submitted, including any wait for a free tab.
+    submitted_at: float = 0.0
+
+    def raise_for_error(self) -> None:
+        if self.error is not None:
+            raise self.error
+
+
+class TabPool:
+    """A fixed set of tabs in one BrowserContext that load pages concurrently.
+
+    Navigations are started with wait_until="commit", which returns as soon as
+    the response starts arriving. The browser keeps loading every dispatched tab
+    while Python waits on (and extracts) the oldest one, so results come back in
+    submission order.
+
+    The sync Playwright API is single-threaded; the concurrency here lives in
+    the browser, not in Python. `throttle(url)` is called before each
+    navigation starts and may block (e.g. HostRateLimiter.acquire).
+    """
+
+    def __init__(
+        self,
+        context: BrowserContext,
+        size: int,
+        *,
+        throttle: Callable[[str], Any] | None = None,
+        timeout_ms: int = 60_000,
+        setup: Callable[[Page], None] | None = None,
+    ) -> None:
+        self._context = context
+        self._pages: list[Page] = [context.new_page() for _ in range(max(1, size))]
+        if setup is not None:
+            for page in self._pages:
+                setup(page)
+        self._idle: list[Page] = list(self._pages)
+        self._queued: deque[tuple[str, Any, float]] = deque()
+        self._inflight: deque[Navigation] = deque()
+        self._throttle = throttle
+        self._timeout_ms = timeout_ms
+
+    @property
+    def size(self) -> int:
+        return len(self._pages)
+
+    def submit(self, url: str, key: Any = None) -> None:
+        self._queued.append((url, key, time.perf_counter()))
+        self._dispatch()
+
+    def next(self) -> Navigation | None:
+        """Return the oldest in-flight navigation, or None when the pool is drained.
+
+        The caller owns the returned tab until it passes it to release().
+        """
+
+        self._dispatch()
+        if not self._inflight:
+            return None
+        return self._inflight.popleft()
+
+    def release(self, page: Page) -> None:
+        self._idle.append(page)
+        self._dispatch()
+
+    def pending(self) -> int:
+        return len(self._queued) + len(self._inflight)
+
+    def close(self) -> None:
+        for page in self._pages:
+            try:
+                page.close()
+            except Exception:
+                pass
+        self._pages.clear()
+        self._idle.clear()
+        self._queued.clear()
+        self._inflight.clear()
+
+    def _dispatch(self) -> None:
+        while self._idle and self._queued:
+            url, key, submitted_at = self._queued.popleft()
+            page = self._idle.pop()
+
+            if self._throttle is not None:
+                self._throttle(url)
+
+            nav = Navigation(url=url, page=page, key=key, submitted_at=submitted_at)
+            try:
+                nav.response = page.goto(url, wait_until="commit", timeout=self._timeout_ms)
+            except Exception as e:
+                nav.error = e
+            self._inflight.append(nav)